@@ -0,0 +1,219 @@
+# -*- coding: utf-8 -*-
+"""
+小红书自动发布工具的失败现场记录
+
+发布失败时记录一组现场文件：页面截图、DOM快照（gzip压缩）和本篇笔记最近的日志。
+失败时只向浏览器取回截图（base64）和页面源码，解码、压缩和写盘都在后台线程中完成，
+重试不需要等待磁盘写入。
+
+文件按运行和笔记命名：{run_id}_{post_id}_{进程号}_{序号}_{原因}.png / .html.gz / .log，
+多账号模式的工作进程由同一个主进程派生，RUN_ID相同，进程号保证文件名不冲突；
+目录总大小超过 max_total_bytes 时按时间从旧到新删除整组文件。
+
+最近日志的处理器不在导入或创建ArtifactStore时挂载，由命令行入口在配置日志时调用 install_recent_logs(config)；
+作为库使用时不挂载，现场文件中不包含日志。
+"""
+
+import os
+import gzip
+import base64
+import logging
+import itertools
+import threading
+import collections
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import List, Dict, Optional, Any
+
+from logging_config import logger, RUN_ID, current_post_id
+from browser_backend import as_backend
+
+# === 默认现场记录参数 ===
+ARTIFACT_DEFAULTS = {
+    'enabled': True,  # 是否在失败时记录现场
+    'dir': 'artifacts',  # 现场文件目录
+    'max_total_bytes': 100 * 1024 * 1024,  # 现场文件总大小上限，超出时删除最旧的记录
+    'screenshot': True,  # 是否保存截图
+    'dom': True,  # 是否保存DOM快照
+    'log_lines': 200,  # 每次失败保存的最近日志条数，0表示不保存
+}
+
+_LOG_FORMAT = logging.Formatter('%(asctime)s - %(levelname)s - [%(filename)s:%(lineno)d] - %(message)s')
+_sequence = itertools.count(1)
+_lock = threading.Lock()
+_writer = None
+_recent_logs = None
+
+
+def _reset_after_fork() -> None:
+    """派生的工作进程中重新创建序号、锁和写入线程（父进程的写入线程不会被复制到子进程）"""
+    global _sequence, _lock, _writer
+    _sequence = itertools.count(1)
+    _lock = threading.Lock()
+    _writer = None
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def get_artifact_settings(config: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """合并ARTIFACT_DEFAULTS和配置中的artifacts参数"""
+    settings = ARTIFACT_DEFAULTS.copy()
+    settings.update((config or {}).get('artifacts') or {})
+    return settings
+
+
+# === 最近日志 ===
+class _RecentLogs(logging.Handler):
+    """在内存中保留最近的日志记录（只保存记录本身，写入现场文件时才格式化）"""
+
+    def __init__(self, capacity: int):
+        super().__init__()
+        self.records = collections.deque(maxlen=capacity)
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self.records.append((current_post_id(), record))
+
+    def snapshot(self, post_id: Optional[str], limit: int) -> List[logging.LogRecord]:
+        """本篇笔记（post_id为None时为全部）最近的limit条记录"""
+        records = [record for pid, record in list(self.records) if post_id is None or pid == post_id]
+        return records[-limit:]
+
+
+def _recent_log_handler(capacity: int) -> _RecentLogs:
+    global _recent_logs
+    with _lock:
+        if _recent_logs is None:
+            _recent_logs = _RecentLogs(max(capacity, 1) * 4)
+        # 多账号工作进程重新配置日志时会移除已有的处理器
+        if _recent_logs not in logger.handlers:
+            logger.addHandler(_recent_logs)
+        return _recent_logs
+
+
+def install_recent_logs(config: Optional[Dict[str, Any]] = None) -> Optional[_RecentLogs]:
+    """启用现场记录且log_lines大于0时挂载最近日志处理器（与setup_logger一起调用），未启用时返回None"""
+    settings = get_artifact_settings(config)
+    if not (settings['enabled'] and settings['log_lines']):
+        return None
+    return _recent_log_handler(settings['log_lines'])
+
+
+def _background_writer() -> ThreadPoolExecutor:
+    """所有现场记录共用一个写入线程"""
+    global _writer
+    with _lock:
+        if _writer is None:
+            _writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='artifacts')
+        return _writer
+
+
+# === 现场记录 ===
+class ArtifactStore:
+    """失败现场记录
+
+    Args:
+        settings: 现场记录参数，见ARTIFACT_DEFAULTS
+    """
+
+    def __init__(self, settings: Optional[Dict[str, Any]] = None):
+        self.settings = ARTIFACT_DEFAULTS.copy()
+        self.settings.update(settings or {})
+        self._pending = []
+
+    @classmethod
+    def from_config(cls, config: Optional[Dict[str, Any]] = None) -> 'ArtifactStore':
+        return cls(get_artifact_settings(config))
+
+    def capture(self, driver, reason: str) -> Optional[str]:
+        """记录一次失败现场（driver为WebDriver实例或浏览器后端），返回现场文件的路径前缀（不含扩展名）；未启用时返回None
+
+        只在调用线程中向浏览器取回数据，写盘在后台完成。
+        """
+        if not self.settings['enabled']:
+            return None
+        post_id = current_post_id()
+        name = f"{RUN_ID}_{post_id or 'run'}_{os.getpid()}_{next(_sequence)}_{reason}"
+        screenshot = dom = None
+        backend = as_backend(driver) if driver is not None else None
+        if backend is not None and self.settings['screenshot']:
+            try:
+                # 浏览器返回的本来就是base64编码的PNG，解码留给后台线程
+                screenshot = backend.screenshot()
+            except Exception as e:
+                logger.debug("获取截图失败: %s", e)
+        if backend is not None and self.settings['dom']:
+            try:
+                dom = backend.page_source()
+            except Exception as e:
+                logger.debug("获取页面源码失败: %s", e)
+        logs = _recent_logs
+        records = logs.snapshot(post_id, self.settings['log_lines']) if logs is not None and self.settings['log_lines'] else []
+
+        future = _background_writer().submit(self._write, name, screenshot, dom, records)
+        self._pending = [f for f in self._pending if not f.done()] + [future]
+        path = os.path.join(self.settings['dir'], name)
+        logger.info(f"已记录失败现场: {path}")
+        return path
+
+    def wait(self, timeout: Optional[float] = None) -> None:
+        """等待已提交的现场文件全部写入"""
+        if self._pending:
+            wait(self._pending, timeout=timeout)
+            self._pending = [f for f in self._pending if not f.done()]
+
+    def _write(self, name: str, screenshot: Optional[str], dom: Optional[str],
+               records: List[logging.LogRecord]) -> List[str]:
+        directory = self.settings['dir']
+        written = []
+        try:
+            os.makedirs(directory, exist_ok=True)
+            base = os.path.join(directory, name)
+            if screenshot:
+                with open(base + '.png', 'wb') as f:
+                    f.write(base64.b64decode(screenshot))
+                written.append(base + '.png')
+            if dom:
+                with gzip.open(base + '.html.gz', 'wt', encoding='utf-8', compresslevel=6) as f:
+                    f.write(dom)
+                written.append(base + '.html.gz')
+            if records:
+                with open(base + '.log', 'w', encoding='utf-8') as f:
+                    f.write('\n'.join(_LOG_FORMAT.format(record) for record in records) + '\n')
+                written.append(base + '.log')
+            self._evict(keep=written)
+        except Exception as e:
+            logger.warning(f"写入失败现场出错: {str(e)}")
+        return written
+
+    def _evict(self, keep: List[str]) -> int:
+        """目录总大小超过上限时，按修改时间从旧到新删除整组现场文件"""
+        groups = {}
+        total = 0
+        with os.scandir(self.settings['dir']) as it:
+            for entry in it:
+                if not entry.is_file():
+                    continue
+                stat = entry.stat()
+                total += stat.st_size
+                group = groups.setdefault(entry.name.split('.', 1)[0], [0.0, []])
+                group[0] = max(group[0], stat.st_mtime)
+                group[1].append((entry.path, stat.st_size))
+
+        keep = {os.path.abspath(p) for p in keep}
+        removed = 0
+        for _, files in sorted(groups.values(), key=lambda g: g[0]):
+            if total <= self.settings['max_total_bytes']:
+                break
+            if any(os.path.abspath(path) in keep for path, _ in files):
+                continue
+            for path, size in files:
+                try:
+                    os.remove(path)
+                    total -= size
+                except OSError as e:
+                    logger.debug("删除现场文件失败 %s: %s", path, e)
+            removed += 1
+        if removed:
+            logger.info(f"失败现场已淘汰 {removed} 组文件")
+        return removed
@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+"""
+emoji处理基准：比较预编译实现与原先逐次构建正则的实现
+
+原实现在每次'replace'调用时重建替换表、重新编译正则并逐个执行str.replace，
+'remove'模式逐字符生成；这里保留一份原实现作为对照。
+
+使用方法：
+    python benchmarks/bench_emoji.py [--texts 20000]
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import argparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from rednote_auto_post import process_emoji_text, process_emoji_texts  # noqa: E402
+from example_post import post_data as EXAMPLE_POST  # noqa: E402
+
+
+def legacy_process_emoji_text(text, mode='keep'):
+    """原实现（仅用于对照）"""
+    if not text:
+        return ""
+    if mode == 'keep':
+        return text
+    elif mode == 'remove':
+        return ''.join(c for c in text if ord(c) < 0x10000)
+    elif mode == 'replace':
+        emoji_map = {
+            '😊': '[笑脸]', '😂': '[笑哭]', '❤️': '[爱心]', '👍': '[赞]',
+            '🎉': '[庆祝]', '🔥': '[火]', '✨': '[闪光]', '🚀': '[火箭]',
+        }
+        for emoji, replacement in emoji_map.items():
+            text = text.replace(emoji, replacement)
+        emoji_pattern = re.compile(
+            "["
+            "\U0001F600-\U0001F64F"
+            "\U0001F300-\U0001F5FF"
+            "\U0001F680-\U0001F6FF"
+            "\U0001F700-\U0001F77F"
+            "\U0001F780-\U0001F7FF"
+            "\U0001F800-\U0001F8FF"
+            "\U0001F900-\U0001F9FF"
+            "\U0001FA00-\U0001FA6F"
+            "\U0001FA70-\U0001FAFF"
+            "\U00002702-\U000027B0"
+            "\U000024C2-\U0000257F"
+            "\U00002600-\U000026FF"
+            "\U00002700-\U000027BF"
+            "\U0000FE00-\U0000FE0F"
+            "\U0001F900-\U0001F9FF"
+            "\U00002B50"
+            "\U00002B55"
+            "\U00002B1B-\U00002B1C"
+            "\U0000200D"
+            "\U00002640-\U00002642"
+            "\U00002600-\U00002B55"
+            "]",
+            flags=re.UNICODE
+        )
+        return emoji_pattern.sub(r'[emoji]', text)
+    raise ValueError(mode)
+
+
+def _time(func, repeat=3):
+    """预热一次后取多次运行中的最短耗时"""
+    func()
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description='emoji处理基准')
+    parser.add_argument('--texts', type=int, default=20000, help='批量处理的文本数量')
+    args = parser.parse_args()
+
+    # 模拟内容流水线：大量标题 + 少量长正文
+    texts = []
+    for i in range(args.texts):
+        texts.append(f"✨ {EXAMPLE_POST['title']} 🚀 #{i}" if i % 10 else EXAMPLE_POST['description'])
+
+    report = {}
+    for mode in ('remove', 'replace'):
+        legacy = _time(lambda: [legacy_process_emoji_text(t, mode) for t in texts])
+        single = _time(lambda: [process_emoji_text(t, mode) for t in texts])
+        bulk = _time(lambda: process_emoji_texts(texts, mode))
+        report[mode] = {
+            'texts': len(texts),
+            'legacy_s': round(legacy, 4),
+            'current_s': round(single, 4),
+            'bulk_s': round(bulk, 4),
+            'speedup': round(legacy / bulk, 1),
+        }
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+if __name__ == '__main__':
+    main()
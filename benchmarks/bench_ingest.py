@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+"""
+内容导入基准：检查逐篇读取的内存占用与内容总数无关
+
+分别生成包含少量和大量post_data的JSONL文件，用tracemalloc记录遍历iter_valid_posts时的峰值内存，
+并与一次载入全部内容（旧的load_posts_file方式）对比。
+
+使用方法：
+    python benchmarks/bench_ingest.py [--small 10] [--large 100000] [--max-ratio 2.0]
+"""
+
+import os
+import sys
+import json
+import time
+import logging
+import importlib
+import argparse
+import tempfile
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from ingest import iter_valid_posts  # noqa: E402
+from logging_config import logger  # noqa: E402
+from example_post import post_data as EXAMPLE_POST  # noqa: E402
+
+# iter_valid_posts在函数内导入rednote_auto_post做校验；预先导入，避免把模块加载的内存计入第一次测量的峰值
+importlib.import_module('rednote_auto_post')
+
+
+def _write_jsonl(path, count):
+    with open(path, 'w', encoding='utf-8') as f:
+        for index in range(count):
+            post = {
+                'title': f"第{index}篇笔记",
+                'description': EXAMPLE_POST['description'],
+                'hashtags': EXAMPLE_POST['hashtags'],
+                'image_dir': 'images',
+            }
+            f.write(json.dumps(post, ensure_ascii=False) + '\n')
+
+
+def _measure(func):
+    tracemalloc.start()
+    started = time.perf_counter()
+    count = func()
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {'posts': count, 'peak_kb': round(peak / 1024, 1), 'seconds': round(elapsed, 3)}
+
+
+def _stream(path):
+    return sum(1 for _ in iter_valid_posts(path))
+
+
+def _load_all(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return len([json.loads(line) for line in f if line.strip()])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='内容导入内存基准')
+    parser.add_argument('--small', type=int, default=10, help='小文件的内容数量')
+    parser.add_argument('--large', type=int, default=100000, help='大文件的内容数量')
+    parser.add_argument('--max-ratio', type=float, default=2.0, help='大文件与小文件峰值内存的最大比例')
+    args = parser.parse_args()
+
+    # 示例标题超出长度限制，非严格模式下会逐篇记录警告，这里不计入
+    logger.setLevel(logging.ERROR)
+
+    report = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, count in (('small', args.small), ('large', args.large)):
+            path = os.path.join(tmp, f'{label}.jsonl')
+            _write_jsonl(path, count)
+            report[f'stream_{label}'] = _measure(lambda: _stream(path))
+        report['load_all_large'] = _measure(lambda: _load_all(os.path.join(tmp, 'large.jsonl')))
+
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    ratio = report['stream_large']['peak_kb'] / max(report['stream_small']['peak_kb'], 64.0)
+    print(f"峰值内存比例（large/small）: {ratio:.2f}")
+    if ratio > args.max_ratio:
+        print("逐篇读取的峰值内存随内容数量增长")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""
+持久化配置目录基准：比较一次性配置目录和已预热的持久化配置目录下，浏览器启动后第一次打开创建页面的耗时
+
+使用真实Chrome访问本地替身页面（脚本包带模拟下载耗时）：
+- cold: 每次使用新的临时配置目录（默认行为）
+- warm: 使用预热过的持久化配置目录（profile.enabled）
+
+使用方法：
+    python benchmarks/bench_profile.py [--runs 5] [--asset-delay-ms 400] [--backend selenium]
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import statistics
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(ROOT))
+sys.path.insert(0, ROOT)
+
+import rednote_auto_post as rap  # noqa: E402
+from profiles import ManagedProfile  # noqa: E402
+from standin_page import start_standin_server  # noqa: E402
+
+
+def _first_load(config, creation_url, profile=None):
+    """启动浏览器并打开创建页面，返回页面就绪的耗时（秒，不含浏览器启动）"""
+    if profile is not None:
+        profile.acquire()
+        config = dict(config, user_data_dir=profile.path)
+    driver = rap.init_browser(config)
+    try:
+        backend = rap.as_backend(driver)
+        started = time.perf_counter()
+        backend.navigate(creation_url)
+        rap._wait_page_ready(backend, rap.get_wait_timing(config))
+        return time.perf_counter() - started
+    finally:
+        driver.quit()
+        if profile is not None:
+            profile.release()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='比较冷启动和预热配置目录的首次页面加载耗时')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--asset-delay-ms', type=int, default=400, help='脚本包的模拟下载耗时')
+    parser.add_argument('--backend', default='selenium', choices=rap.BACKENDS)
+    args = parser.parse_args()
+
+    server, creation_url = start_standin_server(asset_delay_ms=args.asset_delay_ms)
+    root = tempfile.mkdtemp(prefix='rednote_profiles_')
+    config = {'headless': True, 'backend': args.backend, 'creation_url': creation_url,
+              'profile': {'enabled': True, 'root': root, 'name': 'bench'}}
+    try:
+        profile = ManagedProfile.from_config(config)
+        # 预热：第一次加载把脚本包写入HTTP缓存
+        _first_load(config, creation_url, profile)
+        cold = [_first_load(dict(config, profile={'enabled': False}), creation_url) for _ in range(args.runs)]
+        warm = [_first_load(config, creation_url, profile) for _ in range(args.runs)]
+    finally:
+        server.shutdown()
+        shutil.rmtree(root, ignore_errors=True)
+
+    report = {
+        'backend': args.backend,
+        'asset_delay_ms': args.asset_delay_ms,
+        'cold_median_s': round(statistics.median(cold), 3),
+        'warm_median_s': round(statistics.median(warm), 3),
+    }
+    report['warm_ratio'] = round(report['warm_median_s'] / report['cold_median_s'], 3)
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+if __name__ == '__main__':
+    main()
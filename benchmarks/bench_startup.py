@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+"""
+启动耗时基准：检查 `import rednote_auto_post` 和 `rednote_auto_post.py --help` 是否在预算内
+
+每项在全新的Python进程中运行多次，取中位数与预算比较；同时检查导入后没有加载Selenium、
+没有创建日志目录。超出预算或出现副作用时以非零状态码退出。
+
+使用方法：
+    python benchmarks/bench_startup.py [--runs 10]
+"""
+
+import os
+import sys
+import time
+import json
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 启动耗时预算（毫秒，包含Python解释器本身的启动时间）
+IMPORT_BUDGET_MS = 100
+HELP_BUDGET_MS = 150
+
+_IMPORT_CHECK = (
+    "import sys, rednote_auto_post;"
+    "print('selenium' in sys.modules, 'example_post' in sys.modules)"
+)
+
+
+def _time_command(args, cwd, runs):
+    """运行命令多次，返回耗时中位数（毫秒）和最后一次的输出"""
+    env = dict(os.environ, PYTHONPATH=ROOT, PYTHONDONTWRITEBYTECODE='1')
+    timings = []
+    output = ''
+    # 先运行一次预热（生成.pyc、加载文件系统缓存），不计入结果
+    subprocess.run(args, cwd=cwd, env=env, capture_output=True)
+    for _ in range(runs):
+        started = time.perf_counter()
+        proc = subprocess.run(args, cwd=cwd, env=env, capture_output=True, text=True)
+        timings.append((time.perf_counter() - started) * 1000)
+        if proc.returncode != 0:
+            raise RuntimeError(f"命令执行失败: {' '.join(args)}\n{proc.stderr}")
+        output = proc.stdout
+    return statistics.median(timings), output
+
+
+def main():
+    parser = argparse.ArgumentParser(description='启动耗时基准')
+    parser.add_argument('--runs', type=int, default=10, help='每项的运行次数')
+    args = parser.parse_args()
+
+    failures = []
+    # 在临时目录中运行，以便检查是否创建了日志目录
+    with tempfile.TemporaryDirectory() as workdir:
+        import_ms, output = _time_command([sys.executable, '-c', _IMPORT_CHECK], workdir, args.runs)
+        help_ms, _ = _time_command(
+            [sys.executable, os.path.join(ROOT, 'rednote_auto_post.py'), '--help'], workdir, args.runs)
+        selenium_loaded, example_loaded = output.split()
+        if selenium_loaded == 'True':
+            failures.append("导入时加载了Selenium")
+        if example_loaded == 'True':
+            failures.append("导入时加载了example_post")
+        if os.path.exists(os.path.join(workdir, 'logs')):
+            failures.append("导入或--help时创建了日志目录")
+
+    if import_ms > IMPORT_BUDGET_MS:
+        failures.append(f"import 耗时 {import_ms:.1f}ms 超出预算 {IMPORT_BUDGET_MS}ms")
+    if help_ms > HELP_BUDGET_MS:
+        failures.append(f"--help 耗时 {help_ms:.1f}ms 超出预算 {HELP_BUDGET_MS}ms")
+
+    print(json.dumps({
+        'import_ms': round(import_ms, 1),
+        'import_budget_ms': IMPORT_BUDGET_MS,
+        'help_ms': round(help_ms, 1),
+        'help_budget_ms': HELP_BUDGET_MS,
+        'failures': failures,
+    }, ensure_ascii=False, indent=2))
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""
+用于离线基准测试的假DevTools协议连接
+
+与 CdpBackend 配合使用，代替到Chrome的websocket连接。页面行为由 FakePage 页面模型模拟（每个标签页一个连接和一个页面模型），
+每个命令可以设置固定延迟来模拟一次websocket往返。等待条件（wait_for）与真实浏览器一样在页面内完成：
+一次命令内在条件满足时立即返回，不产生额外的往返。
+"""
+
+import json
+import time
+import itertools
+
+import browser_backend as bb
+from fake_driver import FakePage
+
+# 页面内检查条件的间隔（模拟MutationObserver回调的延迟）
+_IN_PAGE_STEP = 0.002
+
+_targets = itertools.count(1)
+
+
+class FakeCdpConnection(bb.CdpConnection):
+    """假的DevTools协议连接
+
+    Args:
+        latency: 每个命令的模拟往返延迟（秒）
+        upload_delay: 从选择文件到缩略图全部渲染的模拟耗时（秒）
+    """
+
+    def __init__(self, latency=0.0, upload_delay=0.0):
+        # 不建立websocket连接，只使用父类的事件订阅
+        self.closed = False
+        self._handlers = {}
+        self.latency = latency
+        self.upload_delay = upload_delay
+        self.url = f'ws://fake/devtools/page/target-{next(_targets)}'
+        self.page = FakePage(upload_delay=upload_delay)
+        self.cookies = []
+
+    def new_page(self):
+        if self.latency:
+            time.sleep(self.latency)
+        return type(self)(latency=self.latency, upload_delay=self.upload_delay)
+
+    def call(self, method, params=None, timeout=30):
+        if self.closed:
+            raise bb.CdpConnectionError("与浏览器的连接已断开")
+        if self.latency:
+            time.sleep(self.latency)
+        params = params or {}
+        page = self.page
+        if method == 'Page.navigate':
+            page.current_page = params['url']
+            page.reset()
+            self._emit('Page.frameNavigated', {'frame': {'id': 'main', 'url': params['url']}})
+            self._emit('Page.domContentEventFired', {'timestamp': time.monotonic()})
+            return {'frameId': 'main'}
+        if method == 'Runtime.evaluate':
+            return self._evaluate(params['expression'], params.get('returnByValue'))
+        if method == 'DOM.setFileInputFiles':
+            if page._locate(params['objectId']) is page.file_input:
+                page._start_upload(params['files'])
+            return {}
+        if method == 'Input.insertText':
+            if page.focused is not None:
+                page.focused.value += params['text']
+            return {}
+        if method == 'Page.captureScreenshot':
+            return {'data': ''}
+        if method == 'Network.setCookies':
+            self.cookies = list(params['cookies'])
+            return {}
+        if method == 'Network.getAllCookies':
+            return {'cookies': list(self.cookies)}
+        if method == 'Browser.close':
+            self.closed = True
+            return {}
+        return {}
+
+    def close(self):
+        self.closed = True
+
+    def _emit(self, method, params):
+        for callback in list(self._handlers.get(method, ())):
+            callback(params)
+
+    def _evaluate(self, expression, by_value):
+        await_prefix = f"({bb._AWAIT_JS})(function () {{\n"
+        if expression.startswith(await_prefix):
+            # 页面内等待：条件满足时立即返回，超时返回null
+            body, tail = expression[len(await_prefix):].split("\n}, ", 1)
+            args_json, timeout_ms = tail[:-1].rsplit(', ', 1)
+            args = json.loads(args_json)
+            deadline = time.monotonic() + int(timeout_ms) / 1000.0
+            while True:
+                value = self.page.run_script(body, args)
+                if value or time.monotonic() >= deadline:
+                    return {'result': {'type': 'object', 'value': value or None}}
+                time.sleep(_IN_PAGE_STEP)
+
+        call_prefix = "(function () {\n"
+        body, args_json = expression[len(call_prefix):].rsplit("\n}).apply(null, ", 1)
+        value = self.page.run_script(body, json.loads(args_json[:-1]))
+        if not by_value:
+            # 元素以objectId表示，这里直接使用其XPath
+            if value is None:
+                return {'result': {'type': 'object', 'subtype': 'null', 'value': None}}
+            return {'result': {'type': 'object', 'subtype': 'node', 'objectId': json.loads(args_json[:-1])[0]}}
+        return {'result': {'type': 'object', 'value': value}}
+
+
+def fake_cdp_backend(latency=0.0, upload_delay=0.0):
+    """返回连接到假页面的CdpBackend"""
+    return bb.CdpBackend(FakeCdpConnection(latency=latency, upload_delay=upload_delay))
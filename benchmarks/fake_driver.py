@@ -0,0 +1,282 @@
+# -*- coding: utf-8 -*-
+"""
+用于离线基准测试的假WebDriver
+
+模拟创作平台发布页面的行为（上传控件、标题、正文、发布按钮、上传缩略图和发布成功提示），
+不需要Chrome即可完整运行 `_publish_post()`。每个命令都经过 execute()，可以设置固定延迟
+来模拟到chromedriver的HTTP往返，并能被 `attach_command_counter()` 计数。
+页面脚本由 FakePage.run_script() 在页面模型上模拟，每个标签页一个页面模型，
+假CDP连接（见fake_cdp）使用同一个页面模型。
+"""
+
+import time
+import itertools
+
+from selenium.common.exceptions import NoSuchElementException, NoSuchWindowException
+
+import browser_backend as bb
+import rednote_auto_post as rap
+
+_handles = itertools.count(1)
+
+
+class FakeElement:
+    """假的页面元素"""
+
+    def __init__(self, page, tag_name, editable=False, text=''):
+        self.page = page
+        self.tag_name = tag_name
+        self.editable = editable
+        self.text = text
+        self.value = ''
+        self.displayed = True
+        self.enabled = True
+
+    @property
+    def driver(self):
+        return self.page.driver
+
+    def send_keys(self, *values):
+        self.driver.execute('sendKeysToElement', {'element': self})
+        self.value += ''.join(values)
+        if self is self.page.file_input:
+            self.page._start_upload(self.value.split('\n'))
+
+    def clear(self):
+        self.driver.execute('clearElement', {'element': self})
+        self.value = ''
+
+    def click(self):
+        self.driver.execute('clickElement', {'element': self})
+        if self is self.page.publish_button:
+            self.page._publish()
+
+    def is_displayed(self):
+        self.driver.execute('isElementDisplayed', {'element': self})
+        return self.displayed
+
+    def is_enabled(self):
+        self.driver.execute('isElementEnabled', {'element': self})
+        return self.enabled
+
+    def get_attribute(self, name):
+        self.driver.execute('getElementAttribute', {'element': self, 'name': name})
+        return self.value if name == 'value' else None
+
+
+class FakePage:
+    """一个标签页中的发布页面模型
+
+    Args:
+        driver: 所属的FakeDriver（元素操作经过其execute计数），假CDP连接中为None
+        upload_delay: 从选择文件到缩略图全部渲染的模拟耗时（秒）
+    """
+
+    def __init__(self, driver=None, upload_delay=0.0):
+        self.driver = driver
+        self.upload_delay = upload_delay
+        self.current_page = 'about:blank'
+        self.file_input = FakeElement(self, 'input')
+        self.title_input = FakeElement(self, 'input')
+        self.body_input = FakeElement(self, 'div', editable=True)
+        self.publish_button = FakeElement(self, 'button', text='发布')
+        self.success_toast = FakeElement(self, 'div', text='发布成功')
+        self.reset()
+
+    def run_script(self, script, args):
+        """在页面模型上执行发布流程用到的脚本（不经过execute，假CDP连接也使用）"""
+        if script == rap._PAGE_READY_JS:
+            if any(marker in self.current_page.lower() for marker in args[1]):
+                return 'login'
+            return 'ready' if self._locate(args[0]) is not None else None
+        if script == rap._UPLOAD_DONE_JS:
+            return self._preview_count() >= args[2]
+        if script == rap._PUBLISH_CONFIRMED_JS:
+            return self.current_page != args[0] or self.published
+        if script in (bb.PRESENT_JS, bb.CLICKABLE_JS):
+            element = self._locate(args[0])
+            return element is not None and (script == bb.PRESENT_JS or (element.displayed and element.enabled))
+        if script == rap._SET_VALUES_JS:
+            results = []
+            for target, value in args[0]:
+                element = self._locate(target) if isinstance(target, str) else target
+                element.value = value
+                results.append({'ok': bool(value), 'strategy': 'event' if value else None,
+                                'editable': element.editable, 'error': None})
+            return results
+        if script == bb._FOCUS_CLEAR_JS:
+            element = self._locate(args[0]) if isinstance(args[0], str) else args[0]
+            if element is None:
+                return None
+            element.value = ''
+            self.focused = element
+            return element.editable
+        if script == bb._CLICK_JS:
+            element = self._locate(args[0])
+            if element is not None and element is self.publish_button:
+                self._publish()
+            return element is not None
+        if script == bb._FIND_JS:
+            return self._locate(args[0])
+        if 'outerHTML' in script:
+            return '<html></html>'
+        return True
+
+    def reset(self):
+        self.focused = None
+        self.upload_started = None
+        self.expected_uploads = 0
+        self.published = False
+        for element in (self.file_input, self.title_input, self.body_input):
+            element.value = ''
+
+    def _start_upload(self, paths):
+        self.upload_started = time.monotonic()
+        self.expected_uploads = len(paths)
+
+    def _preview_count(self):
+        if self.upload_started is None:
+            return 0
+        if time.monotonic() - self.upload_started < self.upload_delay:
+            return 0
+        return self.expected_uploads
+
+    def _publish(self):
+        self.published = True
+
+    def _locate(self, xpath):
+        selectors = rap.SELECTORS
+        if xpath == selectors['file_input']:
+            return self.file_input
+        if xpath == selectors['title_input']:
+            return self.title_input
+        if xpath == selectors['body_input']:
+            return self.body_input
+        if xpath == selectors['publish_button']:
+            return self.publish_button
+        if xpath == selectors['publish_success'] and self.published:
+            return self.success_toast
+        return None
+
+
+class _SwitchTo:
+    def __init__(self, driver):
+        self.driver = driver
+
+    def new_window(self, type_hint=None):
+        self.driver.execute('newWindow', {'type': type_hint})
+        handle = f'tab-{next(_handles)}'
+        self.driver.pages[handle] = FakePage(self.driver, self.driver.upload_delay)
+        self.driver.handle = handle
+
+    def window(self, handle):
+        self.driver.execute('switchToWindow', {'handle': handle})
+        if handle not in self.driver.pages:
+            raise NoSuchWindowException(f"标签页不存在: {handle}")
+        self.driver.handle = handle
+
+
+class FakeDriver:
+    """假的WebDriver，每个标签页有独立的页面模型
+
+    Args:
+        latency: 每个命令的模拟往返延迟（秒）
+        upload_delay: 从选择文件到缩略图全部渲染的模拟耗时（秒）
+    """
+
+    def __init__(self, latency=0.0, upload_delay=0.0):
+        self.latency = latency
+        self.upload_delay = upload_delay
+        self.cookies = []
+        self.handle = f'tab-{next(_handles)}'
+        self.pages = {self.handle: FakePage(self, upload_delay)}
+        self.switch_to = _SwitchTo(self)
+
+    @property
+    def page(self):
+        """当前标签页的页面模型"""
+        return self.pages[self.handle]
+
+    # --- 命令入口 ---
+    def execute(self, driver_command, params=None):
+        if self.latency:
+            time.sleep(self.latency)
+        return {'value': None}
+
+    @property
+    def current_url(self):
+        self.execute('getCurrentUrl')
+        return self.page.current_page
+
+    @property
+    def current_window_handle(self):
+        self.execute('getCurrentWindowHandle')
+        return self.handle
+
+    @property
+    def window_handles(self):
+        self.execute('getWindowHandles')
+        return list(self.pages)
+
+    def get(self, url):
+        self.execute('get', {'url': url})
+        self.page.current_page = url
+        self.page.reset()
+
+    def refresh(self):
+        self.execute('refresh')
+        self.page.reset()
+
+    def close(self):
+        self.execute('closeWindow')
+        del self.pages[self.handle]
+
+    def find_element(self, by, value):
+        self.execute('findElement', {'using': by, 'value': value})
+        element = self.page._locate(value)
+        if element is None:
+            raise NoSuchElementException(f"未找到元素: {value}")
+        return element
+
+    def find_elements(self, by, value):
+        self.execute('findElements', {'using': by, 'value': value})
+        element = self.page._locate(value)
+        return [element] if element is not None else []
+
+    def execute_script(self, script, *args):
+        self.execute('executeScript', {'script': script})
+        return self.page.run_script(script, args)
+
+    def execute_cdp_cmd(self, cmd, params):
+        self.execute('executeCdpCommand', {'cmd': cmd})
+        if cmd == 'Network.setCookies':
+            self.cookies = list(params['cookies'])
+        return {}
+
+    def add_cookie(self, cookie):
+        self.execute('addCookie', {'cookie': cookie})
+        self.cookies.append(cookie)
+
+    def get_cookies(self):
+        self.execute('getAllCookies')
+        return list(self.cookies)
+
+    def save_screenshot(self, filename):
+        self.execute('screenshot')
+        return True
+
+    def get_screenshot_as_png(self):
+        self.execute('screenshot')
+        return b''
+
+    def get_screenshot_as_base64(self):
+        self.execute('screenshot')
+        return ''
+
+    @property
+    def page_source(self):
+        self.execute('getPageSource')
+        return '<html></html>'
+
+    def quit(self):
+        self.execute('quit')
@@ -0,0 +1,344 @@
+# -*- coding: utf-8 -*-
+"""
+发布流程的离线基准测试
+
+场景：
+- single_post: 使用假WebDriver运行一次完整的 `_publish_post()`，统计耗时
+- batch: 使用 PublishSession 连续发布多篇笔记，统计吞吐量
+- webdriver_commands: 每篇笔记发出的WebDriver命令数（往返次数）
+- emoji: `process_emoji_text()` 各模式的处理速度
+- backends: selenium和cdp两种浏览器后端在相同命令延迟和上传耗时下的单篇发布耗时和往返次数
+- pipeline: 两种后端上顺序发布与两个标签页流水线发布的批量吞吐量
+- templates: 用模板和结构化数据批量生成post_data的速度（含编译缓存）
+- chrome（可选，--chrome）: 分别使用两种后端和真实Chrome访问本地替身页面完成一次发布
+
+结果写入JSON文件；指定 --baseline 时与之前的结果比较，任一指标退化超过阈值则以非零状态码退出。
+
+使用方法：
+    python benchmarks/run_benchmarks.py --output benchmarks/results/latest.json
+    python benchmarks/run_benchmarks.py --baseline benchmarks/results/main.json
+"""
+
+import os
+import sys
+import json
+import time
+import zlib
+import struct
+import argparse
+import platform
+import tempfile
+import datetime
+import statistics
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import rednote_auto_post as rap  # noqa: E402
+from fake_driver import FakeDriver  # noqa: E402
+from fake_cdp import fake_cdp_backend  # noqa: E402
+from example_post import post_data as EXAMPLE_POST  # noqa: E402
+
+FAKE_CREATION_URL = 'http://fake.invalid/publish/publish?from=menu&target=post'
+
+# 各指标的优化方向，用于与基准结果比较
+METRIC_DIRECTIONS = {
+    'median_s': 'lower',
+    'p95_s': 'lower',
+    'posts_per_s': 'higher',
+    'commands_per_post': 'lower',
+    'chars_per_s': 'higher',
+}
+
+
+def _bench_config(**overrides):
+    config = {'debug': True, 'wait_profile': 'fast', 'creation_url': FAKE_CREATION_URL, 'max_retries': 1}
+    config.update(overrides)
+    return config
+
+
+def _png_bytes(width=8, height=8):
+    """生成一张最小的有效PNG（灰度）"""
+    def chunk(kind, data):
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+    raw = b''.join(b'\x00' + b'\x80' * width for _ in range(height))
+    return (b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 0, 0, 0, 0))
+            + chunk(b'IDAT', zlib.compress(raw)) + chunk(b'IEND', b''))
+
+
+def _make_image_dir(count=3):
+    image_dir = tempfile.mkdtemp(prefix='rednote_bench_')
+    for i in range(count):
+        with open(os.path.join(image_dir, f'{i:02d}.png'), 'wb') as f:
+            f.write(_png_bytes())
+    return image_dir
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))]
+
+
+def bench_single_post(runs, latency, image_paths):
+    """单篇发布耗时"""
+    timings = []
+    # 预热一次（导入Selenium子模块等），不计入结果
+    rap._publish_post(FakeDriver(), image_paths, EXAMPLE_POST['title'], EXAMPLE_POST['description'],
+                      EXAMPLE_POST['hashtags'], _bench_config())
+    for _ in range(runs):
+        driver = FakeDriver(latency=latency)
+        started = time.perf_counter()
+        ok = rap._publish_post(driver, image_paths, EXAMPLE_POST['title'], EXAMPLE_POST['description'],
+                               EXAMPLE_POST['hashtags'], _bench_config())
+        timings.append(time.perf_counter() - started)
+        if not ok:
+            raise RuntimeError("假WebDriver上的发布流程失败")
+    return {
+        'runs': runs,
+        'median_s': round(statistics.median(timings), 5),
+        'p95_s': round(_percentile(timings, 95), 5),
+    }
+
+
+def bench_batch(posts, latency, image_dir):
+    """批量发布吞吐量"""
+    batch = [dict(EXAMPLE_POST, title=f"{EXAMPLE_POST['title']} #{i}", image_dir=image_dir)
+             for i in range(posts)]
+    session = rap.PublishSession(_bench_config())
+    session.driver = FakeDriver(latency=latency)
+    started = time.perf_counter()
+    results = [session.publish(data) for data in batch]
+    elapsed = time.perf_counter() - started
+    session.close()
+    if not all(r['success'] for r in results):
+        raise RuntimeError("假WebDriver上的批量发布失败")
+    return {
+        'posts': posts,
+        'elapsed_s': round(elapsed, 4),
+        'posts_per_s': round(posts / elapsed, 2),
+    }
+
+
+def bench_webdriver_commands(image_paths):
+    """每篇笔记的WebDriver命令数"""
+    driver = FakeDriver()
+    counter = rap.attach_command_counter(driver)
+    rap._publish_post(driver, image_paths, EXAMPLE_POST['title'], EXAMPLE_POST['description'],
+                      EXAMPLE_POST['hashtags'], _bench_config())
+    return {
+        'commands_per_post': counter.total,
+        'by_command': dict(sorted(counter.by_command.items())),
+    }
+
+
+def bench_backends(runs, latency, upload_delay, image_paths):
+    """两种浏览器后端的单篇发布耗时和往返次数"""
+    factories = {
+        'selenium': lambda: FakeDriver(latency=latency, upload_delay=upload_delay),
+        'cdp': lambda: fake_cdp_backend(latency=latency, upload_delay=upload_delay),
+    }
+    result = {}
+    for name, factory in factories.items():
+        timings = []
+        for _ in range(runs):
+            driver = factory()
+            counter = rap.attach_command_counter(driver)
+            started = time.perf_counter()
+            ok = rap._publish_post(driver, image_paths, EXAMPLE_POST['title'], EXAMPLE_POST['description'],
+                                   EXAMPLE_POST['hashtags'], _bench_config())
+            timings.append(time.perf_counter() - started)
+            if not ok:
+                raise RuntimeError(f"{name}后端上的发布流程失败")
+        result[name] = {
+            'median_s': round(statistics.median(timings), 5),
+            'p95_s': round(_percentile(timings, 95), 5),
+            'commands_per_post': counter.total,
+            'by_command': dict(sorted(counter.by_command.items())),
+        }
+    return result
+
+
+def bench_pipeline(posts, latency, upload_delay, image_dir):
+    """顺序发布与流水线发布（两个标签页）的批量吞吐量，两种后端"""
+    from pipeline import PublishPipeline
+
+    factories = {
+        'selenium': lambda: FakeDriver(latency=latency, upload_delay=upload_delay),
+        'cdp': lambda: fake_cdp_backend(latency=latency, upload_delay=upload_delay),
+    }
+    batch = [dict(EXAMPLE_POST, title=f"{EXAMPLE_POST['title']} #{i}", image_dir=image_dir)
+             for i in range(posts)]
+    result = {}
+    for name, factory in factories.items():
+        for window in (1, 2):
+            session = rap.PublishSession(_bench_config(pipeline={'enabled': window > 1, 'window': window}))
+            session.driver = factory()
+            started = time.perf_counter()
+            if window > 1:
+                results = list(PublishPipeline(session, window).run((data, None) for data in batch))
+            else:
+                results = [session.publish(data) for data in batch]
+            elapsed = time.perf_counter() - started
+            session.close()
+            if not all(r['success'] for r in results):
+                raise RuntimeError(f"{name}后端上的流水线发布失败（window={window}）")
+            if [r['title'] for r in results] != [data['title'] for data in batch]:
+                raise RuntimeError("流水线发布的结果顺序与输入不一致")
+            result[f'{name}_window_{window}'] = {
+                'posts': posts,
+                'elapsed_s': round(elapsed, 4),
+                'posts_per_s': round(posts / elapsed, 2),
+            }
+    return result
+
+
+def bench_emoji(repeat):
+    """emoji处理速度"""
+    text = (EXAMPLE_POST['title'] + EXAMPLE_POST['description']) * repeat
+    result = {}
+    for mode in ('remove', 'replace'):
+        started = time.perf_counter()
+        rap.process_emoji_text(text, mode=mode)
+        elapsed = time.perf_counter() - started
+        result[mode] = {'chars': len(text), 'chars_per_s': round(len(text) / elapsed)}
+    return result
+
+
+def bench_templates(rows):
+    """模板批量生成post_data的速度"""
+    import post_templates
+
+    template = post_templates.load_template(os.path.join(ROOT, 'data', 'templates', '论文解读.md'))
+    data = [{
+        'id': f'paper-{i}',
+        'title': f"论文解读 #{i}：小模型新趋势",
+        'link': f'https://arxiv.org/abs/2506.{i:05d}',
+        'institution': 'NVIDIA Research',
+        'background': 'Agentic AI 系统中，模型往往处理大量重复性、结构化子任务 🤖',
+        'motivation': '这些狭窄子任务并不一定需要通用能力\n小型语言模型即可胜任',
+        'highlights': ['**高效节流**：FLOPs 低10–70倍 ⚡', '**部署灵活**：能在边缘设备运行'],
+        'summary': '对追求资源效率的开发者具备现实指导意义 ✅',
+        'hashtags': '#自动化工具 #Python',
+    } for i in range(rows)]
+    result = {}
+    for mode in ('keep', 'replace'):
+        config = {'templates': {'emoji': mode, 'hashtag_sets': {'ai': ['#人工智能', '#大模型']}}}
+        started = time.perf_counter()
+        count = sum(1 for _ in post_templates.render_posts(template, data, config))
+        elapsed = time.perf_counter() - started
+        if count != rows:
+            raise RuntimeError("模板生成的笔记数与数据行数不一致")
+        result[mode] = {'posts': rows, 'elapsed_s': round(elapsed, 4), 'posts_per_s': round(rows / elapsed)}
+    return result
+
+
+def bench_chrome(image_paths, backend='selenium'):
+    """使用真实Chrome访问本地替身页面发布一次"""
+    from standin_page import start_standin_server
+    server, creation_url = start_standin_server(upload_delay_ms=300)
+    driver = None
+    try:
+        config = _bench_config(creation_url=creation_url, headless=True, backend=backend)
+        started = time.perf_counter()
+        driver = rap.init_browser(config)
+        browser_s = time.perf_counter() - started
+        counter = rap.attach_command_counter(driver)
+        started = time.perf_counter()
+        ok = rap._publish_post(driver, image_paths, EXAMPLE_POST['title'], EXAMPLE_POST['description'],
+                               EXAMPLE_POST['hashtags'], config)
+        return {
+            'success': ok,
+            'init_browser_s': round(browser_s, 3),
+            'median_s': round(time.perf_counter() - started, 3),
+            'commands_per_post': counter.total,
+        }
+    finally:
+        if driver is not None:
+            driver.quit()
+        server.shutdown()
+
+
+def _flatten(results, prefix=''):
+    """把嵌套结果展开为 {路径: 数值}，只保留有优化方向的指标"""
+    flat = {}
+    for key, value in results.items():
+        path = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(_flatten(value, path + '.'))
+        elif key in METRIC_DIRECTIONS and isinstance(value, (int, float)):
+            flat[path] = value
+    return flat
+
+
+def compare(current, baseline, threshold):
+    """与基准结果比较，返回退化的指标说明列表"""
+    regressions = []
+    base = _flatten(baseline['scenarios'])
+    for path, value in _flatten(current['scenarios']).items():
+        if path not in base or not base[path]:
+            continue
+        direction = METRIC_DIRECTIONS[path.rsplit('.', 1)[-1]]
+        change = (value - base[path]) / base[path]
+        if (direction == 'lower' and change > threshold) or (direction == 'higher' and -change > threshold):
+            regressions.append(f"{path}: {base[path]} -> {value} ({change:+.1%})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='发布流程的离线基准测试')
+    parser.add_argument('--output', default=os.path.join('benchmarks', 'results', 'latest.json'),
+                        help='结果输出路径')
+    parser.add_argument('--baseline', help='用于比较的基准结果文件')
+    parser.add_argument('--threshold', type=float, default=0.2, help='允许的退化比例，默认0.2（20%%）')
+    parser.add_argument('--runs', type=int, default=20, help='单篇发布场景的运行次数')
+    parser.add_argument('--posts', type=int, default=50, help='批量发布场景的笔记数')
+    parser.add_argument('--latency-ms', type=float, default=2.0, help='假WebDriver每个命令的模拟往返延迟')
+    parser.add_argument('--upload-delay-ms', type=float, default=250.0, help='backends和pipeline场景中模拟的图片上传耗时')
+    parser.add_argument('--chrome', action='store_true', help='额外运行真实Chrome + 本地替身页面的场景（两种后端）')
+    args = parser.parse_args()
+
+    latency = args.latency_ms / 1000.0
+    image_dir = _make_image_dir()
+    image_paths = rap.check_image_directory_and_get_paths(image_dir)
+
+    scenarios = {
+        'single_post': bench_single_post(args.runs, latency, image_paths),
+        'batch': bench_batch(args.posts, latency, image_dir),
+        'webdriver_commands': bench_webdriver_commands(image_paths),
+        'emoji': bench_emoji(repeat=200),
+        'backends': bench_backends(args.runs, latency, args.upload_delay_ms / 1000.0, image_paths),
+        'templates': bench_templates(rows=10000),
+        'pipeline': bench_pipeline(min(args.posts, 12), latency, args.upload_delay_ms / 1000.0, image_dir),
+    }
+    if args.chrome:
+        scenarios['chrome'] = {backend: bench_chrome(image_paths, backend) for backend in rap.BACKENDS}
+
+    report = {
+        'meta': {
+            'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'latency_ms': args.latency_ms,
+        },
+        'scenarios': scenarios,
+    }
+
+    output_dir = os.path.dirname(args.output)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            regressions = compare(report, json.load(f), args.threshold)
+        if regressions:
+            print("性能退化：\n" + "\n".join(regressions))
+            sys.exit(1)
+        print("与基准相比没有超过阈值的退化")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+"""
+本地的创作平台发布页面替身
+
+提供一个与 `_publish_post()` 使用的元素定位一致的页面：文件上传控件、标题输入框、
+正文编辑器、“发布”按钮，选择文件后逐张渲染缩略图（可设置模拟上传耗时），点击发布后显示“发布成功”。
+页面引用一个可缓存的脚本包（/static/app.js，可设置模拟下载耗时），用于比较冷缓存和预热缓存的首次加载。
+配合真实Chrome使用时，将配置中的 creation_url 指向本服务即可。
+
+单独运行：
+    python benchmarks/standin_page.py --port 8765
+"""
+
+import time
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+PAGE_TEMPLATE = """<!DOCTYPE html>
+<html lang="zh-CN">
+<head><meta charset="utf-8"><title>发布笔记（本地替身）</title><script src="/static/app.js"></script></head>
+<body>
+<div class="upload-wrapper"><input class="upload-input" type="file" multiple accept=".jpg,.jpeg,.png,.webp"></div>
+<div class="img-list"></div>
+<input class="title-input" type="text" placeholder="填写标题会有更多赞哦～">
+<div class="editor" contenteditable="true" data-placeholder="输入正文描述，真诚有价值的分享予人温暖"></div>
+<button class="publish-btn">发布</button>
+<script>
+var uploadDelay = __UPLOAD_DELAY_MS__;
+var input = document.querySelector('.upload-input');
+var list = document.querySelector('.img-list');
+input.addEventListener('change', function () {
+    Array.prototype.forEach.call(input.files, function (file, index) {
+        var item = document.createElement('div');
+        item.className = 'img-container uploading';
+        list.appendChild(item);
+        setTimeout(function () {
+            var img = document.createElement('img');
+            img.alt = file.name;
+            item.appendChild(img);
+            item.className = 'img-container';
+        }, uploadDelay * (index + 1) / input.files.length);
+    });
+});
+document.querySelector('.publish-btn').addEventListener('click', function () {
+    var toast = document.createElement('div');
+    toast.className = 'toast';
+    toast.textContent = '发布成功';
+    document.body.appendChild(toast);
+});
+</script>
+</body>
+</html>
+"""
+
+
+# 模拟创作平台的脚本包大小
+ASSET_BYTES = 512 * 1024
+
+
+def _make_handler(upload_delay_ms: int, asset_delay_ms: int = 0):
+    page = PAGE_TEMPLATE.replace('__UPLOAD_DELAY_MS__', str(int(upload_delay_ms))).encode('utf-8')
+    asset = b'/*' + b' ' * (ASSET_BYTES - 4) + b'*/'
+
+    class StandinHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.startswith('/static/'):
+                time.sleep(asset_delay_ms / 1000.0)
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/javascript')
+                self.send_header('Cache-Control', 'public, max-age=86400, immutable')
+                self.send_header('Content-Length', str(len(asset)))
+                self.end_headers()
+                self.wfile.write(asset)
+                return
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html; charset=utf-8')
+            self.send_header('Content-Length', str(len(page)))
+            self.end_headers()
+            self.wfile.write(page)
+
+        def log_message(self, format, *args):
+            pass
+
+    return StandinHandler
+
+
+def start_standin_server(port: int = 0, upload_delay_ms: int = 300, asset_delay_ms: int = 0):
+    """在后台线程中启动替身页面服务
+
+    Returns:
+        (server, creation_url)，使用完毕后调用 server.shutdown()
+    """
+    server = ThreadingHTTPServer(('127.0.0.1', port), _make_handler(upload_delay_ms, asset_delay_ms))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    creation_url = f"http://127.0.0.1:{server.server_address[1]}/publish/publish?from=menu&target=post"
+    return server, creation_url
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='创作平台发布页面的本地替身')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--upload-delay-ms', type=int, default=300)
+    parser.add_argument('--asset-delay-ms', type=int, default=0)
+    args = parser.parse_args()
+    server, url = start_standin_server(args.port, args.upload_delay_ms, args.asset_delay_ms)
+    print(f"替身页面: {url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
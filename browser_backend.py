@@ -0,0 +1,724 @@
+# -*- coding: utf-8 -*-
+"""
+小红书自动发布工具的浏览器后端
+
+发布流程只通过 BrowserBackend 的几个操作访问浏览器：navigate（打开页面）、find（查找元素）、
+set_files（选择上传文件）、run_script（执行脚本）、wait_for（等待页面条件）、click、type_text、
+screenshot、page_source 和 get_cookies/set_cookies，以及标签页操作 current_tab/new_tab/switch_tab/close_tab。
+元素一律用XPath定位，脚本参数和返回值都是JSON数据。
+
+两种实现：
+- SeleniumBackend：包装Selenium WebDriver，每个操作是一次到chromedriver的HTTP往返，
+  wait_for按poll_frequency轮询
+- CdpBackend：直接启动Chrome，通过一个常驻的websocket连接使用DevTools协议（CDP）。
+  wait_for只发出一次Runtime.evaluate：页面内用MutationObserver监听DOM变化，条件满足时立即返回，
+  不在进程和浏览器之间轮询；当前URL由页面导航事件维护，读取不需要往返。
+  需要安装 websocket-client（可选依赖），未安装时回退到Selenium。
+"""
+
+import os
+import json
+import time
+import queue
+import shutil
+import itertools
+import threading
+import contextlib
+import subprocess
+from typing import List, Dict, Optional, Any
+
+from logging_config import logger
+
+BACKENDS = ('selenium', 'cdp')
+
+
+class WaitTimeout(Exception):
+    """等待页面条件超时"""
+
+
+class ElementNotFoundError(LookupError):
+    """未找到元素"""
+
+
+class CdpError(RuntimeError):
+    """DevTools协议命令返回错误，或页面脚本抛出异常"""
+
+
+class CdpConnectionError(ConnectionError):
+    """与浏览器的websocket连接已断开"""
+
+
+# === 命令计数 ===
+class CommandCounter:
+    """统计发给浏览器的命令数量（每个命令都是一次往返）"""
+
+    def __init__(self):
+        self.total = 0
+        self.by_command = {}
+
+    def record(self, command: str) -> None:
+        self.total += 1
+        self.by_command[command] = self.by_command.get(command, 0) + 1
+
+
+def attach_command_counter(driver) -> CommandCounter:
+    """为WebDriver实例或后端挂载命令计数器，重复调用返回同一个计数器"""
+    if isinstance(driver, BrowserBackend) and not isinstance(driver, SeleniumBackend):
+        return driver.counter
+    if isinstance(driver, SeleniumBackend):
+        driver = driver.driver
+    counter = getattr(driver, '_rednote_command_counter', None)
+    if counter is None:
+        counter = CommandCounter()
+        execute = driver.execute
+
+        def counted_execute(driver_command, params=None):
+            counter.record(driver_command)
+            return execute(driver_command, params)
+
+        driver.execute = counted_execute
+        driver._rednote_command_counter = counter
+    return counter
+
+
+# === 页面脚本 ===
+# 按XPath查找元素
+_FIND_JS = """
+return document.evaluate(arguments[0], document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+"""
+
+# 元素存在
+PRESENT_JS = """
+return !!document.evaluate(arguments[0], document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+"""
+
+# 元素可见且未禁用（与Selenium的element_to_be_clickable相同）
+CLICKABLE_JS = """
+var el = document.evaluate(arguments[0], document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+return !!el && !el.disabled && el.getClientRects().length > 0;
+"""
+
+# 点击元素，未找到时返回false
+_CLICK_JS = """
+var el = document.evaluate(arguments[0], document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+if (!el) { return false; }
+el.scrollIntoView({block: 'center'});
+el.click();
+return true;
+"""
+
+# 聚焦并清空输入元素（input/textarea或contentEditable），返回是否为contentEditable
+_FOCUS_CLEAR_JS = """
+var el = arguments[0];
+if (typeof el === 'string') {
+    el = document.evaluate(el, document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+}
+if (!el) { return null; }
+var editable = el.tagName === 'DIV' || el.getAttribute('contenteditable') === 'true';
+if (editable) { el.textContent = ''; } else { el.value = ''; }
+el.focus();
+return editable;
+"""
+
+# 在页面内等待条件成立：DOM变化时立即检查，另有低频定时检查覆盖只改变URL的情况；
+# 条件成立时返回其结果，超时返回null
+_AWAIT_JS = """function (check, args, timeoutMs) {
+    return new Promise(function (resolve, reject) {
+        var observer = null, timer = null, deadline = null;
+        function done() {
+            if (observer) { observer.disconnect(); }
+            clearInterval(timer);
+            clearTimeout(deadline);
+        }
+        function test() {
+            var value;
+            try {
+                value = check.apply(null, args);
+            } catch (e) {
+                done();
+                reject(e);
+                return;
+            }
+            if (value) {
+                done();
+                resolve(value);
+            }
+        }
+        observer = new MutationObserver(test);
+        observer.observe(document, {childList: true, subtree: true, attributes: true, characterData: true});
+        timer = setInterval(test, 200);
+        deadline = setTimeout(function () { done(); resolve(null); }, timeoutMs);
+        test();
+    });
+}"""
+
+
+# === 后端接口 ===
+class BrowserBackend:
+    """浏览器操作接口"""
+
+    name = None
+
+    @property
+    def current_url(self) -> str:
+        raise NotImplementedError
+
+    def navigate(self, url: str) -> None:
+        """打开页面"""
+        raise NotImplementedError
+
+    def find(self, xpath: str):
+        """查找元素，返回元素句柄，未找到时返回None"""
+        raise NotImplementedError
+
+    def set_files(self, xpath: str, paths: List[str]) -> None:
+        """为文件输入控件选择文件"""
+        raise NotImplementedError
+
+    def run_script(self, script: str, *args):
+        """执行脚本（脚本中用arguments[i]读取参数）并返回结果"""
+        raise NotImplementedError
+
+    def wait_for(self, condition: str, *args, timeout: float = 15, poll: float = 0.5):
+        """等待条件脚本返回真值并返回该值，超时抛出WaitTimeout"""
+        raise NotImplementedError
+
+    def click(self, xpath: str) -> None:
+        raise NotImplementedError
+
+    def type_text(self, target, text: str) -> None:
+        """清空输入元素（XPath或元素句柄）后模拟键盘输入"""
+        raise NotImplementedError
+
+    def screenshot(self) -> str:
+        """页面截图（base64编码的PNG）"""
+        raise NotImplementedError
+
+    def page_source(self) -> str:
+        raise NotImplementedError
+
+    def get_cookies(self) -> List[Dict[str, Any]]:
+        """Selenium格式的Cookie列表"""
+        raise NotImplementedError
+
+    def set_cookies(self, cookies: List[Dict[str, Any]]) -> None:
+        """注入Selenium格式的Cookie"""
+        raise NotImplementedError
+
+    def current_tab(self) -> str:
+        """当前标签页的句柄"""
+        raise NotImplementedError
+
+    def new_tab(self) -> str:
+        """打开一个空白标签页并切换到该标签页，返回其句柄"""
+        raise NotImplementedError
+
+    def switch_tab(self, handle: str) -> None:
+        """之后的操作都作用于该标签页"""
+        raise NotImplementedError
+
+    def close_tab(self, handle: str) -> None:
+        """关闭标签页（不能关闭最后一个标签页）；关闭当前标签页后需要切换到其他标签页"""
+        raise NotImplementedError
+
+    def quit(self) -> None:
+        raise NotImplementedError
+
+
+def as_backend(driver) -> BrowserBackend:
+    """返回驱动对应的后端：后端原样返回，Selenium WebDriver包装为SeleniumBackend（每个驱动只包装一次）"""
+    if isinstance(driver, BrowserBackend):
+        return driver
+    backend = getattr(driver, '_rednote_backend', None)
+    if backend is None:
+        backend = SeleniumBackend(driver)
+        driver._rednote_backend = backend
+    return backend
+
+
+# === Selenium ===
+class SeleniumBackend(BrowserBackend):
+    """通过Selenium WebDriver操作浏览器"""
+
+    name = 'selenium'
+
+    def __init__(self, driver):
+        self.driver = driver
+
+    @property
+    def counter(self) -> CommandCounter:
+        return attach_command_counter(self.driver)
+
+    @property
+    def current_url(self) -> str:
+        return self.driver.current_url
+
+    def navigate(self, url: str) -> None:
+        self.driver.get(url)
+
+    def find(self, xpath: str):
+        from selenium.webdriver.common.by import By
+        elements = self.driver.find_elements(By.XPATH, xpath)
+        return elements[0] if elements else None
+
+    def _element(self, target):
+        if not isinstance(target, str):
+            return target
+        from selenium.webdriver.common.by import By
+        return self.driver.find_element(By.XPATH, target)
+
+    def set_files(self, xpath: str, paths: List[str]) -> None:
+        element = self._element(xpath)
+        # 确保上传元素可见，send_keys才能选择文件
+        self.driver.execute_script(
+            "arguments[0].style.display = 'block'; arguments[0].style.visibility = 'visible';", element)
+        element.send_keys("\n".join(paths))
+
+    def run_script(self, script: str, *args):
+        return self.driver.execute_script(script, *args)
+
+    def wait_for(self, condition: str, *args, timeout: float = 15, poll: float = 0.5):
+        from selenium.webdriver.support.ui import WebDriverWait
+        from selenium.common.exceptions import TimeoutException
+        try:
+            return WebDriverWait(self.driver, timeout, poll_frequency=poll).until(
+                lambda d: d.execute_script(condition, *args))
+        except TimeoutException:
+            raise WaitTimeout(f"{timeout} 秒内页面条件未满足")
+
+    def click(self, xpath: str) -> None:
+        self._element(xpath).click()
+
+    def type_text(self, target, text: str) -> None:
+        element = self._element(target)
+        editable = self.driver.execute_script(_FOCUS_CLEAR_JS, element)
+        if not editable:
+            element.clear()
+        element.send_keys(text)
+
+    def screenshot(self) -> str:
+        return self.driver.get_screenshot_as_base64()
+
+    def page_source(self) -> str:
+        return self.driver.page_source
+
+    def get_cookies(self) -> List[Dict[str, Any]]:
+        return self.driver.get_cookies()
+
+    def set_cookies(self, cookies: List[Dict[str, Any]]) -> None:
+        """优先通过DevTools协议一次注入；否则逐个add_cookie（需要先打开Cookie所属域名的页面）"""
+        if hasattr(self.driver, 'execute_cdp_cmd'):
+            from session import _to_cdp_cookie
+            self.driver.execute_cdp_cmd('Network.setCookies', {'cookies': [_to_cdp_cookie(c) for c in cookies]})
+            return
+        for cookie in cookies:
+            self.driver.add_cookie(cookie)
+
+    def current_tab(self) -> str:
+        return self.driver.current_window_handle
+
+    def new_tab(self) -> str:
+        self.driver.switch_to.new_window('tab')
+        return self.driver.current_window_handle
+
+    def switch_tab(self, handle: str) -> None:
+        self.driver.switch_to.window(handle)
+
+    def close_tab(self, handle: str) -> None:
+        self.driver.switch_to.window(handle)
+        self.driver.close()
+
+    def quit(self) -> None:
+        self.driver.quit()
+
+
+# === DevTools协议 ===
+class _Pending:
+    __slots__ = ('event', 'result', 'error')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class CdpConnection:
+    """到一个页面的DevTools协议websocket连接
+
+    后台线程读取消息：命令结果交给等待中的调用，事件分发给订阅者。
+    """
+
+    def __init__(self, ws_url: str, connect_timeout: float = 10):
+        try:
+            import websocket
+        except ImportError:
+            raise RuntimeError("cdp后端需要安装 websocket-client：pip install websocket-client")
+        self.url = ws_url
+        self.ws = websocket.create_connection(ws_url, timeout=connect_timeout, suppress_origin=True,
+                                              enable_multithread=True)
+        self.ws.settimeout(None)
+        self.closed = False
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._handlers = {}
+        self._reader = threading.Thread(target=self._read_loop, name='cdp-reader', daemon=True)
+        self._reader.start()
+
+    def call(self, method: str, params: Optional[Dict[str, Any]] = None, timeout: float = 30) -> Dict[str, Any]:
+        """发送命令并等待结果"""
+        if self.closed:
+            raise CdpConnectionError("与浏览器的连接已断开")
+        message_id = next(self._ids)
+        pending = _Pending()
+        with self._lock:
+            self._pending[message_id] = pending
+        try:
+            self.ws.send(json.dumps({'id': message_id, 'method': method, 'params': params or {}}))
+        except Exception as e:
+            with self._lock:
+                self._pending.pop(message_id, None)
+            raise CdpConnectionError(f"发送命令失败: {str(e)}")
+        if not pending.event.wait(timeout):
+            with self._lock:
+                self._pending.pop(message_id, None)
+            raise CdpError(f"{method} 在 {timeout} 秒内没有响应")
+        if pending.error is not None:
+            raise pending.error
+        return pending.result
+
+    @property
+    def target_id(self) -> str:
+        """连接的页面（标签页）ID"""
+        return self.url.rsplit('/', 1)[-1]
+
+    def new_page(self) -> 'CdpConnection':
+        """在同一个浏览器中打开一个空白标签页，返回到该标签页的连接"""
+        import urllib.request
+        host = self.url.split('/')[2]
+        request = urllib.request.Request(f'http://{host}/json/new?about:blank', method='PUT')
+        with urllib.request.urlopen(request, timeout=10) as response:
+            target = json.loads(response.read().decode('utf-8'))
+        return type(self)(target['webSocketDebuggerUrl'])
+
+    def on(self, method: str, callback) -> None:
+        """订阅事件，callback在读取线程中以事件参数调用"""
+        self._handlers.setdefault(method, []).append(callback)
+
+    @contextlib.contextmanager
+    def expect(self, method: str):
+        """在with块内收集事件，用于先订阅再发出触发事件的命令
+
+        Yields:
+            queue.Queue，事件参数按到达顺序放入
+        """
+        events = queue.Queue()
+        self.on(method, events.put)
+        try:
+            yield events
+        finally:
+            self._handlers[method].remove(events.put)
+
+    def close(self) -> None:
+        self.closed = True
+        try:
+            self.ws.close()
+        except Exception:
+            pass
+
+    def _read_loop(self) -> None:
+        while True:
+            try:
+                data = json.loads(self.ws.recv())
+            except Exception as e:
+                self._fail_all(CdpConnectionError(f"与浏览器的连接已断开: {str(e) or type(e).__name__}"))
+                return
+            if 'id' in data:
+                with self._lock:
+                    pending = self._pending.pop(data['id'], None)
+                if pending is None:
+                    continue
+                if 'error' in data:
+                    pending.error = CdpError(data['error'].get('message', str(data['error'])))
+                else:
+                    pending.result = data.get('result', {})
+                pending.event.set()
+            else:
+                for callback in list(self._handlers.get(data.get('method'), ())):
+                    try:
+                        callback(data.get('params', {}))
+                    except Exception as e:
+                        logger.debug("处理CDP事件出错: %s", e)
+
+    def _fail_all(self, error: Exception) -> None:
+        self.closed = True
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        for item in pending.values():
+            item.error = error
+            item.event.set()
+
+
+# 脚本执行上下文因页面导航被销毁时的错误信息
+_CONTEXT_LOST_MARKERS = ('context was destroyed', 'cannot find context', 'navigated or closed')
+# 常见的Chrome可执行文件名
+_CHROME_NAMES = ('google-chrome', 'google-chrome-stable', 'chromium', 'chromium-browser', 'chrome')
+_CHROME_PATHS = (
+    '/Applications/Google Chrome.app/Contents/MacOS/Google Chrome',
+    r'C:\Program Files\Google\Chrome\Application\chrome.exe',
+    r'C:\Program Files (x86)\Google\Chrome\Application\chrome.exe',
+)
+
+
+def find_chrome(chrome_path: Optional[str] = None) -> str:
+    """返回Chrome可执行文件路径"""
+    if chrome_path:
+        return chrome_path
+    for name in _CHROME_NAMES:
+        path = shutil.which(name)
+        if path:
+            return path
+    for path in _CHROME_PATHS:
+        if os.path.exists(path):
+            return path
+    raise FileNotFoundError("未找到Chrome，请在browser.chrome_path中指定路径")
+
+
+class CdpBackend(BrowserBackend):
+    """通过DevTools协议直接操作Chrome
+
+    每个标签页使用一个独立的连接，切换标签页不需要往返。
+
+    Args:
+        connection: 第一个标签页的CdpConnection（或实现相同call/on/expect/new_page接口的对象）
+        process: 由launch启动的Chrome进程，quit时结束
+        temp_profile: 由launch创建的临时用户数据目录，quit时删除
+        command_timeout: 单个命令的最长等待时间（秒）
+    """
+
+    name = 'cdp'
+
+    def __init__(self, connection, process=None, temp_profile: Optional[str] = None, command_timeout: float = 30):
+        self.conn = connection
+        self.process = process
+        self.temp_profile = temp_profile
+        self.command_timeout = command_timeout
+        self.counter = CommandCounter()
+        self._tabs = {}
+        self._urls = {}
+        self._tab = self._attach(connection)
+
+    @classmethod
+    def launch(cls, arguments: List[str], user_data_dir: Optional[str] = None,
+               chrome_path: Optional[str] = None, startup_timeout: float = 30) -> 'CdpBackend':
+        """启动Chrome并连接到第一个页面
+
+        Args:
+            arguments: Chrome启动参数（不含--user-data-dir和--remote-debugging-port）
+            user_data_dir: 用户数据目录，为None时使用临时目录
+            chrome_path: Chrome可执行文件路径，为None时自动查找
+        """
+        import tempfile
+        import urllib.request
+
+        temp_profile = None
+        if user_data_dir is None:
+            user_data_dir = temp_profile = tempfile.mkdtemp(prefix='rednote_cdp_')
+        port_file = os.path.join(user_data_dir, 'DevToolsActivePort')
+        if os.path.exists(port_file):
+            os.remove(port_file)
+        command = [find_chrome(chrome_path), *arguments, f'--user-data-dir={user_data_dir}',
+                   '--remote-debugging-port=0', 'about:blank']
+        process = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            # Chrome启动后把实际端口写入DevToolsActivePort
+            deadline = time.monotonic() + startup_timeout
+            port = None
+            while port is None:
+                if process.poll() is not None:
+                    raise RuntimeError(f"Chrome启动失败，退出码 {process.returncode}")
+                if time.monotonic() > deadline:
+                    raise TimeoutError("等待Chrome启动超时")
+                try:
+                    with open(port_file, 'r') as f:
+                        port = int(f.readline().strip())
+                except (OSError, ValueError):
+                    time.sleep(0.05)
+            with urllib.request.urlopen(f'http://127.0.0.1:{port}/json/list', timeout=startup_timeout) as response:
+                targets = json.loads(response.read().decode('utf-8'))
+            page = next(t for t in targets if t.get('type') == 'page')
+            return cls(CdpConnection(page['webSocketDebuggerUrl']), process=process, temp_profile=temp_profile)
+        except Exception:
+            process.kill()
+            if temp_profile:
+                shutil.rmtree(temp_profile, ignore_errors=True)
+            raise
+
+    # --- 协议 ---
+    def send(self, method: str, params: Optional[Dict[str, Any]] = None,
+             timeout: Optional[float] = None) -> Dict[str, Any]:
+        """发送一个DevTools协议命令"""
+        self.counter.record(method)
+        return self.conn.call(method, params, timeout or self.command_timeout)
+
+    def execute_cdp_cmd(self, cmd: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        """与Selenium Chrome驱动的同名方法兼容（用于注入Cookie和屏蔽请求）"""
+        return self.send(cmd, params)
+
+    def _attach(self, connection) -> str:
+        """登记一个标签页的连接，由导航事件维护其URL"""
+        handle = connection.target_id
+        self._tabs[handle] = connection
+        self._urls[handle] = 'about:blank'
+
+        def on_frame_navigated(params):
+            frame = params.get('frame', {})
+            if not frame.get('parentId'):
+                self._urls[handle] = frame.get('url', self._urls[handle])
+
+        connection.on('Page.frameNavigated', on_frame_navigated)
+        connection.on('Page.navigatedWithinDocument', lambda params: self._urls.__setitem__(handle, params['url']))
+        self.counter.record('Page.enable')
+        connection.call('Page.enable', None, self.command_timeout)
+        return handle
+
+    @staticmethod
+    def _call_expression(script: str, args) -> str:
+        return f"(function () {{\n{script}\n}}).apply(null, {json.dumps(list(args), ensure_ascii=False)})"
+
+    def _evaluate(self, expression: str, by_value: bool = True, timeout: Optional[float] = None) -> Dict[str, Any]:
+        result = self.send('Runtime.evaluate', {'expression': expression, 'returnByValue': by_value,
+                                                'awaitPromise': True}, timeout=timeout)
+        if 'exceptionDetails' in result:
+            details = result['exceptionDetails']
+            description = (details.get('exception') or {}).get('description') or details.get('text')
+            raise CdpError(f"页面脚本出错: {description}")
+        return result['result']
+
+    # --- 后端接口 ---
+    @property
+    def current_url(self) -> str:
+        if self.conn.closed:
+            raise CdpConnectionError("与浏览器的连接已断开")
+        return self._urls[self._tab]
+
+    def navigate(self, url: str) -> None:
+        # 先订阅再导航，DOMContentLoaded事件到达即返回，不需要轮询
+        with self.conn.expect('Page.domContentEventFired') as loaded:
+            result = self.send('Page.navigate', {'url': url})
+            if result.get('errorText'):
+                raise CdpError(f"打开页面失败: {result['errorText']}")
+            self._urls[self._tab] = url
+            try:
+                loaded.get(timeout=self.command_timeout)
+            except queue.Empty:
+                logger.debug("等待页面加载事件超时: %s", url)
+
+    def find(self, xpath: str):
+        result = self._evaluate(self._call_expression(_FIND_JS, [xpath]), by_value=False)
+        return result.get('objectId')
+
+    def set_files(self, xpath: str, paths: List[str]) -> None:
+        object_id = self.find(xpath)
+        if object_id is None:
+            raise ElementNotFoundError(f"未找到元素: {xpath}")
+        # 文件输入控件不需要可见
+        self.send('DOM.setFileInputFiles', {'files': list(paths), 'objectId': object_id})
+
+    def run_script(self, script: str, *args):
+        return self._evaluate(self._call_expression(script, args)).get('value')
+
+    def wait_for(self, condition: str, *args, timeout: float = 15, poll: float = 0.5):
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise WaitTimeout(f"{timeout} 秒内页面条件未满足")
+            expression = (f"({_AWAIT_JS})(function () {{\n{condition}\n}}, "
+                          f"{json.dumps(list(args), ensure_ascii=False)}, {int(remaining * 1000)})")
+            try:
+                value = self._evaluate(expression, timeout=remaining + self.command_timeout).get('value')
+            except CdpError as e:
+                # 等待期间页面发生导航，在新页面上继续等待
+                if not any(marker in str(e).lower() for marker in _CONTEXT_LOST_MARKERS):
+                    raise
+                time.sleep(0.05)
+                continue
+            if value:
+                return value
+            raise WaitTimeout(f"{timeout} 秒内页面条件未满足")
+
+    def click(self, xpath: str) -> None:
+        if not self.run_script(_CLICK_JS, xpath):
+            raise ElementNotFoundError(f"未找到元素: {xpath}")
+
+    def type_text(self, target, text: str) -> None:
+        if not isinstance(target, str):
+            raise TypeError("cdp后端只能通过XPath定位输入元素")
+        if self.run_script(_FOCUS_CLEAR_JS, target) is None:
+            raise ElementNotFoundError(f"未找到元素: {target}")
+        self.send('Input.insertText', {'text': text})
+
+    def screenshot(self) -> str:
+        return self.send('Page.captureScreenshot', {'format': 'png'})['data']
+
+    def page_source(self) -> str:
+        return self.run_script("return document.documentElement.outerHTML;")
+
+    def get_cookies(self) -> List[Dict[str, Any]]:
+        cookies = []
+        for cookie in self.send('Network.getAllCookies')['cookies']:
+            item = {key: cookie[key] for key in ('name', 'value', 'domain', 'path', 'secure', 'httpOnly')}
+            if not cookie.get('session') and cookie.get('expires', -1) > 0:
+                item['expiry'] = int(cookie['expires'])
+            if cookie.get('sameSite'):
+                item['sameSite'] = cookie['sameSite']
+            cookies.append(item)
+        return cookies
+
+    def set_cookies(self, cookies: List[Dict[str, Any]]) -> None:
+        from session import _to_cdp_cookie
+        self.send('Network.setCookies', {'cookies': [_to_cdp_cookie(c) for c in cookies]})
+
+    def current_tab(self) -> str:
+        return self._tab
+
+    def new_tab(self) -> str:
+        self.counter.record('Target.createTarget')
+        handle = self._attach(self.conn.new_page())
+        self.switch_tab(handle)
+        return handle
+
+    def switch_tab(self, handle: str) -> None:
+        if handle not in self._tabs:
+            raise CdpConnectionError(f"标签页已关闭: {handle}")
+        self._tab = handle
+        self.conn = self._tabs[handle]
+
+    def close_tab(self, handle: str) -> None:
+        if len(self._tabs) <= 1:
+            raise ValueError("不能关闭最后一个标签页")
+        connection = self._tabs.pop(handle)
+        self._urls.pop(handle, None)
+        try:
+            self.counter.record('Page.close')
+            connection.call('Page.close', None, self.command_timeout)
+        except CdpConnectionError:
+            pass
+        connection.close()
+
+    def quit(self) -> None:
+        try:
+            if not self.conn.closed:
+                self.conn.call('Browser.close', timeout=5)
+        except Exception as e:
+            logger.debug("关闭浏览器时出错: %s", e)
+        for connection in self._tabs.values():
+            connection.close()
+        if self.process is not None:
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+        if self.temp_profile:
+            shutil.rmtree(self.temp_profile, ignore_errors=True)
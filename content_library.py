@@ -0,0 +1,425 @@
+# -*- coding: utf-8 -*-
+"""
+小红书自动发布工具的内容库索引
+
+每个笔记文件夹对应一份清单（manifest），记录其中每张图片的大小、修改时间、格式和尺寸。
+图片格式和尺寸只读取文件头获得，不解码整张图片；再次扫描时大小和修改时间未变的图片直接使用清单中的结果。
+图片按自然顺序排序（2.jpg 在 10.jpg 之前），无效的图片（文件头损坏、尺寸或大小超出限制）不会被上传。
+
+内容库根目录下的每个子文件夹是一篇笔记，ContentLibrary 把所有文件夹的清单汇总成一个索引文件，
+只重新扫描修改时间变化过的文件夹，或其中有图片被原地覆盖（大小或修改时间变化）的文件夹。
+配置了 root 时，发布和预检通过共享的 ContentLibrary 实例取图片（见 lookup_folder），
+根目录下的笔记文件夹只需查找索引，并检查索引中各图片的大小和修改时间。
+lookup() 重新扫描的结果只标记索引需要保存，由 refresh()、flush() 或进程退出时一次写入。
+
+单独运行（建立或更新索引并输出摘要）：
+    python content_library.py posts/
+"""
+
+import os
+import re
+import json
+import atexit
+import struct
+import threading
+from typing import List, Dict, Optional, Any
+
+from logging_config import logger
+
+# === 默认内容库参数 ===
+LIBRARY_DEFAULTS = {
+    'persist_manifest': False,  # 是否把清单写入笔记文件夹（关闭时只在进程内缓存）
+    'manifest_name': '.rednote_manifest.json',  # 笔记文件夹中的清单文件名
+    'index_name': '.rednote_library.json',  # 内容库根目录中的索引文件名
+    'max_images': 18,  # 每篇笔记最多上传的图片数，超出的图片按顺序舍弃
+    'max_file_bytes': 32 * 1024 * 1024,  # 单张图片的大小上限（字节）
+    'min_dimension': 0,  # 图片短边的最小像素，0表示不限制
+    'root': None,  # 内容库根目录，设置后其子文件夹的图片从共享的内容库索引中查找
+    'resize_to': None,  # 上传前缩小到的最长边像素（启用image_preprocess时自动设置），尺寸下限按缩小后的尺寸检查
+}
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.webp')
+
+# 清单格式变化时递增，使旧清单失效
+_MANIFEST_VERSION = 1
+# 影响单张图片校验结果的参数
+_LIMIT_KEYS = ('max_file_bytes', 'min_dimension', 'resize_to')
+
+# 含尺寸信息的JPEG帧起始标记（SOF0-SOF15，不含DHT、JPG和DAC）
+_JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+# 没有长度字段的JPEG标记
+_JPEG_STANDALONE_MARKERS = {0x01, 0xD0, 0xD1, 0xD2, 0xD3, 0xD4, 0xD5, 0xD6, 0xD7, 0xD8}
+
+# 进程内缓存：文件夹绝对路径 -> 清单
+_manifest_cache: Dict[str, Dict[str, Any]] = {}
+# 共享的内容库实例：根目录绝对路径 -> ContentLibrary
+_libraries: Dict[str, 'ContentLibrary'] = {}
+_libraries_lock = threading.Lock()
+
+
+def get_library_settings(config: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """合并LIBRARY_DEFAULTS和配置中的content_library参数
+
+    启用image_preprocess时上传的是预处理后的图片：原图不检查大小上限（预处理会重新压缩），
+    尺寸下限按缩小到max_dimension之后的尺寸检查。
+    """
+    settings = LIBRARY_DEFAULTS.copy()
+    settings.update((config or {}).get('content_library') or {})
+    preprocess = (config or {}).get('image_preprocess') or {}
+    if preprocess.get('enabled'):
+        from image_preprocess import PREPROCESS_DEFAULTS
+        settings['max_file_bytes'] = 0
+        settings['resize_to'] = preprocess.get('max_dimension', PREPROCESS_DEFAULTS['max_dimension'])
+    return settings
+
+
+def natural_key(name: str) -> List[Any]:
+    """自然排序键：数字部分按数值比较，其余部分忽略大小写"""
+    return [int(part) if part.isdigit() else part.lower() for part in re.split(r'(\d+)', name)]
+
+
+# === 读取图片文件头 ===
+def _read_jpeg_size(f) -> tuple:
+    f.seek(2)
+    while True:
+        byte = f.read(1)
+        while byte and byte != b'\xff':
+            byte = f.read(1)
+        while byte == b'\xff':
+            byte = f.read(1)
+        if not byte:
+            raise ValueError("JPEG文件中没有找到帧头")
+        marker = byte[0]
+        if marker in _JPEG_STANDALONE_MARKERS:
+            continue
+        if marker == 0xD9:
+            raise ValueError("JPEG文件中没有找到帧头")
+        length_bytes = f.read(2)
+        if len(length_bytes) < 2:
+            raise ValueError("JPEG文件不完整")
+        length = struct.unpack('>H', length_bytes)[0]
+        if length < 2:
+            raise ValueError("JPEG文件头损坏")
+        if marker in _JPEG_SOF_MARKERS:
+            data = f.read(5)
+            if len(data) < 5:
+                raise ValueError("JPEG帧头不完整")
+            height, width = struct.unpack('>HH', data[1:5])
+            return width, height
+        f.seek(length - 2, os.SEEK_CUR)
+
+
+def read_image_info(path: str) -> Dict[str, Any]:
+    """只读取文件头，返回图片格式和尺寸
+
+    Returns:
+        {'format': 'PNG' | 'JPEG' | 'WEBP', 'width': int, 'height': int}
+
+    Raises:
+        ValueError: 不是支持的图片格式或文件头损坏
+    """
+    with open(path, 'rb') as f:
+        head = f.read(32)
+        if head.startswith(b'\x89PNG\r\n\x1a\n'):
+            if len(head) < 24 or head[12:16] != b'IHDR':
+                raise ValueError("PNG文件头损坏")
+            width, height = struct.unpack('>II', head[16:24])
+            image_format = 'PNG'
+        elif head.startswith(b'\xff\xd8'):
+            width, height = _read_jpeg_size(f)
+            image_format = 'JPEG'
+        elif head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+            chunk = head[12:16]
+            if chunk == b'VP8 ' and len(head) >= 30:
+                width, height = (v & 0x3FFF for v in struct.unpack('<HH', head[26:30]))
+            elif chunk == b'VP8L' and len(head) >= 25:
+                bits = struct.unpack('<I', head[21:25])[0]
+                width, height = (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+            elif chunk == b'VP8X' and len(head) >= 30:
+                width = int.from_bytes(head[24:27], 'little') + 1
+                height = int.from_bytes(head[27:30], 'little') + 1
+            else:
+                raise ValueError("WEBP文件头损坏")
+            image_format = 'WEBP'
+        else:
+            raise ValueError("不是支持的图片格式（PNG、JPEG、WEBP）")
+    if not width or not height:
+        raise ValueError("图片尺寸无效")
+    return {'format': image_format, 'width': width, 'height': height}
+
+
+def _check_image(entry: Dict[str, Any], path: str, settings: Dict[str, Any]) -> None:
+    """读取文件头并检查大小和尺寸限制，结果写入entry"""
+    entry.update({'format': None, 'width': None, 'height': None, 'error': None})
+    if settings['max_file_bytes'] and entry['size'] > settings['max_file_bytes']:
+        entry['error'] = f"文件大小超过上限（{entry['size']} 字节）"
+        return
+    try:
+        entry.update(read_image_info(path))
+    except (OSError, ValueError, struct.error) as e:
+        entry['error'] = str(e)
+        return
+    if settings['min_dimension']:
+        short_side = min(entry['width'], entry['height'])
+        long_side = max(entry['width'], entry['height'])
+        if settings['resize_to'] and long_side > settings['resize_to']:
+            # 预处理按最长边等比缩小
+            short_side = short_side * settings['resize_to'] // long_side
+        if short_side < settings['min_dimension']:
+            entry['error'] = f"图片尺寸过小（{entry['width']}x{entry['height']}）"
+
+
+# === 笔记文件夹清单 ===
+def _load_json(path: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        return data if isinstance(data, dict) and data.get('version') == _MANIFEST_VERSION else None
+    except (OSError, ValueError):
+        return None
+
+
+def _write_json(path: str, data: Dict[str, Any]) -> None:
+    """先写临时文件再重命名，避免读取到不完整的清单"""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=1)
+    os.replace(tmp_path, path)
+
+
+def scan_folder(folder: str, settings: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """扫描笔记文件夹并返回清单，只读取新增或修改过的图片的文件头
+
+    Returns:
+        清单：{'version', 'folder', 'mtime_ns', 'images': [{name, size, mtime_ns, format, width, height, error}],
+        'valid': [按自然顺序排列、可以上传的文件名], 'errors': [问题说明]}
+    """
+    merged = LIBRARY_DEFAULTS.copy()
+    merged.update(settings or {})
+    folder = os.path.abspath(folder)
+    manifest_path = os.path.join(folder, merged['manifest_name'])
+
+    previous = _manifest_cache.get(folder)
+    if previous is None and merged['persist_manifest']:
+        previous = _load_json(manifest_path)
+    # 校验限制变化后，已有的校验结果不再可用
+    limits = {key: merged[key] for key in _LIMIT_KEYS}
+    known = {}
+    if previous is not None and previous.get('limits') == limits:
+        known = {entry['name']: entry for entry in previous['images']}
+
+    images = []
+    changed = previous is None
+    with os.scandir(folder) as entries:
+        for item in entries:
+            if not item.name.lower().endswith(IMAGE_EXTENSIONS) or not item.is_file():
+                continue
+            stat = item.stat()
+            entry = known.get(item.name)
+            if entry is None or entry['size'] != stat.st_size or entry['mtime_ns'] != stat.st_mtime_ns:
+                entry = {'name': item.name, 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+                _check_image(entry, item.path, merged)
+                changed = True
+            images.append(entry)
+    if len(images) != len(known):
+        changed = True
+    images.sort(key=lambda entry: natural_key(entry['name']))
+
+    errors = [f"{entry['name']}: {entry['error']}" for entry in images if entry['error']]
+    valid = [entry['name'] for entry in images if not entry['error']]
+    if len(valid) > merged['max_images']:
+        errors.append(f"图片数量 {len(valid)} 超过上限 {merged['max_images']}，只上传前 {merged['max_images']} 张")
+        valid = valid[:merged['max_images']]
+
+    manifest = {
+        'version': _MANIFEST_VERSION,
+        'folder': folder,
+        'mtime_ns': os.stat(folder).st_mtime_ns,
+        'limits': limits,
+        'images': images,
+        'valid': valid,
+        'errors': errors,
+    }
+    _manifest_cache[folder] = manifest
+    if changed and merged['persist_manifest']:
+        try:
+            _write_json(manifest_path, manifest)
+        except OSError as e:
+            logger.warning(f"写入清单失败: {manifest_path}: {str(e)}")
+    return manifest
+
+
+def lookup_folder(folder: str, settings: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """返回笔记文件夹中可以上传的图片和问题说明
+
+    文件夹位于配置的内容库根目录下时从共享的内容库索引中查找，否则扫描文件夹（结果同样带缓存）。
+
+    Returns:
+        {'folder': 文件夹绝对路径, 'images': [按自然顺序排列、可以上传的文件名], 'errors': [问题说明]}
+    """
+    folder = os.path.abspath(folder)
+    library = shared_library(settings)
+    entry = library.lookup(folder) if library is not None else None
+    if entry is None:
+        manifest = scan_folder(folder, settings)
+        entry = {'images': manifest['valid'], 'errors': manifest['errors']}
+    return {'folder': folder, 'images': entry['images'], 'errors': entry['errors']}
+
+
+def folder_image_paths(folder: str, settings: Optional[Dict[str, Any]] = None) -> List[str]:
+    """返回笔记文件夹中可以上传的图片绝对路径（自然顺序），并记录无效图片"""
+    found = lookup_folder(folder, settings)
+    for error in found['errors']:
+        logger.warning(f"{folder}: {error}")
+    return [os.path.join(found['folder'], name) for name in found['images']]
+
+
+# === 内容库索引 ===
+class ContentLibrary:
+    """内容库：根目录下每个子文件夹是一篇笔记
+
+    索引保存在根目录的index_name文件中；refresh()和lookup()只重新扫描过期的文件夹：
+    文件夹的修改时间变化（增删或重命名图片），或索引中某张图片的大小或修改时间变化（原地覆盖）。
+    lookup()不写索引文件，变化在refresh()或flush()时一次保存。可以在多个线程中使用。
+    """
+
+    def __init__(self, root: str, settings: Optional[Dict[str, Any]] = None):
+        self.root = os.path.abspath(root)
+        self.settings = LIBRARY_DEFAULTS.copy()
+        self.settings.update(settings or {})
+        self.index_path = os.path.join(self.root, self.settings['index_name'])
+        self._lock = threading.Lock()
+        self._dirty = False
+        limits = {key: self.settings[key] for key in _LIMIT_KEYS + ('max_images',)}
+        self.index = _load_json(self.index_path)
+        if self.index is None or self.index.get('limits') != limits:
+            # 校验限制变化后，已有的索引不再可用
+            self.index = {'version': _MANIFEST_VERSION, 'limits': limits, 'folders': {}}
+
+    def _is_fresh(self, name: str, mtime_ns: int) -> bool:
+        """索引中的文件夹是否仍然有效（只读取文件属性，不读取图片）"""
+        entry = self.index['folders'].get(name)
+        if entry is None or entry['mtime_ns'] != mtime_ns or 'files' not in entry:
+            return False
+        folder = os.path.join(self.root, name)
+        for image, (size, image_mtime_ns) in entry['files'].items():
+            try:
+                stat = os.stat(os.path.join(folder, image))
+            except OSError:
+                return False
+            if stat.st_size != size or stat.st_mtime_ns != image_mtime_ns:
+                return False
+        return True
+
+    def _rescan(self, name: str) -> Dict[str, Any]:
+        manifest = scan_folder(os.path.join(self.root, name), self.settings)
+        entry = {
+            'mtime_ns': manifest['mtime_ns'],
+            'images': manifest['valid'],
+            'errors': manifest['errors'],
+            'files': {image['name']: [image['size'], image['mtime_ns']] for image in manifest['images']},
+        }
+        self.index['folders'][name] = entry
+        self._dirty = True
+        return entry
+
+    def _save(self) -> None:
+        """写入索引文件（调用方持有锁）"""
+        try:
+            _write_json(self.index_path, self.index)
+            self._dirty = False
+        except OSError as e:
+            logger.warning(f"写入内容库索引失败: {self.index_path}: {str(e)}")
+
+    def flush(self) -> None:
+        """把lookup()重新扫描的结果写入索引文件（没有变化时不写）"""
+        with self._lock:
+            if self._dirty:
+                self._save()
+
+    def refresh(self) -> Dict[str, int]:
+        """更新索引，返回 {'folders': 文件夹数, 'rescanned': 重新扫描的数量, 'removed': 删除的数量}"""
+        with self._lock:
+            folders = self.index['folders']
+            seen = set()
+            rescanned = 0
+            with os.scandir(self.root) as entries:
+                for item in entries:
+                    if not item.is_dir() or item.name.startswith('.'):
+                        continue
+                    seen.add(item.name)
+                    if self._is_fresh(item.name, item.stat().st_mtime_ns):
+                        continue
+                    self._rescan(item.name)
+                    rescanned += 1
+            removed = [name for name in folders if name not in seen]
+            for name in removed:
+                del folders[name]
+            if removed:
+                self._dirty = True
+            if self._dirty:
+                self._save()
+        return {'folders': len(folders), 'rescanned': rescanned, 'removed': len(removed)}
+
+    def lookup(self, folder: str) -> Optional[Dict[str, Any]]:
+        """查找根目录下某个笔记文件夹的索引项，过期时只重新扫描该文件夹
+
+        Returns:
+            索引项 {'mtime_ns', 'images', 'errors', 'files'}；文件夹不是根目录的直接子文件夹或不存在时返回None
+        """
+        folder = os.path.abspath(folder)
+        name = os.path.basename(folder)
+        if os.path.dirname(folder) != self.root or not name or name.startswith('.'):
+            return None
+        try:
+            mtime_ns = os.stat(folder).st_mtime_ns
+        except OSError:
+            return None
+        with self._lock:
+            if not self._is_fresh(name, mtime_ns):
+                self._rescan(name)
+            return self.index['folders'][name]
+
+    def folders(self, valid_only: bool = True) -> List[str]:
+        """按自然顺序返回笔记文件夹名"""
+        names = [name for name, entry in self.index['folders'].items() if entry['images'] or not valid_only]
+        return sorted(names, key=natural_key)
+
+    def image_paths(self, name: str) -> List[str]:
+        """从索引中取出某篇笔记的图片绝对路径（自然顺序）"""
+        entry = self.index['folders'].get(name)
+        if entry is None:
+            raise KeyError(f"内容库中没有文件夹: {name}")
+        return [os.path.join(self.root, name, image) for image in entry['images']]
+
+
+def shared_library(settings: Optional[Dict[str, Any]] = None) -> Optional[ContentLibrary]:
+    """返回settings中root对应的共享ContentLibrary实例（进程内复用），未配置root时返回None"""
+    merged = LIBRARY_DEFAULTS.copy()
+    merged.update(settings or {})
+    if not merged['root']:
+        return None
+    root = os.path.abspath(merged['root'])
+    if not os.path.isdir(root):
+        return None
+    with _libraries_lock:
+        library = _libraries.get(root)
+        if library is None or library.settings != merged:
+            if library is not None:
+                library.flush()
+            library = ContentLibrary(root, merged)
+            _libraries[root] = library
+            # 进程退出时保存lookup()更新过的索引
+            atexit.register(library.flush)
+        return library
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='建立或更新内容库索引')
+    parser.add_argument('root', help='内容库根目录（每个子文件夹是一篇笔记）')
+    args = parser.parse_args()
+    library = ContentLibrary(args.root)
+    stats = library.refresh()
+    problems = {name: entry['errors'] for name, entry in library.index['folders'].items() if entry['errors']}
+    print(json.dumps({'stats': stats, 'problems': problems}, ensure_ascii=False, indent=2))
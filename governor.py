@@ -0,0 +1,224 @@
+# -*- coding: utf-8 -*-
+"""
+小红书自动发布工具的浏览器资源管理
+
+浏览器在多篇笔记之间保持运行时，Chrome的内存会随着每次打开上传页面而增长。
+DriverGovernor 在每篇笔记发布后采样浏览器进程树（chromedriver、Chrome及其子进程）的内存和CPU，
+超过内存、发布篇数或运行时长上限时在两篇笔记之间替换浏览器，使长时间运行的批量发布保持在固定的内存预算内
+（每台机器的预算约为 浏览器数量 × max_rss_mb）。
+
+关闭浏览器时 quit() 有超时限制，超时或退出后仍残留的进程会被强制结束，不会留下僵尸进程。
+采样和清理残留进程依赖 psutil（pip install psutil），未安装时只按发布篇数和运行时长替换浏览器。
+"""
+
+import time
+import threading
+from typing import List, Dict, Optional, Any
+
+from logging_config import logger
+
+# === 默认资源管理参数 ===
+GOVERNOR_DEFAULTS = {
+    'enabled': True,  # 是否管理浏览器资源
+    'max_rss_mb': 1536,  # 浏览器进程树的内存上限（MB），0表示不限制
+    'max_posts': 50,  # 每个浏览器最多发布的笔记数，0表示不限制
+    'max_age_minutes': 120,  # 每个浏览器的最长运行时间（分钟），0表示不限制
+    'quit_timeout': 15,  # 等待浏览器正常退出的最长时间（秒），超时后强制结束进程
+    'history': 20,  # 保留的已退出浏览器的资源记录条数
+}
+
+_psutil_warned = False
+
+
+def get_governor_settings(config: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """合并GOVERNOR_DEFAULTS和配置中的governor参数"""
+    settings = GOVERNOR_DEFAULTS.copy()
+    settings.update((config or {}).get('governor') or {})
+    return settings
+
+
+def _psutil():
+    """返回psutil模块，未安装时返回None（只提示一次）"""
+    global _psutil_warned
+    try:
+        import psutil
+        return psutil
+    except ImportError:
+        if not _psutil_warned:
+            _psutil_warned = True
+            logger.warning("未安装 psutil，无法采样浏览器内存和清理残留进程（pip install psutil）")
+        return None
+
+
+def driver_pid(driver) -> Optional[int]:
+    """浏览器进程树的根进程：Selenium为chromedriver，cdp后端为Chrome"""
+    process = getattr(driver, 'process', None)
+    if process is None:
+        process = getattr(getattr(driver, 'service', None), 'process', None)
+    return getattr(process, 'pid', None)
+
+
+class DriverStats:
+    """一个浏览器的资源使用记录"""
+
+    def __init__(self, pid: Optional[int]):
+        self.pid = pid
+        self.started = time.time()
+        self.posts = 0
+        self.rss_bytes = 0
+        self.peak_rss_bytes = 0
+        self.cpu_percent = 0.0
+        self.processes = 0
+        self.retired_reason = None
+        self._tree = {}  # pid -> psutil.Process，退出后用于清理残留进程
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            'pid': self.pid,
+            'posts': self.posts,
+            'age_s': round(time.time() - self.started, 1),
+            'rss_mb': round(self.rss_bytes / 1048576, 1),
+            'peak_rss_mb': round(self.peak_rss_bytes / 1048576, 1),
+            'cpu_percent': round(self.cpu_percent, 1),
+            'processes': self.processes,
+            'retired_reason': self.retired_reason,
+        }
+
+
+# === 资源管理 ===
+class DriverGovernor:
+    """管理一个会话中浏览器的资源：采样、按上限替换、带超时的退出和残留进程清理
+
+    Args:
+        settings: 资源管理参数，见GOVERNOR_DEFAULTS
+    """
+
+    def __init__(self, settings: Optional[Dict[str, Any]] = None):
+        self.settings = GOVERNOR_DEFAULTS.copy()
+        self.settings.update(settings or {})
+        self.current = None
+        self.retired = []
+
+    @classmethod
+    def from_config(cls, config: Optional[Dict[str, Any]] = None) -> 'DriverGovernor':
+        return cls(get_governor_settings(config))
+
+    def attach(self, driver) -> None:
+        """开始记录新启动的浏览器"""
+        self.current = DriverStats(driver_pid(driver))
+        if self.settings['enabled']:
+            self.sample()
+
+    def sample(self) -> Optional[Dict[str, Any]]:
+        """采样当前浏览器进程树的内存（RSS）和CPU，未安装psutil或进程不存在时返回None"""
+        stats = self.current
+        psutil = _psutil() if stats is not None and stats.pid else None
+        if psutil is None:
+            return None
+        try:
+            root = stats._tree.get(stats.pid) or psutil.Process(stats.pid)
+            tree = [root] + root.children(recursive=True)
+        except psutil.Error:
+            return None
+        rss = 0
+        cpu = 0.0
+        for process in tree:
+            # 复用同一个Process对象，cpu_percent才能计算两次采样之间的占用
+            process = stats._tree.setdefault(process.pid, process)
+            try:
+                rss += process.memory_info().rss
+                cpu += process.cpu_percent(interval=None)
+            except psutil.Error:
+                continue
+        stats.rss_bytes = rss
+        stats.peak_rss_bytes = max(stats.peak_rss_bytes, rss)
+        stats.cpu_percent = cpu
+        stats.processes = len(tree)
+        logger.debug("浏览器资源: %d 个进程, %.1f MB, CPU %.1f%%", len(tree), rss / 1048576, cpu)
+        return stats.as_dict()
+
+    def after_post(self) -> Optional[str]:
+        """记录一篇笔记发布完成并采样，返回需要替换浏览器的原因（无需替换时返回None）"""
+        stats = self.current
+        if stats is None or not self.settings['enabled']:
+            return None
+        stats.posts += 1
+        self.sample()
+        max_rss = self.settings['max_rss_mb'] * 1048576
+        if max_rss and stats.rss_bytes > max_rss:
+            return f"内存 {stats.rss_bytes / 1048576:.0f} MB 超过上限 {self.settings['max_rss_mb']} MB"
+        if self.settings['max_posts'] and stats.posts >= self.settings['max_posts']:
+            return f"已发布 {stats.posts} 篇，达到上限"
+        age_minutes = (time.time() - stats.started) / 60
+        if self.settings['max_age_minutes'] and age_minutes >= self.settings['max_age_minutes']:
+            return f"已运行 {age_minutes:.0f} 分钟，达到上限"
+        return None
+
+    def quit(self, driver, reason: Optional[str] = None) -> None:
+        """关闭浏览器：quit()超过quit_timeout时放弃等待，之后强制结束残留的进程"""
+        stats = self.current
+        self.current = None
+        if stats is not None and self.settings['enabled']:
+            # 退出前刷新进程树，包括采样之后新启动的渲染进程
+            self.sample()
+
+        error = []
+
+        def quit_driver():
+            try:
+                driver.quit()
+            except Exception as e:
+                error.append(e)
+
+        worker = threading.Thread(target=quit_driver, name='driver-quit', daemon=True)
+        worker.start()
+        worker.join(self.settings['quit_timeout'])
+        if worker.is_alive():
+            logger.warning(f"浏览器在 {self.settings['quit_timeout']} 秒内未能退出，强制结束进程")
+        elif error:
+            logger.warning(f"关闭浏览器时出错: {str(error[0])}")
+
+        if stats is None:
+            return
+        killed = self._kill_leftovers(stats)
+        if killed:
+            logger.warning(f"已强制结束 {killed} 个残留的浏览器进程")
+        stats.retired_reason = reason or 'closed'
+        stats._tree = {}
+        self.retired.append(stats)
+        del self.retired[:-max(1, int(self.settings['history']))]
+        logger.info(f"浏览器已退出（{stats.retired_reason}）: 发布 {stats.posts} 篇，"
+                    f"运行 {time.time() - stats.started:.0f} 秒，内存峰值 {stats.peak_rss_bytes / 1048576:.0f} MB")
+
+    def _kill_leftovers(self, stats: DriverStats) -> int:
+        """结束进程树中仍在运行的进程，返回强制结束的进程数"""
+        psutil = _psutil() if stats._tree else None
+        if psutil is None:
+            return 0
+        alive = []
+        for process in stats._tree.values():
+            try:
+                if process.is_running() and process.status() != psutil.STATUS_ZOMBIE:
+                    alive.append(process)
+            except psutil.Error:
+                continue
+        for process in alive:
+            try:
+                process.terminate()
+            except psutil.Error:
+                pass
+        _, remaining = psutil.wait_procs(alive, timeout=3)
+        for process in remaining:
+            try:
+                process.kill()
+            except psutil.Error:
+                pass
+        psutil.wait_procs(remaining, timeout=3)
+        return len(alive)
+
+    def report(self) -> List[Dict[str, Any]]:
+        """当前和已退出浏览器的资源使用记录（当前浏览器在最后）"""
+        items = [stats.as_dict() for stats in self.retired]
+        if self.current is not None:
+            items.append(self.current.as_dict())
+        return items
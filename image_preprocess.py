@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+"""
+小红书自动发布工具的图片预处理
+
+上传前对图片进行缩放、格式转换、重新压缩并移除元数据（EXIF等），
+处理结果按“源文件内容哈希 + 处理参数”缓存到磁盘，缓存超过容量上限时按最近最少使用（LRU）淘汰。
+重复发布或重试同一批图片时直接命中缓存。
+
+依赖 Pillow（pip install Pillow），未安装时跳过预处理并使用原图。
+"""
+
+import os
+import logging
+import json
+import hashlib
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Optional, Any
+
+from logging_config import logger
+
+# === 默认预处理参数 ===
+PREPROCESS_DEFAULTS = {
+    'enabled': False,  # 是否启用预处理
+    'max_dimension': 1440,  # 最长边像素，超过则等比缩小
+    'format': 'JPEG',  # 输出格式：JPEG 或 WEBP
+    'quality': 85,  # 压缩质量（1-100）
+    'background': '#ffffff',  # 透明图片转换为JPEG时使用的背景色
+    'cache_dir': '.image_cache',  # 缓存目录
+    'cache_max_bytes': 500 * 1024 * 1024,  # 缓存容量上限（字节）
+    'workers': None,  # 并行处理的线程数，None表示自动
+}
+
+# 影响输出内容的参数，参与缓存键计算
+_OUTPUT_KEYS = ('max_dimension', 'format', 'quality', 'background')
+# 处理逻辑变化时递增，使旧缓存失效
+_CACHE_VERSION = 1
+_EXTENSIONS = {'JPEG': '.jpg', 'WEBP': '.webp'}
+
+# 源文件内容哈希的进程内缓存：绝对路径 -> (大小, 修改时间, 哈希)
+_source_digests: Dict[str, tuple] = {}
+_digests_lock = threading.Lock()
+
+
+def _file_digest(path: str) -> str:
+    """计算文件内容的SHA-256"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _source_digest(path: str) -> str:
+    """源文件内容哈希；文件的大小和修改时间未变时使用缓存"""
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    with _digests_lock:
+        cached = _source_digests.get(path)
+    if cached and cached[:2] == (stat.st_size, stat.st_mtime_ns):
+        return cached[2]
+    digest = _file_digest(path)
+    with _digests_lock:
+        _source_digests[path] = (stat.st_size, stat.st_mtime_ns, digest)
+    return digest
+
+
+def cache_key(path: str, settings: Dict[str, Any]) -> str:
+    """根据源文件内容和处理参数生成缓存键"""
+    params = {key: settings[key] for key in _OUTPUT_KEYS}
+    params['version'] = _CACHE_VERSION
+    digest = hashlib.sha256(_source_digest(path).encode('ascii'))
+    digest.update(json.dumps(params, sort_keys=True).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def _convert_image(source: str, target: str, settings: Dict[str, Any]) -> None:
+    """缩放、转换格式并保存（不写入任何元数据）"""
+    from PIL import Image, ImageOps
+
+    output_format = settings['format'].upper()
+    with Image.open(source) as image:
+        # 先按EXIF方向旋转，随后保存时不再携带EXIF
+        image = ImageOps.exif_transpose(image)
+        max_dimension = settings['max_dimension']
+        if max_dimension and max(image.size) > max_dimension:
+            image.thumbnail((max_dimension, max_dimension), Image.LANCZOS)
+
+        if output_format == 'JPEG' and image.mode not in ('RGB', 'L'):
+            # JPEG不支持透明通道，合成到背景色上
+            rgba = image.convert('RGBA')
+            background = Image.new('RGB', rgba.size, settings['background'])
+            background.paste(rgba, mask=rgba.getchannel('A'))
+            image = background
+        elif output_format == 'WEBP' and image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA')
+
+        # 先写临时文件再重命名，避免并发读取到不完整的缓存；
+        # 临时文件名唯一，同一进程内的多个线程处理同一张图片时互不覆盖
+        fd, tmp_path = tempfile.mkstemp(suffix='.tmp', dir=os.path.dirname(target) or '.')
+        os.close(fd)
+        try:
+            image.save(tmp_path, output_format, quality=settings['quality'], optimize=True)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+    os.replace(tmp_path, target)
+
+
+def _process_one(source: str, settings: Dict[str, Any]) -> str:
+    """处理单张图片，返回缓存中的输出路径；失败时返回原图路径"""
+    try:
+        key = cache_key(source, settings)
+        target = os.path.join(settings['cache_dir'], key + _EXTENSIONS[settings['format'].upper()])
+        if os.path.exists(target):
+            # 更新修改时间，作为LRU淘汰依据
+            os.utime(target, None)
+            logger.debug("图片预处理命中缓存: %s", source)
+            return os.path.abspath(target)
+        _convert_image(source, target, settings)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("图片预处理完成: %s -> %s (%d -> %d 字节)",
+                         source, target, os.path.getsize(source), os.path.getsize(target))
+        return os.path.abspath(target)
+    except Exception as e:
+        logger.warning(f"图片预处理失败，使用原图 {source}: {str(e)}")
+        return source
+
+
+def evict_cache(cache_dir: str, max_bytes: int, keep: Optional[List[str]] = None) -> int:
+    """按最近使用时间淘汰缓存文件，直到总大小不超过max_bytes
+
+    Args:
+        cache_dir: 缓存目录
+        max_bytes: 容量上限（字节）
+        keep: 本次正在使用、不允许淘汰的文件路径
+
+    Returns:
+        int: 删除的文件数量
+    """
+    keep = {os.path.abspath(p) for p in keep or []}
+    entries = []
+    total = 0
+    with os.scandir(cache_dir) as it:
+        for entry in it:
+            if entry.is_file():
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, os.path.abspath(entry.path)))
+                total += stat.st_size
+
+    removed = 0
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        if path in keep:
+            continue
+        try:
+            os.remove(path)
+            total -= size
+            removed += 1
+        except OSError as e:
+            logger.debug("删除缓存文件失败 %s: %s", path, e)
+    if removed:
+        logger.info(f"图片缓存已淘汰 {removed} 个文件")
+    return removed
+
+
+def preprocess_images(image_paths: List[str], settings: Optional[Dict[str, Any]] = None) -> List[str]:
+    """并行预处理一组图片，返回与输入顺序一致的输出路径列表
+
+    Args:
+        image_paths: 原图路径列表
+        settings: 预处理参数，未提供的项使用PREPROCESS_DEFAULTS
+
+    Returns:
+        List[str]: 预处理后的图片路径（Pillow不可用或处理失败时为原图路径）
+    """
+    merged = PREPROCESS_DEFAULTS.copy()
+    merged.update(settings or {})
+    if merged['format'].upper() not in _EXTENSIONS:
+        raise ValueError(f"不支持的输出格式: {merged['format']}")
+
+    try:
+        import PIL  # noqa: F401
+    except ImportError:
+        logger.warning("未安装 Pillow，跳过图片预处理（pip install Pillow）")
+        return list(image_paths)
+
+    os.makedirs(merged['cache_dir'], exist_ok=True)
+    with ThreadPoolExecutor(max_workers=merged['workers']) as executor:
+        outputs = list(executor.map(lambda path: _process_one(path, merged), image_paths))
+
+    evict_cache(merged['cache_dir'], merged['cache_max_bytes'], keep=outputs)
+    logger.info(f"已预处理 {len(outputs)} 张图片")
+    return outputs
@@ -0,0 +1,253 @@
+# -*- coding: utf-8 -*-
+"""
+小红书自动发布工具的内容导入
+
+从以下来源逐篇读取发布内容并转换为post_data字典：
+- JSONL文件：每行一个post_data
+- JSON文件：post_data列表（需要整体解析，大量内容请使用JSONL）
+- Markdown文件：可选的front-matter（--- 包围的 key: value）加正文，格式见下
+- 目录：其中的全部 .md 文件（按文件名自然顺序），以及 .jsonl/.json 文件
+
+所有读取函数都是生成器，每次只解析一篇内容，内存占用与内容总数无关。
+
+Markdown格式：
+    ---
+    title: 标题
+    image_dir: images/post1        # 相对于Markdown文件所在目录
+    hashtags: [#标签1, #标签2]
+    ---
+    正文……
+
+    #标签3 #标签4
+
+未提供front-matter的title时，依次使用“📌 标题：”行或第一个“# ”标题；正文末尾只包含 #标签 的行作为hashtags。
+未提供image_dir时，如果Markdown文件旁边有同名文件夹，则使用该文件夹。
+JSONL和JSON文件中相对的image_dir同样相对于内容文件所在目录。
+
+iter_valid_posts不会丢弃无效的内容，而是在原位置产出带invalid字段的占位post_data（见invalid_post），
+发布时直接记为失败，批量结果的index与内容文件中的顺序保持一致。
+"""
+
+import os
+import re
+import json
+from typing import Iterator, Dict, Optional, Any, Tuple
+
+from logging_config import logger
+
+POST_SUFFIXES = ('.md', '.markdown', '.jsonl', '.json')
+
+# “📌 标题：xxx” 或 “标题: xxx”
+_TITLE_LINE_RE = re.compile(r'^\W*标题\s*[:：]\s*(.+?)\s*$')
+_HEADING_RE = re.compile(r'^#\s+(.+?)\s*#*\s*$')
+# 只包含话题标签的行，例如 “#Python #自动化”
+_HASHTAG_LINE_RE = re.compile(r'^\s*(?:#[^\s#]+\s*)+$')
+_HASHTAG_RE = re.compile(r'#[^\s#]+')
+
+
+class IngestError(ValueError):
+    """内容文件格式错误"""
+
+
+# === Markdown ===
+def _parse_front_matter_value(value: str) -> Any:
+    value = value.strip()
+    if value.startswith('[') and value.endswith(']'):
+        return [item.strip().strip('\'"') for item in value[1:-1].split(',') if item.strip()]
+    if len(value) >= 2 and value[0] == value[-1] and value[0] in '\'"':
+        return value[1:-1]
+    return value
+
+
+def split_front_matter(text: str) -> tuple:
+    """拆分front-matter和正文，返回 (字段字典, 正文)"""
+    if not text.startswith('---'):
+        return {}, text
+    lines = text.split('\n')
+    fields = {}
+    current_list = None
+    for index in range(1, len(lines)):
+        line = lines[index].rstrip()
+        if line.strip() == '---':
+            return fields, '\n'.join(lines[index + 1:])
+        if not line.strip() or line.lstrip().startswith('# '):
+            continue
+        if line.lstrip().startswith('- ') and current_list is not None:
+            # 多行列表：
+            # hashtags:
+            #   - #标签
+            fields[current_list].append(line.lstrip()[2:].strip().strip('\'"'))
+            continue
+        if ':' not in line:
+            raise IngestError(f"front-matter第 {index + 1} 行格式错误: {line}")
+        key, value = line.split(':', 1)
+        key = key.strip()
+        # 行尾注释（值本身以#开头的是话题标签，不作为注释）
+        value = re.sub(r'\s+#\s.*$', '', value)
+        if value.strip():
+            fields[key] = _parse_front_matter_value(value)
+            current_list = None
+        else:
+            fields[key] = []
+            current_list = key
+    raise IngestError("front-matter没有结束标记 ---")
+
+
+def parse_markdown(text: str, source: Optional[str] = None) -> Dict[str, Any]:
+    """把一篇Markdown内容解析为post_data
+
+    Args:
+        text: Markdown文本
+        source: 文件路径，用于解析相对的image_dir
+    """
+    text = text.lstrip('\ufeff').replace('\r\n', '\n')
+    fields, body = split_front_matter(text)
+    post = dict(fields)
+    lines = body.strip('\n').split('\n')
+
+    # 标题：front-matter > “标题：”行 > 第一个一级标题；用作标题的行不再出现在正文中
+    if not post.get('title'):
+        for index, line in enumerate(lines):
+            match = _TITLE_LINE_RE.match(line) or _HEADING_RE.match(line)
+            if match:
+                post['title'] = match.group(1)
+                del lines[index]
+                break
+
+    # 正文末尾只包含话题标签的行
+    trailing = []
+    while lines and (not lines[-1].strip() or _HASHTAG_LINE_RE.match(lines[-1])):
+        trailing[:0] = _HASHTAG_RE.findall(lines.pop())
+    hashtags = list(post.get('hashtags') or []) + [tag for tag in trailing if tag not in (post.get('hashtags') or [])]
+    if hashtags:
+        post['hashtags'] = hashtags
+    if not post.get('description'):
+        post['description'] = '\n'.join(lines).strip()
+
+    if source:
+        base_dir = os.path.dirname(os.path.abspath(source))
+        if post.get('image_dir'):
+            _resolve_image_dir(post, base_dir)
+        else:
+            sibling = os.path.splitext(os.path.abspath(source))[0]
+            if os.path.isdir(sibling):
+                post['image_dir'] = sibling
+        post.setdefault('source', source)
+    return post
+
+
+def _resolve_image_dir(post: Dict[str, Any], base_dir: str) -> None:
+    """把相对的image_dir解析为相对于内容文件所在目录的路径"""
+    image_dir = post.get('image_dir')
+    if isinstance(image_dir, str) and image_dir:
+        post['image_dir'] = os.path.join(base_dir, os.path.expanduser(image_dir))
+
+
+# === 逐篇读取 ===
+def _iter_jsonl_lines(path: str) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """逐行读取JSONL文件，产出 (行号, post_data)"""
+    with open(path, 'r', encoding='utf-8') as f:
+        for line_no, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                post = json.loads(line)
+            except ValueError as e:
+                raise IngestError(f"{path} 第 {line_no} 行不是有效的JSON: {str(e)}")
+            if not isinstance(post, dict):
+                raise IngestError(f"{path} 第 {line_no} 行不是JSON对象")
+            yield line_no, post
+
+
+def iter_jsonl(path: str) -> Iterator[Dict[str, Any]]:
+    """逐行读取JSONL文件"""
+    for _, post in _iter_jsonl_lines(path):
+        yield post
+
+
+def iter_json_list(path: str) -> Iterator[Dict[str, Any]]:
+    """读取JSON列表文件（整体解析）"""
+    with open(path, 'r', encoding='utf-8') as f:
+        posts = json.load(f)
+    if not isinstance(posts, list) or not all(isinstance(p, dict) for p in posts):
+        raise IngestError(f"批量发布文件格式错误: {path}")
+    yield from posts
+
+
+def is_json_list(path: str) -> bool:
+    """根据第一个非空白字符判断是JSON列表还是JSONL"""
+    with open(path, 'r', encoding='utf-8') as f:
+        while True:
+            char = f.read(1)
+            if not char or not char.isspace():
+                return char == '['
+
+
+def iter_posts(source: str) -> Iterator[Dict[str, Any]]:
+    """逐篇读取发布内容，source可以是JSONL/JSON/Markdown文件或目录"""
+    if os.path.isdir(source):
+        from content_library import natural_key
+        names = sorted((entry.name for entry in os.scandir(source)
+                        if entry.is_file() and entry.name.lower().endswith(POST_SUFFIXES)), key=natural_key)
+        for name in names:
+            yield from iter_posts(os.path.join(source, name))
+        return
+    lower = source.lower()
+    if lower.endswith(('.md', '.markdown')):
+        with open(source, 'r', encoding='utf-8') as f:
+            yield parse_markdown(f.read(), source)
+    else:
+        # 相对的image_dir相对于内容文件所在目录，source字段记录所在位置
+        base_dir = os.path.dirname(os.path.abspath(source))
+        if is_json_list(source):
+            located = ((f"{source}[{index}]", post) for index, post in enumerate(iter_json_list(source)))
+        else:
+            located = ((f"{source}:{line_no}", post) for line_no, post in _iter_jsonl_lines(source))
+        for location, post in located:
+            _resolve_image_dir(post, base_dir)
+            post.setdefault('source', location)
+            yield post
+
+
+def invalid_post(post: Dict[str, Any], error: str, location: str) -> Dict[str, Any]:
+    """无效内容的占位post_data：只保留标题和位置，invalid字段为原因（发布时直接记为失败）"""
+    title = post.get('title')
+    return {'title': title if isinstance(title, str) else None, 'source': location, 'invalid': error}
+
+
+def iter_valid_posts(source: str, strict: bool = False) -> Iterator[Dict[str, Any]]:
+    """逐篇读取并校验发布内容，无效的内容记录错误，并在原位置产出invalid_post占位"""
+    from rednote_auto_post import validate_post_data
+    from preflight import check_fields
+    invalid = 0
+    for index, post in enumerate(iter_posts(source)):
+        if validate_post_data(post, strict=strict):
+            yield post
+            continue
+        invalid += 1
+        errors, problems = check_fields(post)
+        location = post.get('source') or f"{source} #{index}"
+        logger.error(f"无效的发布内容 #{index}（{location}），发布时记为失败")
+        yield invalid_post(post, '; '.join(errors + (problems if strict else [])), location)
+    if invalid:
+        logger.warning(f"{source}: 共有 {invalid} 篇无效内容")
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='检查内容文件并输出转换后的post_data（JSONL）')
+    parser.add_argument('source', help='JSONL/JSON/Markdown文件或目录')
+    parser.add_argument('--strict', action='store_true', help='标题、正文长度超出限制时视为无效')
+    args = parser.parse_args()
+    import sys
+    invalid = 0
+    for post in iter_valid_posts(args.source, strict=args.strict):
+        if post.get('invalid'):
+            # 无效内容写到标准错误，标准输出只包含可以发布的post_data
+            invalid += 1
+            sys.stderr.write(f"无效的发布内容（{post['source']}）: {post['invalid']}\n")
+        else:
+            print(json.dumps(post, ensure_ascii=False))
+    if invalid:
+        sys.stderr.write(f"{args.source}: 共有 {invalid} 篇无效内容\n")
+    sys.exit(1 if invalid else 0)
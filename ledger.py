@@ -0,0 +1,224 @@
+# -*- coding: utf-8 -*-
+"""
+小红书自动发布工具的发布账本（幂等记录）
+
+每篇笔记按内容指纹（账号、标题、正文、标签和每张原图的内容哈希）记录在本地 SQLite 数据库中，
+并记录状态变化：queued（已排队）→ uploading（上传中）→ submitted（已点击发布）→ confirmed（已确认发布成功）。
+已提交或已确认的笔记在重试、定时任务重跑或批量重跑时直接跳过，避免重复发布；
+停在queued或uploading的笔记会从头重新发布。
+
+指纹是数据库主键，查询只需一次索引查找；图片哈希按（路径、大小、修改时间）缓存，
+未修改的图片不会被重复读取。
+指纹按原图计算，开启或调整图片预处理不会改变指纹；配置了account（多账号模式下为账号名）时
+账号名参与计算，同一内容发布到不同账号互不影响。
+"""
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from typing import List, Dict, Optional, Any
+
+from logging_config import logger
+
+# === 默认账本参数 ===
+LEDGER_DEFAULTS = {
+    'enabled': False,  # 是否启用发布账本
+    'db_path': 'ledger.db',  # 账本数据库路径
+}
+
+# 状态按发布进度排列
+STATES = ('queued', 'uploading', 'submitted', 'confirmed')
+# 处于这些状态的笔记不再重新发布
+DONE_STATES = ('submitted', 'confirmed')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS posts (
+    fingerprint TEXT PRIMARY KEY,
+    state TEXT NOT NULL,
+    title TEXT,
+    runs INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_posts_state ON posts (state, updated_at);
+CREATE TABLE IF NOT EXISTS image_hashes (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    digest TEXT NOT NULL
+);
+"""
+
+
+def _file_digest(path: str) -> str:
+    """计算文件内容的SHA-256"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+# === 账本 ===
+class PublishLedger:
+    """基于SQLite的发布账本，可在多个线程中使用
+
+    Args:
+        db_path: 数据库路径
+        account: 账号名，参与指纹计算；None表示单账号（指纹与未区分账号时一致）
+    """
+
+    def __init__(self, db_path: str, account: Optional[str] = None):
+        self.db_path = db_path
+        self.account = account
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(_SCHEMA)
+        self.conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self.conn.close()
+
+    def image_digest(self, path: str) -> str:
+        """图片内容哈希；文件的大小和修改时间未变时使用缓存"""
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT size, mtime_ns, digest FROM image_hashes WHERE path = ?", (path,)).fetchone()
+        if row and row['size'] == stat.st_size and row['mtime_ns'] == stat.st_mtime_ns:
+            return row['digest']
+        digest = _file_digest(path)
+        with self._lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO image_hashes (path, size, mtime_ns, digest) VALUES (?, ?, ?, ?)",
+                (path, stat.st_size, stat.st_mtime_ns, digest))
+            self.conn.commit()
+        return digest
+
+    def fingerprint(self, title: str, description: str, hashtags: Optional[List[str]],
+                    image_paths: List[str]) -> str:
+        """计算笔记的内容指纹（图片按上传顺序参与计算，与文件名无关；image_paths应为原图而非预处理结果）"""
+        content = {
+            'title': title,
+            'description': description,
+            'hashtags': list(hashtags or []),
+            'images': [self.image_digest(path) for path in image_paths],
+        }
+        if self.account:
+            content['account'] = self.account
+        return hashlib.sha256(json.dumps(content, ensure_ascii=False, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def get(self, fingerprint: str) -> Optional[Dict[str, Any]]:
+        """按指纹查询记录，不存在时返回None"""
+        with self._lock:
+            row = self.conn.execute("SELECT * FROM posts WHERE fingerprint = ?", (fingerprint,)).fetchone()
+        return dict(row) if row else None
+
+    def is_done(self, fingerprint: str) -> bool:
+        """笔记是否已提交或已确认发布"""
+        entry = self.get(fingerprint)
+        return entry is not None and entry['state'] in DONE_STATES
+
+    def begin(self, fingerprint: str, title: Optional[str] = None) -> None:
+        """开始一次发布：新记录为queued，已有的未完成记录回到queued并增加运行次数"""
+        now = time.time()
+        with self._lock:
+            self.conn.execute(
+                "INSERT INTO posts (fingerprint, state, title, runs, created_at, updated_at) "
+                "VALUES (?, 'queued', ?, 1, ?, ?) "
+                "ON CONFLICT(fingerprint) DO UPDATE SET state = 'queued', runs = runs + 1, updated_at = excluded.updated_at",
+                (fingerprint, title, now, now))
+            self.conn.commit()
+
+    def transition(self, fingerprint: str, state: str, error: Optional[str] = None) -> None:
+        """记录状态变化"""
+        if state not in STATES:
+            raise ValueError(f"未知的账本状态: {state}")
+        with self._lock:
+            self.conn.execute(
+                "UPDATE posts SET state = ?, last_error = ?, updated_at = ? WHERE fingerprint = ?",
+                (state, error, time.time(), fingerprint))
+            self.conn.commit()
+
+    def record_error(self, fingerprint: str, error: str) -> None:
+        """记录最近一次错误，不改变状态"""
+        with self._lock:
+            self.conn.execute("UPDATE posts SET last_error = ?, updated_at = ? WHERE fingerprint = ?",
+                              (error, time.time(), fingerprint))
+            self.conn.commit()
+
+    def counts(self) -> Dict[str, int]:
+        """按状态统计记录数量"""
+        with self._lock:
+            rows = self.conn.execute("SELECT state, COUNT(*) AS n FROM posts GROUP BY state").fetchall()
+        return {row['state']: row['n'] for row in rows}
+
+
+def open_ledger(config: Optional[Dict[str, Any]] = None) -> Optional[PublishLedger]:
+    """根据配置中的ledger参数打开账本，未启用时返回None；配置中的account参与指纹计算"""
+    settings = LEDGER_DEFAULTS.copy()
+    settings.update((config or {}).get('ledger') or {})
+    if not settings['enabled']:
+        return None
+    return PublishLedger(settings['db_path'], account=(config or {}).get('account'))
+
+
+# === 单次发布的状态跟踪 ===
+class PublishRecord:
+    """跟踪一篇笔记在本次运行中的发布状态，并同步写入账本（账本未启用时只在内存中记录）
+
+    Args:
+        ledger: PublishLedger实例或None
+        fingerprint: 内容指纹，ledger为None时可以为None
+    """
+
+    def __init__(self, ledger: Optional[PublishLedger] = None, fingerprint: Optional[str] = None):
+        self.ledger = ledger
+        self.fingerprint = fingerprint
+        self.state = None
+
+    def advance(self, state: str) -> None:
+        """进入新状态，作为_publish_post的on_state回调"""
+        self.state = state
+        if self.ledger is not None:
+            self.ledger.transition(self.fingerprint, state)
+            logger.debug("账本状态: %s -> %s", self.fingerprint[:12], state)
+
+    def fail(self, error: str) -> None:
+        """记录本次尝试的错误"""
+        if self.ledger is not None:
+            self.ledger.record_error(self.fingerprint, error)
+
+    @property
+    def submitted(self) -> bool:
+        """是否已经点击过发布（之后的重试可能产生重复笔记）"""
+        return self.state in DONE_STATES
+
+
+def begin_record(ledger: Optional[PublishLedger], title: str, description: str,
+                 hashtags: Optional[List[str]], image_paths: List[str]) -> Optional[PublishRecord]:
+    """在账本中登记一次发布
+
+    Returns:
+        PublishRecord；账本显示该笔记已提交或已确认时返回None，调用方应跳过发布
+    """
+    if ledger is None:
+        return PublishRecord()
+    fingerprint = ledger.fingerprint(title, description, hashtags, image_paths)
+    entry = ledger.get(fingerprint)
+    if entry is not None and entry['state'] in DONE_STATES:
+        logger.info("发布账本显示该笔记已发布（%s），跳过: %s", entry['state'], title)
+        return None
+    if entry is not None:
+        logger.info("发布账本中有未完成的记录（%s），重新发布: %s", entry['state'], title)
+    ledger.begin(fingerprint, title)
+    return PublishRecord(ledger, fingerprint)
@@ -1,52 +1,236 @@
 # -*- coding: utf-8 -*-
 """
 小红书自动发布工具的日志配置
+
+导入本模块不会创建日志目录或日志文件；需要输出日志时显式调用 setup_logger()。
+未调用时日志记录器只挂载 NullHandler，作为库使用不会产生任何输出。
+
+setup_logger() 只在日志记录器上挂载一个 QueueHandler：发布线程只把日志记录放入内存队列，
+控制台和文件由后台的 QueueListener 线程统一写入。多账号发布的工作进程通过
+forward_worker_logs() 提供的进程间队列把日志交给主进程，日志文件始终只有一个写入者。
 """
 
 import os
+import json
+import uuid
+import queue
+import atexit
 import logging
-from logging.handlers import RotatingFileHandler
 import datetime
+import contextlib
+import contextvars
+from logging.handlers import RotatingFileHandler, QueueHandler, QueueListener
+from typing import Dict, Optional, Any
 
-# 创建日志目录
+# 日志目录
 LOG_DIR = 'logs'
-os.makedirs(LOG_DIR, exist_ok=True)
 
-# 生成日志文件名，包含日期
-log_filename = os.path.join(LOG_DIR, f'rednote_{datetime.datetime.now().strftime("%Y%m%d_%H%M%S")}.log')
+# === 默认日志参数 ===
+LOGGING_DEFAULTS = {
+    'format': 'text',  # text: 普通文本; json: 每行一个JSON对象（包含run_id和post_id）
+    'max_message_chars': 2000,  # 单条日志消息的最大字符数，超出部分截断；0表示不截断
+    'max_bytes': 10 * 1024 * 1024,  # 单个日志文件的大小上限
+    'backup_count': 5,  # 保留的日志文件数量
+}
+
+# 获取日志记录器实例（未配置处理器前不输出任何内容）
+logger = logging.getLogger('rednote')
+logger.addHandler(logging.NullHandler())
+
+# 当前运行和当前笔记的标识，由日志过滤器附加到每条日志记录上
+RUN_ID = datetime.datetime.now().strftime('%Y%m%d_%H%M%S_') + uuid.uuid4().hex[:6]
+_post_id = contextvars.ContextVar('rednote_post_id', default=None)
+
+_listener = None
+_queue_handler = None
+
+
+def get_logging_settings(config: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """合并LOGGING_DEFAULTS和配置中的logging参数"""
+    settings = LOGGING_DEFAULTS.copy()
+    settings.update((config or {}).get('logging') or {})
+    return settings
+
+
+@contextlib.contextmanager
+def log_context(post_id: Optional[str] = None):
+    """在with块内记录的日志带有post_id（每个线程独立）"""
+    token = _post_id.set(post_id)
+    try:
+        yield
+    finally:
+        _post_id.reset(token)
+
+
+def current_post_id() -> Optional[str]:
+    """当前线程正在发布的笔记的post_id，不在log_context中时为None"""
+    return _post_id.get()
+
+
+# === 过滤器和格式化器 ===
+class _ContextFilter(logging.Filter):
+    """在调用线程中附加run_id/post_id并截断过长的消息
+
+    消息只在日志级别允许输出时才会合并参数，因此 logger.debug("%s", value) 在DEBUG关闭时没有格式化开销。
+    """
+
+    def __init__(self, max_chars: int = 0):
+        super().__init__()
+        self.max_chars = max_chars
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        # 工作进程转发来的记录已经带有自己的标识
+        if not hasattr(record, 'run_id'):
+            record.run_id = RUN_ID
+            record.post_id = _post_id.get()
+        if self.max_chars:
+            message = record.getMessage()
+            if len(message) > self.max_chars:
+                message = f"{message[:self.max_chars]}…（已截断，共 {len(message)} 字符）"
+            # 参数只合并一次，QueueHandler不再重复格式化
+            record.msg, record.args = message, None
+        return True
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """每条日志输出为一行JSON"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'time': datetime.datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'file': record.filename,
+            'line': record.lineno,
+            'run_id': getattr(record, 'run_id', None),
+            'post_id': getattr(record, 'post_id', None),
+            'process': record.process,
+            'message': record.getMessage(),
+        }
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False)
+
+
+def _formatters(settings: Dict[str, Any]) -> tuple:
+    """返回 (控制台格式化器, 文件格式化器)"""
+    if settings['format'] == 'json':
+        return logging.Formatter('%(levelname)s: [%(filename)s:%(lineno)d] %(message)s'), JsonLinesFormatter()
+    console_formatter = logging.Formatter('%(levelname)s: [%(filename)s:%(lineno)d] %(message)s')
+    file_formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - [%(filename)s:%(lineno)d] - %(message)s')
+    return console_formatter, file_formatter
+
+
+def _stop_listener() -> None:
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
 
 # 配置根日志记录器
-def setup_logger():
-    # 创建日志记录器
-    logger = logging.getLogger('rednote')
-    logger.setLevel(logging.DEBUG)
-    
-    # 创建控制台处理器
+def setup_logger(log_dir: str = LOG_DIR, level=logging.DEBUG, settings: Optional[Dict[str, Any]] = None):
+    """为日志记录器挂载队列处理器，由后台线程写入控制台和文件
+
+    重复调用不会重复挂载；已挂载时只应用新的settings（格式和截断长度）。
+
+    Args:
+        log_dir: 日志目录
+        level: 日志级别
+        settings: 日志参数，见LOGGING_DEFAULTS
+    """
+    global _listener, _queue_handler
+    merged = LOGGING_DEFAULTS.copy()
+    merged.update(settings or {})
+
+    if getattr(logger, '_rednote_configured', False):
+        if settings:
+            _apply_settings(merged)
+        return logger
+    logger.setLevel(level)
+
+    # 创建日志目录，生成日志文件名，包含日期
+    os.makedirs(log_dir, exist_ok=True)
+    log_filename = os.path.join(log_dir, f'rednote_{datetime.datetime.now().strftime("%Y%m%d_%H%M%S")}.log')
+
+    # 创建控制台处理器和文件处理器（只在监听线程中使用）
     console_handler = logging.StreamHandler()
-    console_handler.setLevel(logging.DEBUG)
-    
-    # 创建文件处理器
     file_handler = RotatingFileHandler(
-        log_filename, 
-        maxBytes=10*1024*1024,  # 10MB
-        backupCount=5,
+        log_filename,
+        maxBytes=merged['max_bytes'],
+        backupCount=merged['backup_count'],
         encoding='utf-8'
     )
-    file_handler.setLevel(logging.DEBUG)
-    
-    # 创建格式化器
-    console_formatter = logging.Formatter('%(levelname)s: [%(filename)s:%(lineno)d] %(message)s')
-    file_formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - [%(filename)s:%(lineno)d] - %(message)s')
-    
-    # 设置格式化器
+
+    # 发布线程只把记录放入队列
+    log_queue = queue.SimpleQueue()
+    _queue_handler = QueueHandler(log_queue)
+    _queue_handler.setLevel(level)
+    _listener = QueueListener(log_queue, console_handler, file_handler, respect_handler_level=False)
+    _apply_settings(merged)
+    _listener.start()
+    atexit.register(_stop_listener)
+
+    logger.addHandler(_queue_handler)
+    logger._rednote_configured = True
+
+    return logger
+
+
+def _apply_settings(settings: Dict[str, Any]) -> None:
+    console_handler, file_handler = _listener.handlers
+    console_formatter, file_formatter = _formatters(settings)
     console_handler.setFormatter(console_formatter)
     file_handler.setFormatter(file_formatter)
-    
-    # 添加处理器到日志记录器
-    logger.addHandler(console_handler)
-    logger.addHandler(file_handler)
-    
-    return logger
+    for old in list(_queue_handler.filters):
+        _queue_handler.removeFilter(old)
+    _queue_handler.addFilter(_ContextFilter(int(settings['max_message_chars'] or 0)))
+
+
+# === 多进程 ===
+class _ForwardHandler(logging.Handler):
+    """把工作进程的日志记录交给主进程的日志记录器"""
+
+    def emit(self, record: logging.LogRecord) -> None:
+        if logger.isEnabledFor(record.levelno):
+            logger.handle(record)
+
+
+@contextlib.contextmanager
+def forward_worker_logs():
+    """主进程中使用：创建进程间日志队列并转发到本进程的日志记录器
+
+    日志未配置时返回None，工作进程不需要输出日志。
+
+    Yields:
+        进程间队列，作为setup_worker_logger的参数传给工作进程
+    """
+    if not getattr(logger, '_rednote_configured', False):
+        yield None
+        return
+    import multiprocessing
+    worker_queue = multiprocessing.Queue(-1)
+    listener = QueueListener(worker_queue, _ForwardHandler())
+    listener.start()
+    try:
+        yield worker_queue
+    finally:
+        listener.stop()
+        worker_queue.close()
+        worker_queue.join_thread()
+
 
-# 获取日志记录器实例
-logger = setup_logger()
\ No newline at end of file
+def setup_worker_logger(worker_queue, level=logging.DEBUG) -> None:
+    """工作进程中使用：日志只放入主进程提供的队列，不直接写文件"""
+    if worker_queue is None:
+        return
+    for handler in list(logger.handlers):
+        if not isinstance(handler, logging.NullHandler):
+            logger.removeHandler(handler)
+    logger.setLevel(level)
+    handler = QueueHandler(worker_queue)
+    handler.addFilter(_ContextFilter(LOGGING_DEFAULTS['max_message_chars']))
+    logger.addHandler(handler)
+    logger._rednote_configured = True
@@ -0,0 +1,210 @@
+# -*- coding: utf-8 -*-
+"""
+小红书自动发布工具的发布耗时统计
+
+在发布流程的每个阶段（启动浏览器、加载Cookie、打开页面、上传图片、输入标题正文、发布、重试等待）
+记录耗时和结果，汇总为直方图，并导出为：
+- JSON运行记录：包含每个阶段的明细和汇总
+- Prometheus文本文件：供 node-exporter 的 textfile collector 采集
+
+未启用时使用空实现，span() 直接返回共享的空上下文，几乎没有额外开销。
+"""
+
+import os
+import json
+import time
+import uuid
+import datetime
+from typing import List, Dict, Optional, Any
+
+from logging_config import logger
+
+# === 默认统计参数 ===
+METRICS_DEFAULTS = {
+    'enabled': False,  # 是否启用耗时统计
+    'json_path': 'metrics/run_{run_id}.json',  # JSON运行记录路径，支持{run_id}占位符，为空则不导出
+    'prometheus_path': 'metrics/rednote.prom',  # Prometheus文本文件路径，为空则不导出
+}
+
+# 直方图分桶上限（秒）
+DURATION_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+
+class Histogram:
+    """固定分桶的耗时直方图"""
+
+    def __init__(self, buckets=DURATION_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # 最后一个为+Inf
+        self.total = 0.0
+        self.count = 0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        index = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                index = i
+                break
+        self.counts[index] += 1
+        self.total += value
+        self.count += 1
+        self.max = max(self.max, value)
+
+    def cumulative(self) -> List[int]:
+        """返回Prometheus格式的累计计数"""
+        result = []
+        running = 0
+        for n in self.counts:
+            running += n
+            result.append(running)
+        return result
+
+
+class _Span:
+    """一个阶段的计时上下文，异常退出时记为error，也可以通过set_outcome()设置结果"""
+
+    __slots__ = ('metrics', 'name', 'outcome', 'started')
+
+    def __init__(self, metrics: 'PublishMetrics', name: str):
+        self.metrics = metrics
+        self.name = name
+        self.outcome = 'ok'
+
+    def set_outcome(self, outcome: str) -> None:
+        self.outcome = outcome
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        outcome = 'error' if exc_type is not None else self.outcome
+        self.metrics.record(self.name, time.perf_counter() - self.started, outcome)
+        return False
+
+
+class _NullSpan:
+    """未启用统计时使用的空上下文"""
+
+    __slots__ = ()
+
+    def set_outcome(self, outcome: str) -> None:
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class PublishMetrics:
+    """记录一次运行（单篇或批量发布）中各阶段的耗时
+
+    Example:
+        ```python
+        metrics = PublishMetrics.from_config(config)
+        with metrics.span('upload') as span:
+            ...
+        metrics.export()
+        ```
+    """
+
+    def __init__(self, settings: Optional[Dict[str, Any]] = None):
+        self.settings = METRICS_DEFAULTS.copy()
+        self.settings.update(settings or {})
+        self.enabled = bool(self.settings['enabled'])
+        self.run_id = datetime.datetime.now().strftime('%Y%m%d_%H%M%S_') + uuid.uuid4().hex[:6]
+        self.started_at = time.time()
+        self.spans = []
+        self.histograms = {}
+
+    @classmethod
+    def from_config(cls, config: Optional[Dict[str, Any]]) -> 'PublishMetrics':
+        return cls((config or {}).get('metrics'))
+
+    def span(self, name: str):
+        """返回阶段计时上下文"""
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name)
+
+    def record(self, name: str, duration: float, outcome: str = 'ok') -> None:
+        """记录一个阶段的耗时和结果"""
+        if not self.enabled:
+            return
+        self.spans.append({'phase': name, 'duration': round(duration, 4), 'outcome': outcome,
+                           'at': round(time.time(), 3)})
+        key = (name, outcome)
+        if key not in self.histograms:
+            self.histograms[key] = Histogram()
+        self.histograms[key].observe(duration)
+
+    def summary(self) -> Dict[str, Any]:
+        """按阶段汇总次数、总耗时、平均和最大耗时"""
+        phases = {}
+        for (name, outcome), hist in sorted(self.histograms.items()):
+            phase = phases.setdefault(name, {'count': 0, 'sum': 0.0, 'max': 0.0, 'outcomes': {}})
+            phase['count'] += hist.count
+            phase['sum'] = round(phase['sum'] + hist.total, 4)
+            phase['max'] = round(max(phase['max'], hist.max), 4)
+            phase['outcomes'][outcome] = hist.count
+        for phase in phases.values():
+            phase['avg'] = round(phase['sum'] / phase['count'], 4) if phase['count'] else 0.0
+        return phases
+
+    def to_record(self) -> Dict[str, Any]:
+        return {
+            'run_id': self.run_id,
+            'started_at': self.started_at,
+            'finished_at': time.time(),
+            'phases': self.summary(),
+            'spans': self.spans,
+        }
+
+    def to_prometheus(self) -> str:
+        """生成Prometheus文本格式"""
+        lines = [
+            '# HELP rednote_phase_duration_seconds Duration of each publish phase.',
+            '# TYPE rednote_phase_duration_seconds histogram',
+        ]
+        for (name, outcome), hist in sorted(self.histograms.items()):
+            labels = f'phase="{name}",outcome="{outcome}"'
+            bounds = [str(b) for b in hist.buckets] + ['+Inf']
+            for bound, count in zip(bounds, hist.cumulative()):
+                lines.append(f'rednote_phase_duration_seconds_bucket{{{labels},le="{bound}"}} {count}')
+            lines.append(f'rednote_phase_duration_seconds_sum{{{labels}}} {hist.total:.6f}')
+            lines.append(f'rednote_phase_duration_seconds_count{{{labels}}} {hist.count}')
+        lines.append('# HELP rednote_last_run_timestamp_seconds Time the last run was exported.')
+        lines.append('# TYPE rednote_last_run_timestamp_seconds gauge')
+        lines.append(f'rednote_last_run_timestamp_seconds {time.time():.3f}')
+        return '\n'.join(lines) + '\n'
+
+    def export(self) -> None:
+        """按配置导出JSON运行记录和Prometheus文本文件"""
+        if not self.enabled or not self.spans:
+            return
+        try:
+            if self.settings.get('json_path'):
+                _write_atomic(self.settings['json_path'].format(run_id=self.run_id),
+                              json.dumps(self.to_record(), ensure_ascii=False, indent=2))
+            if self.settings.get('prometheus_path'):
+                _write_atomic(self.settings['prometheus_path'], self.to_prometheus())
+            logger.debug("已导出耗时统计: %s", self.run_id)
+        except OSError as e:
+            logger.warning(f"导出耗时统计失败: {str(e)}")
+
+
+def _write_atomic(path: str, content: str) -> None:
+    """先写临时文件再重命名，避免采集端读取到不完整的文件"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(content)
+    os.replace(tmp_path, path)
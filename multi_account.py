@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+"""
+小红书自动发布工具的多账号并行发布
+
+账号清单（JSON）示例：
+
+```json
+{
+    "max_parallel": 2,
+    "accounts": {
+        "shop_a": {
+            "cookie_path": "accounts/shop_a/cookies.pkl",
+            "user_data_dir": "accounts/shop_a/chrome",
+            "posts_file": "accounts/shop_a/posts.jsonl"
+        },
+        "shop_b": {
+            "cookie_path": "accounts/shop_b/cookies.pkl",
+            "user_data_dir": "accounts/shop_b/chrome",
+            "posts": [{"title": "...", "description": "...", "image_dir": "..."}],
+            "config": {"max_retries": 2}
+        }
+    }
+}
+```
+
+每个账号在独立的进程中使用自己的Cookie文件和Chrome用户数据目录，
+同一账号的笔记按队列顺序串行发布，不同账号之间并行执行。
+"""
+
+import os
+import json
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, Optional, Any, Iterator
+
+from logging_config import logger, forward_worker_logs, setup_worker_logger
+
+
+def load_accounts_manifest(manifest_path: str) -> Dict[str, Any]:
+    """加载多账号清单文件
+
+    清单中的相对路径（cookie_path, user_data_dir, posts_file）以清单文件所在目录为基准。
+    """
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+
+    accounts = manifest.get('accounts')
+    if not isinstance(accounts, dict) or not accounts:
+        raise ValueError(f"账号清单中没有有效的accounts配置: {manifest_path}")
+
+    base_dir = os.path.dirname(os.path.abspath(manifest_path))
+    for name, account in accounts.items():
+        if 'cookie_path' not in account:
+            raise ValueError(f"账号 {name} 缺少cookie_path")
+        for key in ('cookie_path', 'user_data_dir', 'posts_file'):
+            if account.get(key) and not os.path.isabs(account[key]):
+                account[key] = os.path.join(base_dir, account[key])
+    return manifest
+
+
+def _account_config(name: str, account: Dict[str, Any], base_config: Dict[str, Any]) -> Dict[str, Any]:
+    """合并全局配置和账号配置（启用profile时每个账号使用以账号名命名的配置目录，发布账本按账号名区分指纹）"""
+    config = dict(base_config)
+    config.update(account.get('config') or {})
+    config['account'] = name
+    config['cookie_path'] = account['cookie_path']
+    if account.get('user_data_dir'):
+        config['user_data_dir'] = account['user_data_dir']
+    config['profile'] = dict(config.get('profile') or {}, name=name)
+    return config
+
+
+def _account_posts(account: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    """逐篇读取账号的发布队列（清单中的posts在前，posts_file在后）"""
+    yield from account.get('posts') or []
+    if account.get('posts_file'):
+        from ingest import iter_valid_posts
+        yield from iter_valid_posts(account['posts_file'])
+
+
+def _run_account(name: str, account: Dict[str, Any], base_config: Dict[str, Any]) -> Dict[str, Any]:
+    """在工作进程中按顺序发布单个账号的全部笔记"""
+    from rednote_auto_post import publish_many
+    from artifacts import install_recent_logs
+    started = time.time()
+    report = {'account': name, 'results': [], 'error': None, 'elapsed': 0.0}
+    try:
+        config = _account_config(name, account, base_config)
+        # 工作进程重新配置了日志，需要重新挂载最近日志处理器
+        install_recent_logs(config)
+        logger.info(f"账号 {name} 开始发布")
+        report['results'] = publish_many(_account_posts(account), config=config)
+    except Exception as e:
+        report['error'] = str(e)
+        logger.error(f"账号 {name} 发布失败: {str(e)}")
+        logger.debug(traceback.format_exc())
+    report['elapsed'] = round(time.time() - started, 3)
+    return report
+
+
+def run_accounts(manifest: Dict[str, Any], config: Optional[Dict[str, Any]] = None,
+                 max_parallel: Optional[int] = None,
+                 report_path: Optional[str] = None) -> Dict[str, Any]:
+    """为多个账号并行发布笔记，并汇总为一份报告
+
+    Args:
+        manifest: load_accounts_manifest返回的账号清单
+        config: 全局配置字典，账号配置会覆盖其中的同名项
+        max_parallel: 最大并行进程数，默认使用清单中的max_parallel，否则为CPU核数
+        report_path: 报告输出路径（JSON），为None时不写文件
+
+    Returns:
+        Dict: 汇总报告，包含accounts, total, succeeded, failed, elapsed
+    """
+    started = time.time()
+    base_config = dict(config or {})
+    accounts = manifest['accounts']
+    max_parallel = max_parallel or manifest.get('max_parallel') or os.cpu_count() or 1
+    max_parallel = max(1, min(max_parallel, len(accounts)))
+
+    reports = {}
+    runnable = {}
+    for name, account in accounts.items():
+        # 工作进程中无法手动登录，缺少Cookie的账号直接记为失败
+        if not os.path.exists(account['cookie_path']):
+            logger.error(f"账号 {name} 的Cookie文件不存在: {account['cookie_path']}，请先单独登录该账号")
+            reports[name] = {'account': name, 'results': [], 'elapsed': 0.0,
+                             'error': f"Cookie文件不存在: {account['cookie_path']}"}
+        else:
+            runnable[name] = account
+
+    logger.info(f"开始多账号发布: {len(runnable)} 个账号，最大并行数 {max_parallel}")
+    if runnable:
+        # 工作进程的日志经进程间队列交给主进程写入，避免多个进程同时写同一个日志文件
+        with forward_worker_logs() as log_queue, \
+                ProcessPoolExecutor(max_workers=max_parallel, initializer=setup_worker_logger,
+                                    initargs=(log_queue,)) as executor:
+            futures = {executor.submit(_run_account, name, account, base_config): name
+                       for name, account in runnable.items()}
+            for future in as_completed(futures):
+                name = futures[future]
+                try:
+                    reports[name] = future.result()
+                except Exception as e:
+                    logger.error(f"账号 {name} 的工作进程异常退出: {str(e)}")
+                    reports[name] = {'account': name, 'results': [], 'elapsed': 0.0, 'error': str(e)}
+
+    results = [r for report in reports.values() for r in report['results']]
+    succeeded = sum(1 for r in results if r['success'])
+    summary = {
+        'accounts': {name: reports[name] for name in accounts},
+        'total': len(results),
+        'succeeded': succeeded,
+        'failed': len(results) - succeeded + sum(1 for r in reports.values() if r['error']),
+        'elapsed': round(time.time() - started, 3),
+    }
+    logger.info(f"多账号发布完成: 成功 {succeeded}/{len(results)}，用时 {summary['elapsed']}s")
+
+    if report_path:
+        with open(report_path, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+        logger.info(f"已保存发布报告: {report_path}")
+    return summary
@@ -0,0 +1,258 @@
+# -*- coding: utf-8 -*-
+"""
+小红书自动发布工具的流水线发布
+
+顺序发布时，每篇笔记的大部分时间花在打开创建页面和等待图片上传上，浏览器在此期间基本空闲。
+流水线模式在同一个浏览器中最多打开 window 个标签页：当前标签页输入标题正文并点击发布的同时，
+下一篇笔记已在另一个标签页中打开创建页面并开始上传图片。
+不增加浏览器数量，单个账号的批量发布吞吐量随之提高。
+
+- 点击发布的顺序与输入顺序一致：总是先完成最早的一篇，再在空出的标签页中准备新的笔记
+- 结果按输入顺序产出，未通过预检、内容无效和账本显示已发布的笔记不占用标签页
+- 提前准备失败、浏览器被替换（崩溃或由governor按资源上限替换）时，该笔记在发布时从头开始，不影响其他笔记
+- 与已排队的笔记内容相同的笔记（同一账本指纹）不提前准备，轮到时再检查账本，避免重复发布
+- 每篇笔记发布后归还标签页，临时多开的标签页随即关闭，标签页数不会持续超过 window
+"""
+
+import uuid
+from collections import deque
+from typing import Dict, Any, Optional, Iterable, Iterator, Tuple
+
+from logging_config import logger, log_context
+
+# === 默认流水线参数 ===
+PIPELINE_DEFAULTS = {
+    'enabled': False,  # 是否启用流水线发布（iter_publish/publish_many/--posts）
+    'window': 2,  # 同时准备的笔记数（即标签页数），1表示顺序发布
+}
+
+# 标签页数上限：创作平台对同一账号的并发上传有限制，标签页过多只会增加内存而不会更快
+MAX_WINDOW = 4
+
+# 流水线模式追加的Chrome启动参数：后台标签页中的上传和页面脚本不降速
+PIPELINE_CHROME_ARGS = [
+    '--disable-renderer-backgrounding',
+    '--disable-backgrounding-occluded-windows',
+]
+
+
+def get_pipeline_settings(config: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """合并PIPELINE_DEFAULTS和配置中的pipeline参数"""
+    settings = PIPELINE_DEFAULTS.copy()
+    settings.update((config or {}).get('pipeline') or {})
+    window = int(settings['window'] or 1)
+    if window > MAX_WINDOW:
+        logger.warning("pipeline.window=%s 超过上限，改为 %s", window, MAX_WINDOW)
+    settings['window'] = max(1, min(window, MAX_WINDOW))
+    return settings
+
+
+class _Slot:
+    """流水线中的一篇笔记"""
+
+    def __init__(self, index: int):
+        self.index = index
+        self.post_id = uuid.uuid4().hex[:8]
+        self.content = None  # (title, description, image_paths, hashtags)
+        self.result = None  # 无需浏览器即可得出的结果
+        self.record = None
+        self.progress = None
+        self.fingerprint = None
+        self.deferred = False  # 轮到时再登记账本并发布
+        self.driver = None
+        self.tab = None
+
+    @property
+    def staged(self) -> bool:
+        return self.tab is not None
+
+
+class PublishPipeline:
+    """在一个PublishSession的浏览器中用多个标签页重叠发布相邻的笔记
+
+    Args:
+        session: 已创建的PublishSession
+        window: 同时准备的笔记数
+    """
+
+    def __init__(self, session, window: int = 2):
+        self.session = session
+        self.window = max(1, min(int(window), MAX_WINDOW))
+        self._driver = None
+        self._home = None
+        self._free = []
+        self._tabs = set()  # 当前浏览器中流水线打开的全部标签页（含主标签页）
+
+    @classmethod
+    def from_session(cls, session) -> Optional['PublishPipeline']:
+        """按配置创建流水线，未启用或window为1时返回None"""
+        settings = get_pipeline_settings(session.config)
+        if not settings['enabled'] or settings['window'] < 2:
+            return None
+        return cls(session, settings['window'])
+
+    def run(self, items: Iterable[Tuple[Dict[str, Any], Optional[Dict[str, Any]]]]) -> Iterator[Dict[str, Any]]:
+        """发布 (post_data, 预检报告) 序列，按输入顺序产出结果
+
+        items只在有空闲标签页时读取下一项，可以是生成器。
+        """
+        pending = deque()
+        for index, (data, report) in enumerate(items):
+            slot = self._open(index, data, report, pending)
+            if slot.result is None and not slot.deferred:
+                # 标签页都在使用时先发布最早的一篇
+                while sum(item.staged for item in pending) >= self.window:
+                    yield self._finish(pending.popleft())
+                self._stage(slot)
+            pending.append(slot)
+            while pending and pending[0].result is not None:
+                yield self._finish(pending.popleft())
+        while pending:
+            yield self._finish(pending.popleft())
+
+    def _open(self, index: int, data: Dict[str, Any], report: Optional[Dict[str, Any]], pending) -> _Slot:
+        """解析内容并登记账本，无需浏览器的结果直接写入slot.result"""
+        from rednote_auto_post import _preflight_result, _invalid_content_result, _resolve_post_content
+
+        session = self.session
+        slot = _Slot(index)
+        slot.result = _preflight_result(report)
+        if slot.result is not None:
+            return slot
+        slot.content = _resolve_post_content(None, None, None, None, data, session.config)
+        if slot.content is None:
+            slot.result = _invalid_content_result(data)
+            return slot
+        title, description, image_paths, hashtags = slot.content
+        if session.ledger is not None:
+            slot.fingerprint = session.ledger.fingerprint(title, description, hashtags, image_paths)
+            if any(item.fingerprint == slot.fingerprint for item in pending):
+                # 轮到时账本才能反映前一篇相同内容的发布结果
+                slot.deferred = True
+                return slot
+        self._begin(slot)
+        return slot
+
+    def _begin(self, slot: _Slot) -> None:
+        """在账本中登记，账本显示已发布时写入跳过的结果"""
+        from rednote_auto_post import _new_result, PublishProgress
+        from ledger import begin_record
+
+        title, description, image_paths, hashtags = slot.content
+        with log_context(slot.post_id):
+            slot.record = begin_record(self.session.ledger, title, description, hashtags, image_paths)
+        if slot.record is None:
+            slot.result = _new_result(title)
+            slot.result.update(success=True, skipped=True, post_id=slot.post_id)
+        else:
+            slot.progress = PublishProgress()
+
+    def _acquire_tab(self, driver) -> str:
+        """取一个空闲标签页，没有时打开新标签页；浏览器被替换后重新开始计算
+
+        延后发布的笔记轮到时，标签页可能都被后面已准备的笔记占用，此时临时多开一个，
+        发布完成后由_release关闭，标签页数不会持续超过window。
+        """
+        from browser_backend import as_backend
+        from rednote_auto_post import block_urls, get_browser_settings
+
+        backend = as_backend(driver)
+        if driver is not self._driver:
+            self._driver = driver
+            self._home = backend.current_tab()
+            self._free = [self._home]
+            self._tabs = {self._home}
+        if self._free:
+            tab = self._free.pop()
+            backend.switch_tab(tab)
+            return tab
+        tab = backend.new_tab()
+        self._tabs.add(tab)
+        # 请求屏蔽按标签页生效，新标签页需要重新设置
+        settings = get_browser_settings(self.session.config)
+        if settings.get('block_resources'):
+            block_urls(driver, settings.get('block_url_patterns') or [])
+        return tab
+
+    def _stage(self, slot: _Slot) -> None:
+        """在空闲标签页中打开创建页面并选择图片，上传在后台进行；失败时该笔记在发布时从头开始"""
+        from browser_backend import as_backend
+        from rednote_auto_post import SELECTORS, CREATION_URL, get_wait_timing, _wait_page_ready, _upload_paths
+
+        session = self.session
+        with log_context(slot.post_id):
+            try:
+                image_paths = _upload_paths(slot.content[2], session.config)
+                driver = session.ensure_driver()
+                # 预启动的浏览器已停在创建页面（见PublishSession.park）
+                parked, session.parked = session.parked, False
+                slot.tab = self._acquire_tab(driver)
+                slot.driver = driver
+                backend = as_backend(driver)
+                with session.metrics.span('navigate'):
+                    if not (parked and slot.tab == self._home):
+                        backend.navigate(session.config.get('creation_url', CREATION_URL))
+                    _wait_page_ready(backend, get_wait_timing(session.config))
+                slot.progress.complete('navigate')
+                slot.record.advance('uploading')
+                backend.set_files(SELECTORS['file_input'], image_paths)
+                slot.progress.files_selected = True
+                logger.info("已在后台标签页开始上传 %s 张图片", len(image_paths))
+            except Exception as e:
+                logger.warning("提前打开创建页面失败，发布时重试: %s", e)
+                slot.progress.reset()
+
+    def _finish(self, slot: _Slot) -> Dict[str, Any]:
+        """切换到笔记的标签页，完成上传、输入和发布"""
+        from browser_backend import as_backend
+
+        session = self.session
+        if slot.deferred:
+            self._begin(slot)
+        if slot.result is not None:
+            return slot.result
+        logger.info("批量发布进度: 第 %s 篇", slot.index + 1)
+        if slot.staged:
+            try:
+                if session.driver is not slot.driver:
+                    raise RuntimeError("浏览器已被替换")
+                as_backend(session.driver).switch_tab(slot.tab)
+            except Exception as e:
+                logger.info("提前准备的页面已失效（%s），从头发布", e)
+                slot.progress.reset()
+                slot.tab = None
+        if not slot.staged:
+            # 不能在其他笔记已准备好的标签页中发布，取一个空闲标签页
+            try:
+                slot.driver = session.ensure_driver()
+                slot.tab = self._acquire_tab(slot.driver)
+            except Exception as e:
+                # 由发布流程按失败类型处理
+                logger.debug("获取标签页失败: %s", e)
+        result = session.publish_prepared(slot.post_id, slot.content, slot.record, slot.progress)
+        self._release(slot)
+        return result
+
+    def _release(self, slot: _Slot) -> None:
+        """归还笔记使用的标签页；标签页数超过window时关闭多余的标签页（主标签页保留）"""
+        from browser_backend import as_backend
+
+        tab, slot.tab = slot.tab, None
+        if tab is None or slot.driver is not self._driver or self.session.driver is not slot.driver:
+            # 浏览器已被替换，旧标签页随旧浏览器关闭
+            return
+        if len(self._tabs) > self.window and tab != self._home:
+            backend = as_backend(slot.driver)
+            try:
+                backend.close_tab(tab)
+            except Exception as e:
+                logger.debug("关闭多余的标签页失败: %s", e)
+            else:
+                self._tabs.discard(tab)
+                try:
+                    # 关闭当前标签页后先切回主标签页，之后才能打开新标签页
+                    backend.switch_tab(self._home)
+                except Exception as e:
+                    logger.debug("切换到主标签页失败: %s", e)
+                return
+        self._free.append(tab)
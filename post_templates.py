@@ -0,0 +1,354 @@
+# -*- coding: utf-8 -*-
+"""
+小红书自动发布工具的模板化内容生成
+
+同一结构的笔记（例如论文解读：📍背景介绍 / 🎯研究动机 / ✨创新亮点 / ✅总结评价）只需写一份模板，
+再用一行结构化数据（CSV、JSONL或JSON列表）生成一篇post_data，批量输出的JSONL可以直接用 --posts-file 发布。
+
+模板格式与 ingest 的Markdown相同：可选的front-matter（title、image_dir、hashtags、hashtag_set）加正文，
+其中 {{字段名}} 由数据行中的同名字段替换：
+
+    ---
+    title: {{title}}
+    image_dir: images/{{id}}
+    hashtags: [#论文解读]
+    hashtag_set: ai
+    ---
+    📍 **背景介绍**
+    {{background}}
+
+    ✨ **创新亮点**
+    * {{highlights}}
+
+- 字段值为列表或多行文本时，所在行按每一项重复一次（行首的 “* ” 等前缀保留）
+- 字段全部为空的行被省略；段落（空行分隔）中的字段全部为空时，整段（包括小标题）被省略
+- 标签依次合并模板的hashtags、hashtag_set指定的标签组（配置templates.hashtag_sets）和数据行的hashtags，去重后不超过平台上限
+- 标题和正文按 process_emoji_text 的模式处理emoji，并按平台计字规则（见preflight.platform_length）截断或跳过超长的行
+
+模板编译一次后按文件内容的SHA-256缓存在进程内，同一模板的每一行只需拼接字符串。
+
+单独运行（输出JSONL）：
+    python post_templates.py data/templates/论文解读.md rows.csv -o posts.jsonl
+"""
+
+import os
+import re
+import csv
+import json
+import hashlib
+from typing import List, Dict, Optional, Any, Iterable, Iterator
+
+from logging_config import logger
+
+# === 默认模板参数 ===
+TEMPLATE_DEFAULTS = {
+    'hashtag_sets': {},  # 标签组：名称 -> 标签列表，模板或数据行用hashtag_set引用
+    'emoji': 'keep',  # 标题和正文的emoji处理模式，见 process_emoji_text
+    'overflow': 'truncate',  # 标题或正文超出平台字数时：truncate 截断 / skip 跳过该行
+    'ellipsis': '…',  # 截断时追加的省略号
+    'list_separator': '、',  # 一行中有多个字段时，列表值的连接符
+}
+
+_PLACEHOLDER_RE = re.compile(r'\{\{\s*([^{}\s]+)\s*\}\}')
+_BLANK_LINES_RE = re.compile(r'\n[ \t]*\n(?:[ \t]*\n)*')
+
+# 进程内缓存：模板内容的SHA-256 -> 编译结果
+_compiled_cache: Dict[str, 'CompiledTemplate'] = {}
+
+
+class TemplateError(ValueError):
+    """模板格式错误，或数据行无法生成有效的笔记"""
+
+
+def get_template_settings(config: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """合并TEMPLATE_DEFAULTS和配置中的templates参数"""
+    settings = TEMPLATE_DEFAULTS.copy()
+    settings.update((config or {}).get('templates') or {})
+    return settings
+
+
+# === 编译 ===
+def _compile_line(line: str):
+    """不含字段的行返回原文本，否则返回 (文本片段和字段名交替的元组)"""
+    pieces = _PLACEHOLDER_RE.split(line)
+    return line if len(pieces) == 1 else tuple(pieces)
+
+
+def _as_items(value: Any) -> List[str]:
+    """字段值转为非空文本的列表：列表按项，文本按行"""
+    if value is None:
+        return []
+    if isinstance(value, (list, tuple)):
+        items = [str(item).strip() for item in value]
+    else:
+        items = [line.strip() for line in str(value).split('\n')]
+    return [item for item in items if item]
+
+
+def _render_line(pieces: tuple, row: Dict[str, Any], separator: str) -> List[str]:
+    """渲染一行，字段全部为空时返回空列表"""
+    if len(pieces) == 3:
+        # 只有一个字段：列表或多行文本的每一项各占一行
+        prefix, name, suffix = pieces
+        return [f"{prefix}{item}{suffix}" for item in _as_items(row.get(name))]
+    parts = list(pieces)
+    filled = False
+    for index in range(1, len(parts), 2):
+        items = _as_items(row.get(parts[index]))
+        parts[index] = separator.join(items)
+        filled = filled or bool(items)
+    return [''.join(parts)] if filled else []
+
+
+class CompiledTemplate:
+    """编译后的模板：正文按段落和行预先拆分，渲染时只需查字段和拼接字符串
+
+    Args:
+        text: 模板文本（Markdown，可以有front-matter）
+        source: 模板文件路径，用于日志
+    """
+
+    def __init__(self, text: str, source: Optional[str] = None):
+        from ingest import split_front_matter, IngestError
+
+        self.source = source
+        text = text.lstrip('\ufeff').replace('\r\n', '\n')
+        try:
+            fields, body = split_front_matter(text)
+        except IngestError as e:
+            raise TemplateError(f"模板格式错误（{source or '文本'}）: {str(e)}")
+        self.title = _compile_line(str(fields.get('title') or '{{title}}'))
+        self.image_dir = _compile_line(fields['image_dir']) if fields.get('image_dir') else None
+        hashtags = fields.get('hashtags') or []
+        self.hashtags = hashtags if isinstance(hashtags, list) else hashtags.split()
+        self.hashtag_set = fields.get('hashtag_set')
+        # 段落：[(包含字段, [行])]
+        self.blocks = []
+        for block in _BLANK_LINES_RE.split(body.strip('\n')):
+            lines = [_compile_line(line.rstrip()) for line in block.split('\n')]
+            self.blocks.append((any(isinstance(line, tuple) for line in lines), lines))
+        self.fields = sorted({piece for line in self._lines() if isinstance(line, tuple) for piece in line[1::2]})
+        if not any(isinstance(line, tuple) for line in self._lines()):
+            logger.warning(f"模板中没有 {{{{字段}}}}: {source or '文本'}")
+
+    def _lines(self):
+        yield self.title
+        if self.image_dir is not None:
+            yield self.image_dir
+        for _, lines in self.blocks:
+            yield from lines
+
+    def render_body(self, row: Dict[str, Any], separator: str = '、') -> str:
+        """渲染正文，省略字段全部为空的行和段落"""
+        out = []
+        for has_fields, lines in self.blocks:
+            rendered = []
+            filled = False
+            for line in lines:
+                if isinstance(line, str):
+                    rendered.append(line)
+                    continue
+                result = _render_line(line, row, separator)
+                if result:
+                    filled = True
+                    rendered.extend(result)
+            if filled or not has_fields:
+                out.append('\n'.join(rendered))
+        return '\n\n'.join(out)
+
+    def render_line(self, line, row: Dict[str, Any], separator: str = ' ') -> str:
+        if isinstance(line, str):
+            return line
+        parts = list(line)
+        for index in range(1, len(parts), 2):
+            parts[index] = separator.join(_as_items(row.get(parts[index])))
+        return ''.join(parts).strip()
+
+
+def _compile_cached(key: str, text: str, source: Optional[str]) -> CompiledTemplate:
+    compiled = _compiled_cache.get(key)
+    if compiled is None:
+        compiled = _compiled_cache[key] = CompiledTemplate(text, source)
+        logger.debug("已编译模板 %s（%s），字段: %s", source or '文本', key[:12], ', '.join(compiled.fields))
+    return compiled
+
+
+def compile_template(text: str, source: Optional[str] = None) -> CompiledTemplate:
+    """编译模板文本，内容相同的模板只编译一次"""
+    return _compile_cached(hashlib.sha256(text.encode('utf-8')).hexdigest(), text, source)
+
+
+def load_template(path: str) -> CompiledTemplate:
+    """读取并编译模板文件，文件内容未变时直接使用缓存的编译结果"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    return _compile_cached(hashlib.sha256(data).hexdigest(), data.decode('utf-8'), path)
+
+
+# === 标签和长度规则 ===
+def _normalize_hashtags(value: Any) -> List[str]:
+    if not value:
+        return []
+    items = value if isinstance(value, (list, tuple)) else str(value).replace(',', ' ').split()
+    return [tag if tag.startswith('#') else f"#{tag}" for tag in (str(item).strip() for item in items) if tag.strip('#')]
+
+
+def _truncate(text: str, limit: int, ellipsis: str) -> str:
+    """按平台计字规则截断到limit字以内（含省略号），不拆开组合emoji"""
+    from preflight import platform_length, ZERO_WIDTH
+
+    # 每个字符最多算1字，字符数不超过limit时无需逐字计算
+    if len(text) <= limit or platform_length(text) <= limit:
+        return text
+    budget = max(0, limit - platform_length(ellipsis)) * 2
+    half_units = 0
+    joined = False
+    cut = len(text)
+    for index, char in enumerate(text):
+        code = ord(char)
+        if code in ZERO_WIDTH:
+            joined = code == 0x200D
+            continue
+        if joined:
+            joined = False
+            continue
+        half_units += 1 if code < 0x80 else 2
+        if half_units > budget:
+            cut = index
+            break
+    return text[:cut].rstrip() + ellipsis
+
+
+def _fit_length(name: str, text: str, limit: int, settings: Dict[str, Any]) -> str:
+    """超出平台字数时按overflow截断或抛出TemplateError"""
+    from preflight import platform_length
+
+    if len(text) <= limit or platform_length(text) <= limit:
+        return text
+    if settings['overflow'] == 'skip':
+        raise TemplateError(f"{name}超过 {limit} 字（{platform_length(text)} 字）")
+    return _truncate(text, limit, settings['ellipsis'])
+
+
+# === 渲染 ===
+def render_post(template: CompiledTemplate, row: Dict[str, Any],
+                settings: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """用一行数据渲染一篇post_data
+
+    Raises:
+        TemplateError: 标题或正文为空，或overflow为skip时超出平台字数
+    """
+    from preflight import POST_LIMITS, platform_length
+    from rednote_auto_post import process_emoji_text
+
+    merged = TEMPLATE_DEFAULTS.copy()
+    merged.update(settings or {})
+    emoji_mode = merged['emoji']
+
+    title = process_emoji_text(template.render_line(template.title, row), emoji_mode)
+    description = process_emoji_text(template.render_body(row, merged['list_separator']), emoji_mode)
+    if not title:
+        raise TemplateError("标题为空")
+    if not description.strip():
+        raise TemplateError("正文为空")
+
+    hashtags = []
+    set_names = [template.hashtag_set, row.get('hashtag_set')]
+    for tags in [template.hashtags] + [merged['hashtag_sets'].get(name) for name in set_names if name] + [row.get('hashtags')]:
+        for tag in _normalize_hashtags(tags):
+            if tag not in hashtags:
+                hashtags.append(tag)
+    if len(hashtags) > POST_LIMITS['max_hashtags']:
+        hashtags = hashtags[:POST_LIMITS['max_hashtags']]
+
+    # 标签追加在正文末尾，一起计字
+    tag_length = platform_length('\n' + ' '.join(hashtags)) if hashtags else 0
+    title = _fit_length('标题', title, POST_LIMITS['title_max_chars'], merged)
+    description = _fit_length('正文', description, POST_LIMITS['description_max_chars'] - tag_length, merged)
+
+    post = {'title': title, 'description': description}
+    image_dir = row.get('image_dir') or (template.render_line(template.image_dir, row, '')
+                                         if template.image_dir is not None else None)
+    if image_dir:
+        post['image_dir'] = image_dir
+    if hashtags:
+        post['hashtags'] = hashtags
+    return post
+
+
+def iter_rows(path: str) -> Iterator[Dict[str, Any]]:
+    """逐行读取数据：CSV（首行为字段名）、JSONL或JSON列表"""
+    if path.lower().endswith('.csv'):
+        with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+            for row in csv.DictReader(f):
+                yield row
+        return
+    from ingest import iter_jsonl, iter_json_list, is_json_list
+    yield from (iter_json_list(path) if is_json_list(path) else iter_jsonl(path))
+
+
+def render_posts(template: CompiledTemplate, rows: Iterable[Dict[str, Any]],
+                 config: Optional[Dict[str, Any]] = None,
+                 stats: Optional[Dict[str, int]] = None) -> Iterator[Dict[str, Any]]:
+    """用每一行数据渲染一篇post_data，无法生成有效笔记的行记录错误后跳过
+
+    rows可以是生成器，内存占用与行数无关。
+
+    Args:
+        stats: 可选的字典，渲染过程中更新 rendered（生成的笔记数）和 skipped（跳过的行数）
+    """
+    settings = get_template_settings(config)
+    stats = stats if stats is not None else {}
+    stats.update(rendered=0, skipped=0)
+    for line_no, row in enumerate(rows, 1):
+        try:
+            post = render_post(template, row, settings)
+        except TemplateError as e:
+            stats['skipped'] += 1
+            logger.error("第 %s 行数据无法生成笔记: %s", line_no, e)
+            continue
+        stats['rendered'] += 1
+        yield post
+    if stats['skipped']:
+        logger.warning("模板 %s 生成 %s 篇笔记，跳过 %s 行", template.source or '文本', stats['rendered'], stats['skipped'])
+    else:
+        logger.info("模板 %s 生成 %s 篇笔记", template.source or '文本', stats['rendered'])
+
+
+def render_file(template_path: str, rows_path: str, output_path: str,
+                config: Optional[Dict[str, Any]] = None,
+                stats: Optional[Dict[str, int]] = None) -> int:
+    """渲染整个数据文件并写入JSONL，返回生成的笔记数（跳过的行数见stats，同render_posts）"""
+    template = load_template(template_path)
+    count = 0
+    output_dir = os.path.dirname(output_path)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    with open(output_path, 'w', encoding='utf-8') as f:
+        for post in render_posts(template, iter_rows(rows_path), config, stats):
+            f.write(json.dumps(post, ensure_ascii=False) + '\n')
+            count += 1
+    return count
+
+
+if __name__ == '__main__':
+    import sys
+    import argparse
+    parser = argparse.ArgumentParser(description='用模板和结构化数据批量生成发布内容（JSONL）')
+    parser.add_argument('template', help='模板文件（Markdown）')
+    parser.add_argument('rows', help='数据文件（CSV、JSONL或JSON列表）')
+    parser.add_argument('-o', '--output', help='输出的JSONL路径，默认输出到标准输出')
+    parser.add_argument('--config', default='config.json', help='配置文件（使用其中的templates参数）')
+    args = parser.parse_args()
+    # 日志输出到标准错误，跳过的行不会被悄悄丢弃
+    from logging_config import setup_logger
+    from rednote_auto_post import load_config
+    setup_logger()
+    config = load_config(args.config)
+    stats = {}
+    if args.output:
+        render_file(args.template, args.rows, args.output, config, stats)
+    else:
+        for post in render_posts(load_template(args.template), iter_rows(args.rows), config, stats):
+            sys.stdout.write(json.dumps(post, ensure_ascii=False) + '\n')
+    sys.exit(1 if stats['skipped'] else 0)
@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+"""
+小红书自动发布工具的发布前预检
+
+在启动浏览器之前按平台限制检查每篇笔记：字段类型、标题和正文长度（按平台的计字规则）、
+标签数量，以及图片目录中的图片数量、大小、尺寸和格式（只读取文件头，见content_library）。
+批量内容按批在线程池中并行检查，每篇笔记得到一份报告；只有通过预检的笔记才会占用浏览器。
+
+单独运行（输出每篇笔记的预检报告，JSONL）：
+    python preflight.py posts.jsonl
+"""
+
+import os
+import math
+from typing import Iterable, Iterator, List, Dict, Optional, Any, Tuple
+
+from logging_config import logger
+
+# 小红书发布页面的内容限制（按platform_length计字）；超出时页面会截断或拒绝发布
+POST_LIMITS = {
+    'title_max_chars': 20,
+    'description_max_chars': 1000,
+    'max_hashtags': 10,
+}
+
+# === 默认预检参数 ===
+PREFLIGHT_DEFAULTS = {
+    'enabled': True,  # 批量发布前是否预检，未通过的笔记不启动浏览器
+    'workers': 8,  # 并行检查的线程数
+    'batch_size': 64,  # 每批检查的笔记数量（逐篇读取的内容按批预检，内存占用与总数无关）
+    'strict_limits': True,  # 标题、正文长度或标签数量超出POST_LIMITS时视为不通过，否则只记录警告
+}
+
+# 不单独计字的字符：零宽连接符、变体选择符和肤色修饰符（组合emoji按一个字计算）
+ZERO_WIDTH = {0x200D, 0xFE0E, 0xFE0F} | set(range(0x1F3FB, 0x1F400))
+
+
+def get_preflight_settings(config: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """合并PREFLIGHT_DEFAULTS和配置中的preflight参数"""
+    settings = PREFLIGHT_DEFAULTS.copy()
+    settings.update((config or {}).get('preflight') or {})
+    return settings
+
+
+def platform_length(text: str) -> int:
+    """按小红书的规则计算字数：中文、全角字符和emoji各算1字，半角字符（英文、数字、半角标点、空格）两个算1字"""
+    half_units = 0
+    joined = False
+    for char in text:
+        code = ord(char)
+        if code in ZERO_WIDTH:
+            joined = code == 0x200D
+            continue
+        if joined:
+            # 零宽连接符后面的字符与前一个emoji组成一个字
+            joined = False
+            continue
+        half_units += 1 if code < 0x80 else 2
+    return math.ceil(half_units / 2)
+
+
+def check_fields(data: Any, limits: Optional[Dict[str, int]] = None) -> Tuple[List[str], List[str]]:
+    """检查post_data的字段
+
+    Returns:
+        (errors, limit_problems)：errors为字段缺失或类型错误，limit_problems为超出长度或数量限制
+    """
+    limits = limits or POST_LIMITS
+    if not isinstance(data, dict):
+        return ["发布数据必须是字典"], []
+    errors = []
+    for field in ('title', 'description'):
+        if field not in data:
+            errors.append(f"发布数据缺少必要字段: {field}")
+        elif not isinstance(data[field], str) or not data[field].strip():
+            errors.append(f"发布数据字段 {field} 必须是非空字符串")
+    hashtags = data.get('hashtags')
+    if hashtags is not None and (not isinstance(hashtags, list) or not all(isinstance(t, str) for t in hashtags)):
+        errors.append("发布数据字段 hashtags 必须是字符串列表")
+        hashtags = None
+    if data.get('image_dir') is not None and not isinstance(data['image_dir'], str):
+        errors.append("发布数据字段 image_dir 必须是字符串")
+    if errors:
+        return errors, []
+
+    problems = []
+    title_length = platform_length(data['title'])
+    if title_length > limits['title_max_chars']:
+        problems.append(f"标题超过 {limits['title_max_chars']} 字（{title_length} 字）")
+    # 标签会追加在正文末尾，一起计字
+    body = f"{data['description']}\n{' '.join(hashtags)}" if hashtags else data['description']
+    body_length = platform_length(body)
+    if body_length > limits['description_max_chars']:
+        problems.append(f"正文超过 {limits['description_max_chars']} 字（{body_length} 字）")
+    if hashtags and len(hashtags) > limits['max_hashtags']:
+        problems.append(f"标签超过 {limits['max_hashtags']} 个（{len(hashtags)} 个）")
+    return errors, problems
+
+
+# === 单篇预检 ===
+def check_post(post: Dict[str, Any], config: Optional[Dict[str, Any]] = None,
+               settings: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """预检一篇笔记（不启动浏览器，不创建目录）
+
+    Returns:
+        报告：{'title', 'ok', 'errors', 'warnings', 'image_dir', 'images'（可以上传的图片数）}
+    """
+    from content_library import get_library_settings, lookup_folder
+
+    config = config or {}
+    settings = settings or get_preflight_settings(config)
+    if isinstance(post, dict) and post.get('invalid'):
+        # ingest.iter_valid_posts为无效内容产出的占位，原因已在读取时确定
+        return {'title': post.get('title'), 'ok': False, 'errors': [f"{post['invalid']}（{post.get('source')}）"],
+                'warnings': [], 'image_dir': None, 'images': 0}
+    errors, problems = check_fields(post)
+    warnings = []
+    (errors if settings['strict_limits'] else warnings).extend(problems)
+
+    image_dir = (post.get('image_dir') if isinstance(post, dict) else None) or config.get('image_dir')
+    report = {
+        'title': post.get('title') if isinstance(post, dict) else None,
+        'ok': False,
+        'errors': errors,
+        'warnings': warnings,
+        'image_dir': image_dir,
+        'images': 0,
+    }
+    if not isinstance(image_dir, str) or not image_dir:
+        errors.append("未指定图片目录")
+    elif not os.path.isdir(image_dir):
+        errors.append(f"图片目录不存在: {image_dir}")
+    else:
+        try:
+            found = lookup_folder(image_dir, get_library_settings(config))
+        except OSError as e:
+            errors.append(f"读取图片目录失败: {str(e)}")
+        else:
+            # 无效的图片在发布时会被跳过，只要还有可以上传的图片就不阻止发布
+            warnings.extend(found['errors'])
+            report['images'] = len(found['images'])
+            if not found['images']:
+                errors.append(f"图片目录 {image_dir} 中没有有效的图片文件")
+    report['ok'] = not errors
+    return report
+
+
+# === 批量预检 ===
+def iter_preflight(posts: Iterable[Dict[str, Any]],
+                   config: Optional[Dict[str, Any]] = None) -> Iterator[Tuple[Dict[str, Any], Dict[str, Any]]]:
+    """按批并行预检，按原顺序逐篇产出 (post_data, 报告)，报告额外包含index字段"""
+    from concurrent.futures import ThreadPoolExecutor
+
+    settings = get_preflight_settings(config)
+    batch_size = max(1, int(settings['batch_size']))
+    with ThreadPoolExecutor(max_workers=max(1, int(settings['workers'])),
+                            thread_name_prefix='preflight') as executor:
+        index = 0
+        batch = []
+        iterator = iter(posts)
+        while True:
+            batch.clear()
+            for post in iterator:
+                batch.append(post)
+                if len(batch) >= batch_size:
+                    break
+            if not batch:
+                return
+            for post, report in zip(batch, executor.map(lambda p: check_post(p, config, settings), batch)):
+                report['index'] = index
+                index += 1
+                _log_report(report)
+                yield post, report
+
+
+def preflight_posts(posts: Iterable[Dict[str, Any]],
+                    config: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+    """预检一批笔记，返回每篇笔记的报告（顺序与posts一致）"""
+    reports = [report for _, report in iter_preflight(posts, config)]
+    passed = sum(1 for r in reports if r['ok'])
+    logger.info(f"预检完成: 通过 {passed}/{len(reports)}")
+    return reports
+
+
+def _log_report(report: Dict[str, Any]) -> None:
+    for warning in report['warnings']:
+        logger.warning(f"预检 [{report['index']}] {report['title']}: {warning}")
+    for error in report['errors']:
+        logger.error(f"预检未通过 [{report['index']}] {report['title']}: {error}")
+
+
+if __name__ == '__main__':
+    import sys
+    import json
+    import argparse
+    parser = argparse.ArgumentParser(description='发布前预检：输出每篇笔记的预检报告（JSONL）')
+    parser.add_argument('source', help='JSONL/JSON/Markdown文件或目录')
+    parser.add_argument('--config', default='config.json', help='配置文件路径')
+    args = parser.parse_args()
+
+    from ingest import iter_posts
+    from rednote_auto_post import load_config
+    failed = 0
+    for _, report in iter_preflight(iter_posts(args.source), load_config(args.config)):
+        failed += not report['ok']
+        print(json.dumps(report, ensure_ascii=False))
+    sys.exit(1 if failed else 0)
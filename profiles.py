@@ -0,0 +1,344 @@
+# -*- coding: utf-8 -*-
+"""
+小红书自动发布工具的持久化Chrome配置目录
+
+默认每次启动Chrome都使用一次性的用户数据目录，创作平台的JS/CSS每次都要重新下载。
+启用profile后每个账号使用一个受管理的持久化目录：
+- 加锁：同一时间只允许一个浏览器使用一个目录，其他进程等待或立即报错；持有锁的进程退出后锁自动失效
+- 预热：新建或清空缓存后的目录在第一次启动时先加载一遍创建页面，把页面资源写入HTTP缓存
+- 压缩：按间隔删除崩溃报告、着色器缓存、浏览历史等发布用不到的文件；
+  目录仍超过上限时清空HTTP缓存，下次启动重新预热
+
+单独运行：
+    python profiles.py list              # 列出配置目录、大小和状态
+    python profiles.py compact [--name]  # 压缩配置目录
+    python profiles.py warm [--name]     # 启动浏览器加载Cookie并预热
+"""
+
+import os
+import json
+import time
+import shutil
+import socket
+from typing import List, Dict, Optional, Any
+
+from logging_config import logger
+
+# === 默认配置目录参数 ===
+PROFILE_DEFAULTS = {
+    'enabled': False,  # 是否使用持久化的配置目录（保留HTTP缓存和登录状态）
+    'root': 'profiles',  # 未指定user_data_dir时，配置目录为 root/name
+    'name': 'default',  # 配置目录名，多账号并行发布时为账号名
+    'lock_timeout': 0,  # 目录被其他浏览器占用时的最长等待时间（秒），0表示立即报错
+    'warm_up': True,  # 新建或清空缓存后的目录先加载一遍warm_urls
+    'warm_urls': [],  # 预热的页面，空列表表示创建页面
+    'prelaunch': True,  # 批量发布时在预检的同时启动浏览器并停在创建页面
+    'disk_cache_bytes': 256 * 1024 * 1024,  # Chrome磁盘缓存上限
+    'compact_interval_hours': 24,  # 压缩间隔（小时），0表示每次启动前都压缩
+    'max_profile_bytes': 1024 * 1024 * 1024,  # 压缩后目录仍超过该大小时清空HTTP缓存
+}
+
+_LOCK_FILE = '.rednote.lock'
+_STATE_FILE = '.rednote_profile.json'
+
+# 压缩时删除的文件和目录（相对配置目录）：崩溃报告、统计数据、着色器和GPU缓存、浏览历史等
+_BLOAT_PATHS = (
+    'Crashpad', 'BrowserMetrics', 'BrowserMetrics-spare.pma', 'ShaderCache', 'GrShaderCache',
+    'GraphiteDawnCache', 'component_crx_cache', 'optimization_guide_model_store',
+    os.path.join('Default', 'GPUCache'),
+    os.path.join('Default', 'DawnGraphiteCache'),
+    os.path.join('Default', 'DawnWebGPUCache'),
+    os.path.join('Default', 'Media Cache'),
+    os.path.join('Default', 'blob_storage'),
+    os.path.join('Default', 'Sessions'),
+    os.path.join('Default', 'History'),
+    os.path.join('Default', 'History-journal'),
+    os.path.join('Default', 'Visited Links'),
+    os.path.join('Default', 'Top Sites'),
+    os.path.join('Default', 'Top Sites-journal'),
+    os.path.join('Default', 'Favicons'),
+    os.path.join('Default', 'Favicons-journal'),
+    os.path.join('Default', 'Network Action Predictor'),
+)
+# HTTP缓存和脚本编译缓存，目录超过上限时整体删除
+_CACHE_PATHS = (
+    os.path.join('Default', 'Cache'),
+    os.path.join('Default', 'Code Cache'),
+    os.path.join('Default', 'Service Worker', 'CacheStorage'),
+)
+
+
+class ProfileLockedError(RuntimeError):
+    """配置目录正在被其他浏览器使用"""
+
+
+def get_profile_settings(config: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """合并PROFILE_DEFAULTS和配置中的profile参数"""
+    settings = PROFILE_DEFAULTS.copy()
+    settings.update((config or {}).get('profile') or {})
+    return settings
+
+
+def _pid_alive(pid: int) -> bool:
+    """本机进程是否仍在运行"""
+    if pid <= 0:
+        return False
+    if os.name == 'nt':
+        import ctypes
+        kernel32 = ctypes.windll.kernel32
+        handle = kernel32.OpenProcess(0x1000, False, pid)  # PROCESS_QUERY_LIMITED_INFORMATION
+        if not handle:
+            return False
+        code = ctypes.c_ulong()
+        kernel32.GetExitCodeProcess(handle, ctypes.byref(code))
+        kernel32.CloseHandle(handle)
+        return code.value == 259  # STILL_ACTIVE
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def directory_size(path: str) -> int:
+    """目录中所有文件的总大小（字节）"""
+    total = 0
+    for dirpath, _, filenames in os.walk(path):
+        for filename in filenames:
+            try:
+                total += os.lstat(os.path.join(dirpath, filename)).st_size
+            except OSError:
+                pass
+    return total
+
+
+def _remove(path: str) -> bool:
+    if os.path.isdir(path) and not os.path.islink(path):
+        shutil.rmtree(path, ignore_errors=True)
+    elif os.path.lexists(path):
+        try:
+            os.remove(path)
+        except OSError as e:
+            logger.debug("删除 %s 失败: %s", path, e)
+            return False
+    else:
+        return False
+    return True
+
+
+# === 配置目录 ===
+class ManagedProfile:
+    """一个持久化的Chrome用户数据目录
+
+    Args:
+        path: 目录路径
+        settings: 配置目录参数，见PROFILE_DEFAULTS
+    """
+
+    def __init__(self, path: str, settings: Optional[Dict[str, Any]] = None):
+        self.path = os.path.abspath(path)
+        self.settings = PROFILE_DEFAULTS.copy()
+        self.settings.update(settings or {})
+        self.locked = False
+
+    @classmethod
+    def from_config(cls, config: Optional[Dict[str, Any]] = None) -> Optional['ManagedProfile']:
+        """按配置返回配置目录，未启用时返回None；配置中的user_data_dir优先于 root/name"""
+        config = config or {}
+        settings = get_profile_settings(config)
+        if not settings['enabled']:
+            return None
+        return cls(config.get('user_data_dir') or os.path.join(settings['root'], settings['name']), settings)
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.release()
+
+    # --- 状态 ---
+    def _state_path(self) -> str:
+        return os.path.join(self.path, _STATE_FILE)
+
+    def load_state(self) -> Dict[str, Any]:
+        try:
+            with open(self._state_path(), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _update_state(self, **changes) -> None:
+        state = self.load_state()
+        state.update(changes)
+        tmp_path = self._state_path() + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self._state_path())
+
+    # --- 加锁 ---
+    def acquire(self) -> None:
+        """锁定目录，必要时先压缩（Chrome启动之前）
+
+        Raises:
+            ProfileLockedError: 目录被其他仍在运行的进程占用，且在lock_timeout内未释放
+        """
+        if self.locked:
+            return
+        os.makedirs(self.path, exist_ok=True)
+        lock_path = os.path.join(self.path, _LOCK_FILE)
+        owner = {'pid': os.getpid(), 'host': socket.gethostname(), 'time': time.time()}
+        deadline = time.monotonic() + float(self.settings['lock_timeout'])
+        while True:
+            try:
+                fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                holder = self._lock_holder(lock_path)
+                if holder is None:
+                    # 持有锁的进程已退出
+                    logger.warning(f"清除配置目录的过期锁: {self.path}")
+                    _remove(lock_path)
+                    continue
+                if time.monotonic() >= deadline:
+                    raise ProfileLockedError(f"配置目录 {self.path} 正在被进程 {holder} 使用")
+                time.sleep(0.5)
+                continue
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(owner, f)
+            break
+        self.locked = True
+        logger.debug("已锁定配置目录: %s", self.path)
+        try:
+            if self.compaction_due():
+                self.compact()
+        except Exception as e:
+            logger.warning(f"压缩配置目录失败: {str(e)}")
+
+    def _lock_holder(self, lock_path: str) -> Optional[str]:
+        """返回持有锁的进程描述，锁已过期时返回None"""
+        try:
+            with open(lock_path, 'r', encoding='utf-8') as f:
+                owner = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError):
+            # 另一个进程刚创建锁文件还未写入内容；长时间无法读取说明写入锁的进程已异常退出
+            try:
+                stale = time.time() - os.path.getmtime(lock_path) > 30
+            except OSError:
+                return None
+            return None if stale else 'unknown'
+        if owner.get('host') == socket.gethostname() and not _pid_alive(int(owner.get('pid', 0))):
+            return None
+        return f"{owner.get('host')}:{owner.get('pid')}"
+
+    def release(self) -> None:
+        """释放目录锁（浏览器退出之后调用）"""
+        if not self.locked:
+            return
+        _remove(os.path.join(self.path, _LOCK_FILE))
+        self.locked = False
+        logger.debug("已释放配置目录: %s", self.path)
+
+    # --- 预热 ---
+    def needs_warm_up(self) -> bool:
+        return bool(self.settings['warm_up']) and not self.load_state().get('warmed_at')
+
+    def warm_up(self, driver, urls: List[str]) -> int:
+        """依次打开urls，把页面资源写入HTTP缓存，返回成功加载的页面数"""
+        from browser_backend import as_backend
+
+        backend = as_backend(driver)
+        loaded = 0
+        for url in urls:
+            try:
+                backend.navigate(url)
+                loaded += 1
+            except Exception as e:
+                logger.warning(f"预热页面失败 {url}: {str(e)}")
+        if loaded:
+            self._update_state(warmed_at=time.time())
+            logger.info(f"配置目录已预热: {loaded} 个页面")
+        return loaded
+
+    # --- 压缩 ---
+    def compaction_due(self) -> bool:
+        if not os.path.isdir(os.path.join(self.path, 'Default')):
+            return False
+        last = self.load_state().get('compacted_at') or 0
+        return time.time() - last >= float(self.settings['compact_interval_hours']) * 3600
+
+    def compact(self) -> Dict[str, int]:
+        """删除发布用不到的文件；目录仍超过max_profile_bytes时清空HTTP缓存（只能在浏览器未运行时调用）
+
+        Returns:
+            {'before': 压缩前大小, 'after': 压缩后大小, 'removed': 删除的文件和目录数}
+        """
+        before = directory_size(self.path)
+        removed = sum(_remove(os.path.join(self.path, path)) for path in _BLOAT_PATHS)
+        after = directory_size(self.path)
+        changes = {'compacted_at': time.time()}
+        if after > self.settings['max_profile_bytes']:
+            removed += sum(_remove(os.path.join(self.path, path)) for path in _CACHE_PATHS)
+            after = directory_size(self.path)
+            # 缓存已清空，下次启动重新预热
+            changes['warmed_at'] = None
+            logger.info("配置目录超过大小上限，已清空HTTP缓存")
+        self._update_state(**changes)
+        logger.info(f"配置目录已压缩: {self.path}（{before // 1024} KB → {after // 1024} KB）")
+        return {'before': before, 'after': after, 'removed': removed}
+
+    def describe(self) -> Dict[str, Any]:
+        state = self.load_state()
+        lock_path = os.path.join(self.path, _LOCK_FILE)
+        return {
+            'path': self.path,
+            'bytes': directory_size(self.path),
+            'locked_by': self._lock_holder(lock_path) if os.path.exists(lock_path) else None,
+            'warmed_at': state.get('warmed_at'),
+            'compacted_at': state.get('compacted_at'),
+        }
+
+
+def list_profiles(config: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+    """root下的全部配置目录"""
+    settings = get_profile_settings(config)
+    root = settings['root']
+    if not os.path.isdir(root):
+        return []
+    return [ManagedProfile(os.path.join(root, name), settings).describe()
+            for name in sorted(os.listdir(root)) if os.path.isdir(os.path.join(root, name))]
+
+
+if __name__ == '__main__':
+    import sys
+    import argparse
+    parser = argparse.ArgumentParser(description='管理持久化的Chrome配置目录')
+    parser.add_argument('command', choices=('list', 'compact', 'warm'))
+    parser.add_argument('--config', default='config.json', help='配置文件路径')
+    parser.add_argument('--name', help='配置目录名，默认使用配置中的profile.name')
+    args = parser.parse_args()
+
+    from rednote_auto_post import load_config
+    config = load_config(args.config)
+    config['profile'] = dict(config.get('profile') or {}, enabled=True)
+    if args.name:
+        config['profile']['name'] = args.name
+    if args.command == 'list':
+        for item in list_profiles(config):
+            print(json.dumps(item, ensure_ascii=False))
+        sys.exit(0)
+
+    profile = ManagedProfile.from_config(config)
+    if args.command == 'compact':
+        with profile:
+            print(json.dumps(profile.compact(), ensure_ascii=False))
+    else:
+        from rednote_auto_post import start_authenticated_browser
+        config['profile']['warm_up'] = True
+        with profile:
+            profile._update_state(warmed_at=None)
+            driver = start_authenticated_browser(dict(config, user_data_dir=profile.path), profile=profile)
+            driver.quit()
@@ -0,0 +1,293 @@
+# -*- coding: utf-8 -*-
+"""
+小红书自动发布工具的常驻发布服务
+
+服务启动时预先启动一组已登录的浏览器（PublishSession）并停在创建页面，通过本机HTTP端口
+或Unix socket接收post_data，发布后以JSON返回结果。每次发布完成后浏览器会重新停回创建页面，
+下一篇笔记无需再次启动Python、Selenium和Chrome，也无需加载Cookie。
+
+接口：
+    GET  /health   服务状态：{"status": "ok", "pool_size": 2, "idle": 1, "browsers": [每个浏览器的资源使用]}
+    POST /publish  请求体为一个post_data，返回PublishSession.publish()的结果；启用preflight时先预检，
+                   未通过的笔记不占用浏览器，直接返回failure为permanent的结果
+
+使用方法：
+    python rednote_auto_post.py service
+    python rednote_auto_post.py --title "标题" --description "正文" --image-dir images   # 服务运行时自动转发
+"""
+
+import os
+import json
+import queue
+import socket
+import http.client
+import socketserver
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Dict, Optional, Any, Iterable, Iterator
+
+from logging_config import logger
+
+# === 默认服务参数 ===
+SERVICE_DEFAULTS = {
+    'host': '127.0.0.1',  # HTTP监听地址（仅限本机）
+    'port': 8790,  # HTTP监听端口
+    'socket_path': None,  # Unix socket路径，设置后代替HTTP端口监听
+    'pool_size': 1,  # 常驻浏览器数量（同一账号）
+    'acquire_timeout': 600,  # 等待空闲浏览器的最长时间（秒）
+    'client_timeout': 900,  # 客户端等待发布结果的最长时间（秒）
+    'probe_timeout': 0.5,  # 客户端探测服务是否运行的超时时间（秒）
+}
+
+# 客户端提交的post_data中按本机路径解析的字段
+_PATH_FIELDS = ('image_dir',)
+
+
+def get_service_settings(config: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """合并SERVICE_DEFAULTS和配置中的service参数"""
+    settings = SERVICE_DEFAULTS.copy()
+    settings.update((config or {}).get('service') or {})
+    return settings
+
+
+# === 浏览器池 ===
+class BrowserPool:
+    """一组停在创建页面的PublishSession，同一时间每个会话只处理一篇笔记"""
+
+    def __init__(self, config: Dict[str, Any], size: int = 1):
+        self.size = max(1, int(size))
+        self.config = config
+        self._idle = queue.Queue()
+        self.sessions = []
+        from rednote_auto_post import PublishSession
+        for index in range(self.size):
+            session_config = dict(config)
+            # Chrome的用户数据目录不能被多个浏览器同时使用
+            if self.size > 1 and session_config.get('user_data_dir'):
+                session_config['user_data_dir'] = os.path.join(session_config['user_data_dir'], f'pool-{index}')
+            elif self.size > 1:
+                profile = dict(session_config.get('profile') or {})
+                profile['name'] = f"{profile.get('name') or 'default'}-pool-{index}"
+                session_config['profile'] = profile
+            self.sessions.append(PublishSession(session_config))
+
+    def warm_up(self) -> int:
+        """启动全部浏览器并停在创建页面，返回成功预热的数量"""
+        ready = 0
+        for index, session in enumerate(self.sessions):
+            logger.info(f"预热浏览器 {index + 1}/{self.size}")
+            if session.park():
+                ready += 1
+            self._idle.put(session)
+        return ready
+
+    def idle_count(self) -> int:
+        return self._idle.qsize()
+
+    def resource_report(self) -> List[Dict[str, Any]]:
+        """每个会话当前浏览器的资源使用（见governor），没有运行中的浏览器时为None"""
+        return [session.governor.current.as_dict() if session.governor.current is not None else None
+                for session in self.sessions]
+
+    def acquire(self, timeout: Optional[float] = None):
+        """取出一个空闲会话，超时返回None"""
+        try:
+            return self._idle.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def release(self, session) -> None:
+        """重新停回创建页面后放回池中"""
+        if not session.parked:
+            session.park()
+        self._idle.put(session)
+
+    def close(self) -> None:
+        for session in self.sessions:
+            session.__exit__(None, None, None)
+
+
+# === HTTP服务 ===
+def _make_handler(pool: BrowserPool, settings: Dict[str, Any]):
+    from preflight import check_post, get_preflight_settings
+    from rednote_auto_post import _preflight_result
+
+    preflight = get_preflight_settings(pool.config)
+
+    class PublishHandler(BaseHTTPRequestHandler):
+        def _send_json(self, status: int, payload: Dict[str, Any]) -> None:
+            body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            self.wfile.flush()
+
+        def do_GET(self):
+            if self.path != '/health':
+                self._send_json(404, {'error': f"未知路径: {self.path}"})
+                return
+            self._send_json(200, {'status': 'ok', 'pool_size': pool.size, 'idle': pool.idle_count(),
+                                  'browsers': pool.resource_report()})
+
+        def do_POST(self):
+            if self.path != '/publish':
+                self._send_json(404, {'error': f"未知路径: {self.path}"})
+                return
+            try:
+                length = int(self.headers.get('Content-Length') or 0)
+                post_data = json.loads(self.rfile.read(length).decode('utf-8') or '{}')
+                if not isinstance(post_data, dict):
+                    raise ValueError("请求体必须是JSON对象")
+            except ValueError as e:
+                self._send_json(400, {'error': f"请求无效: {str(e)}"})
+                return
+
+            if preflight['enabled']:
+                # 与本地批量发布一致：未通过预检（含strict_limits）的笔记不占用浏览器
+                result = _preflight_result(check_post(post_data, pool.config, preflight))
+                if result is not None:
+                    logger.error(f"{result['error']}: {post_data.get('title')}")
+                    self._send_json(200, result)
+                    return
+
+            session = pool.acquire(timeout=settings['acquire_timeout'])
+            if session is None:
+                self._send_json(503, {'error': "没有空闲的浏览器"})
+                return
+            try:
+                logger.info(f"收到发布请求: {post_data.get('title')}")
+                result = session.publish(post_data)
+                self._send_json(200, result)
+            except Exception as e:
+                logger.error(f"处理发布请求出错: {str(e)}")
+                self._send_json(500, {'error': str(e)})
+            finally:
+                # 先返回结果，再让浏览器停回创建页面
+                pool.release(session)
+
+        def log_message(self, format, *args):
+            logger.debug("服务请求: " + format, *args)
+
+    return PublishHandler
+
+
+class _UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def get_request(self):
+        request, _ = super().get_request()
+        # BaseHTTPRequestHandler需要(host, port)形式的客户端地址
+        return request, ('local', 0)
+
+
+def run_service(config: Optional[Dict[str, Any]] = None, settings: Optional[Dict[str, Any]] = None) -> None:
+    """启动常驻发布服务（阻塞运行，Ctrl+C退出）"""
+    merged = get_service_settings(config)
+    merged.update(settings or {})
+    pool = BrowserPool(config or {}, merged['pool_size'])
+    ready = pool.warm_up()
+    logger.info(f"已预热 {ready}/{pool.size} 个浏览器")
+
+    handler = _make_handler(pool, merged)
+    if merged.get('socket_path'):
+        socket_path = merged['socket_path']
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        server = _UnixHTTPServer(socket_path, handler)
+        logger.info(f"发布服务已启动: unix:{socket_path}")
+    else:
+        server = ThreadingHTTPServer((merged['host'], merged['port']), handler)
+        logger.info(f"发布服务已启动: http://{merged['host']}:{merged['port']}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logger.info("收到退出信号，发布服务停止")
+    finally:
+        server.server_close()
+        pool.close()
+        if merged.get('socket_path') and os.path.exists(merged['socket_path']):
+            os.remove(merged['socket_path'])
+
+
+# === 客户端 ===
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, socket_path: str, timeout: Optional[float] = None):
+        super().__init__('localhost', timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+
+class ServiceClient:
+    """常驻发布服务的客户端"""
+
+    def __init__(self, settings: Optional[Dict[str, Any]] = None):
+        self.settings = SERVICE_DEFAULTS.copy()
+        self.settings.update(settings or {})
+
+    @classmethod
+    def from_config(cls, config: Optional[Dict[str, Any]] = None) -> 'ServiceClient':
+        return cls(get_service_settings(config))
+
+    def _connection(self, timeout: float):
+        if self.settings.get('socket_path'):
+            return _UnixHTTPConnection(self.settings['socket_path'], timeout=timeout)
+        return http.client.HTTPConnection(self.settings['host'], self.settings['port'], timeout=timeout)
+
+    def _request(self, method: str, path: str, payload: Optional[Dict[str, Any]] = None,
+                 timeout: Optional[float] = None) -> Dict[str, Any]:
+        conn = self._connection(timeout or self.settings['client_timeout'])
+        try:
+            body = json.dumps(payload, ensure_ascii=False).encode('utf-8') if payload is not None else None
+            headers = {'Content-Type': 'application/json; charset=utf-8'} if body is not None else {}
+            conn.request(method, path, body=body, headers=headers)
+            response = conn.getresponse()
+            data = json.loads(response.read().decode('utf-8') or '{}')
+            if response.status != 200:
+                raise RuntimeError(data.get('error') or f"HTTP {response.status}")
+            return data
+        finally:
+            conn.close()
+
+    def is_available(self) -> bool:
+        """服务是否正在运行"""
+        if self.settings.get('socket_path') and not os.path.exists(self.settings['socket_path']):
+            return False
+        try:
+            return self._request('GET', '/health', timeout=self.settings['probe_timeout']).get('status') == 'ok'
+        except (OSError, ValueError, RuntimeError):
+            return False
+
+    def publish(self, post_data: Dict[str, Any]) -> Dict[str, Any]:
+        """提交一篇笔记并等待发布结果"""
+        payload = dict(post_data)
+        for field in _PATH_FIELDS:
+            if payload.get(field):
+                payload[field] = os.path.abspath(payload[field])
+        return self._request('POST', '/publish', payload)
+
+    def iter_publish(self, posts: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        """依次提交多篇笔记，每篇完成后产出结果，结果额外包含index字段"""
+        for index, data in enumerate(posts):
+            if data.get('invalid'):
+                # ingest.iter_valid_posts为无效内容产出的占位，不提交给服务
+                from rednote_auto_post import _invalid_content_result
+                result = _invalid_content_result(data)
+                result['index'] = index
+                yield result
+                continue
+            try:
+                result = self.publish(data)
+            except (OSError, ValueError, RuntimeError) as e:
+                logger.error(f"提交到发布服务失败: {str(e)}")
+                result = {'title': data.get('title'), 'success': False, 'attempts': 0, 'error': str(e), 'elapsed': 0.0}
+            result['index'] = index
+            yield result
+
+    def publish_many(self, posts: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """依次提交多篇笔记，结果额外包含index字段"""
+        return list(self.iter_publish(posts))
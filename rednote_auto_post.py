@@ -21,44 +21,297 @@ import datetime
 import traceback
 import json
 import re
-from typing import List, Dict, Optional, Union, Any
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-import pickle
+from typing import List, Dict, Optional, Union, Any, Callable, Iterable, Iterator
 
 # 导入日志配置
-from logging_config import logger
-from example_post import post_data
+# Selenium 和示例内容在首次使用时才导入，导入本模块不会启动浏览器相关依赖或创建日志文件
+from logging_config import logger, log_context
+from preflight import POST_LIMITS, check_fields, get_preflight_settings
+from metrics import PublishMetrics
+from session import (SessionExpiredError, load_cookie_store, save_cookie_store, check_cookies,
+                     inject_cookies, is_login_page, ensure_logged_in, LOGIN_URL_MARKERS)
+from retry_policy import TRANSIENT, SESSION, BROWSER, PERMANENT, PermanentPublishError
+from browser_backend import (BACKENDS, WaitTimeout, attach_command_counter, as_backend,
+                             PRESENT_JS, CLICKABLE_JS)
 
 # === 默认配置参数 ===
 DEFAULT_CONFIG = {
     'cookie_path': 'cookies.pkl',  # 登录后的 Cookie 文件路径
+    'account': None,  # 账号名，发布账本按账号区分指纹（多账号模式下自动设为账号名）
     'image_dir': 'images_to_post',  # 图片文件夹
     'max_retries': 1,  # 最大重试次数
-    'default_content': post_data,
-    'debug': False  # 调试模式
+    'retry': {},  # 重试间隔和发布期限，见 retry_policy.RETRY_DEFAULTS
+    'default_content': None,  # 默认发布内容，None表示使用example_post.py中的示例
+    'debug': False,  # 调试模式
+    'headless': False,  # 无头模式（未找到Cookie文件需要手动登录时自动使用有界面模式）
+    'backend': 'selenium',  # 浏览器后端：selenium 或 cdp（直接使用DevTools协议，需要websocket-client）
+    'browser': {},  # 浏览器参数，见 BROWSER_DEFAULTS
+    'timeout': 15,  # 等待页面元素的最长时间（秒）
+    'upload_timeout': 120,  # 等待图片上传完成的最长时间（秒）
+    'wait_after_upload': 3,  # 上传完成后等待编辑器可输入的最长时间（秒），0表示使用timeout
+    'wait_after_publish': 5,  # 点击发布后等待发布成功提示的最长时间（秒）
+    'wait_profile': 'default',  # 等待策略：default 或 fast
+    'image_preprocess': {'enabled': False},  # 图片预处理参数，见 image_preprocess.PREPROCESS_DEFAULTS
+    'metrics': {'enabled': False},  # 耗时统计参数，见 metrics.METRICS_DEFAULTS
+    'ledger': {'enabled': False},  # 发布账本参数，见 ledger.LEDGER_DEFAULTS
+    'artifacts': {},  # 失败现场记录参数，见 artifacts.ARTIFACT_DEFAULTS
+    'preflight': {},  # 发布前预检参数，见 preflight.PREFLIGHT_DEFAULTS
+    'profile': {},  # 持久化Chrome配置目录参数，见 profiles.PROFILE_DEFAULTS
+    'governor': {},  # 浏览器资源上限和替换参数，见 governor.GOVERNOR_DEFAULTS
+    'pipeline': {},  # 多标签页流水线发布参数，见 pipeline.PIPELINE_DEFAULTS
+    'templates': {},  # 模板生成内容的标签组、emoji和字数规则，见 post_templates.TEMPLATE_DEFAULTS
+    'content_library': {}  # 图片扫描和校验参数，见 content_library.LIBRARY_DEFAULTS
 }
 
+# === 等待策略 ===
+# 每个阶段都等待具体的页面信号，以下数值仅为上限；fast 策略缩短上限并加快轮询
+WAIT_PROFILES = {
+    'default': {'poll_frequency': 0.5},
+    'fast': {'poll_frequency': 0.1, 'wait_after_publish': 3},
+}
+
+# 发布页面使用的元素定位（XPath）
+SELECTORS = {
+    'file_input': '//input[@type="file"]',
+    'title_input': '//*[@placeholder="填写标题会有更多赞哦～"]',
+    'body_input': '//*[@data-placeholder="输入正文描述，真诚有价值的分享予人温暖"]',
+    'publish_button': '//*[text()="发布"]',
+    'upload_preview': '//div[contains(@class, "img-container")]//img',
+    'upload_progress': '//*[contains(@class, "uploading") or contains(@class, "upload-progress")]',
+    'publish_success': '//*[contains(text(), "发布成功")]',
+}
+
+# === 浏览器参数 ===
+BROWSER_DEFAULTS = {
+    'window_size': '1280,900',  # 固定窗口大小，None表示有界面时最大化
+    'lean': True,  # 关闭发布用不到的Chrome功能（翻译、同步、后台网络、组件更新等）
+    'block_resources': True,  # 通过DevTools协议屏蔽block_url_patterns中的请求
+    'block_url_patterns': [
+        # 字体
+        '*.woff', '*.woff2', '*.ttf', '*.otf', '*.eot',
+        # 音视频
+        '*.mp4', '*.webm', '*.m3u8', '*.flv', '*.mp3',
+        # 第三方统计和广告
+        '*google-analytics.com*', '*googletagmanager.com*', '*doubleclick.net*',
+        '*hm.baidu.com*', '*cnzz.com*', '*umeng.com*',
+    ],
+    'block_images': False,  # 禁止加载图片；上传预览依赖<img>元素而非图片内容，但页面观感会不同
+    'chrome_path': None,  # Chrome可执行文件路径，None表示自动查找
+}
+
+# lean模式下追加的Chrome启动参数
+LEAN_CHROME_ARGS = [
+    '--disable-background-networking',
+    '--disable-background-timer-throttling',
+    '--disable-component-update',
+    '--disable-default-apps',
+    '--disable-sync',
+    '--disable-features=Translate,OptimizationHints,MediaRouter,InterestFeedContentSuggestions',
+    '--metrics-recording-only',
+    '--mute-audio',
+    '--no-first-run',
+    '--no-default-browser-check',
+]
+
+# 小红书创作平台地址
+CREATOR_HOME_URL = "https://creator.xiaohongshu.com"
+CREATION_URL = "https://creator.xiaohongshu.com/publish/publish?from=menu&target=post"
+
 # === 初始化浏览器 ===
-def init_browser():
-    logger.info("初始化浏览器")
-    options = Options()
-    options.add_argument("--start-maximized")
+def get_browser_settings(config: Dict[str, Any]) -> Dict[str, Any]:
+    """合并BROWSER_DEFAULTS和配置中的browser参数"""
+    settings = BROWSER_DEFAULTS.copy()
+    settings.update(config.get('browser') or {})
+    return settings
+
+def block_urls(driver, patterns: List[str]) -> bool:
+    """通过DevTools协议屏蔽匹配的请求（支持*通配符），对之后的所有页面生效"""
+    if not patterns or not hasattr(driver, 'execute_cdp_cmd'):
+        return False
+    try:
+        driver.execute_cdp_cmd('Network.enable', {})
+        driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': list(patterns)})
+        logger.debug("已屏蔽 %d 类请求", len(patterns))
+        return True
+    except Exception as e:
+        logger.warning("设置请求屏蔽失败，继续加载全部资源: %s", e)
+        return False
+
+def _chrome_arguments(settings: Dict[str, Any], headless: bool) -> List[str]:
+    """两种后端共用的Chrome启动参数（不含用户数据目录）"""
+    arguments = []
+    if headless:
+        arguments.append("--headless=new")
+    if settings.get('window_size'):
+        arguments.append(f"--window-size={settings['window_size']}")
+    elif not headless:
+        arguments.append("--start-maximized")
     # 添加更多选项以提高稳定性
-    options.add_argument("--disable-extensions")
-    # options.add_argument("--disable-gpu")
-    options.add_argument("--no-sandbox")
-    options.add_argument("--disable-dev-shm-usage")
+    arguments.append("--disable-extensions")
+    # arguments.append("--disable-gpu")
+    arguments.append("--no-sandbox")
+    arguments.append("--disable-dev-shm-usage")
+    if settings.get('lean'):
+        arguments.extend(LEAN_CHROME_ARGS)
+    return arguments
+
+def init_browser(config: Optional[Dict[str, Any]] = None):
+    """启动Chrome
     
-    driver = webdriver.Chrome(service=Service(), options=options)
+    Args:
+        config: 配置字典，使用backend、headless、user_data_dir和browser（见BROWSER_DEFAULTS）
+        
+    Returns:
+        backend为selenium时返回Selenium WebDriver，为cdp时返回browser_backend.CdpBackend
+    """
+    config = config or {}
+    settings = get_browser_settings(config)
+    headless = bool(config.get('headless'))
+    backend = config.get('backend') or 'selenium'
+    if backend not in BACKENDS:
+        raise ValueError(f"不支持的浏览器后端: {backend}")
+    if backend == 'cdp':
+        try:
+            import websocket  # noqa: F401
+        except ImportError:
+            logger.warning("未安装 websocket-client，cdp后端不可用，改用selenium后端")
+            backend = 'selenium'
+    logger.info("初始化浏览器（%s）%s", backend, '（无头模式）' if headless else '')
+    arguments = _chrome_arguments(settings, headless)
+    from profiles import get_profile_settings
+    profile_settings = get_profile_settings(config)
+    if profile_settings['enabled']:
+        arguments.append(f"--disk-cache-size={int(profile_settings['disk_cache_bytes'])}")
+    from pipeline import get_pipeline_settings, PIPELINE_CHROME_ARGS
+    if get_pipeline_settings(config)['enabled']:
+        arguments.extend(PIPELINE_CHROME_ARGS)
+    # 每个账号使用独立的Chrome用户数据目录，避免多账号之间互相影响
+    user_data_dir = None
+    if config.get('user_data_dir'):
+        user_data_dir = os.path.abspath(config['user_data_dir'])
+        os.makedirs(user_data_dir, exist_ok=True)
+    
+    if backend == 'cdp':
+        from browser_backend import CdpBackend
+        if settings.get('block_images'):
+            arguments.append("--blink-settings=imagesEnabled=false")
+        driver = CdpBackend.launch(arguments, user_data_dir=user_data_dir, chrome_path=settings.get('chrome_path'))
+    else:
+        from selenium import webdriver
+        from selenium.webdriver.chrome.service import Service
+        from selenium.webdriver.chrome.options import Options
+        
+        options = Options()
+        for arg in arguments:
+            options.add_argument(arg)
+        if settings.get('block_images'):
+            options.add_experimental_option('prefs', {'profile.managed_default_content_settings.images': 2})
+        if user_data_dir:
+            options.add_argument(f"--user-data-dir={user_data_dir}")
+        if settings.get('chrome_path'):
+            options.binary_location = settings['chrome_path']
+        driver = webdriver.Chrome(service=Service(), options=options)
+    if settings.get('block_resources'):
+        block_urls(driver, settings.get('block_url_patterns') or [])
     logger.debug("浏览器初始化完成")
     return driver
 
 # === 安全地设置输入框的值 ===
+# 在一次脚本执行中完成设置、触发事件、验证和备用方法（元素可以是XPath或元素句柄），每个字段依次尝试：
+# 1. 设置值并触发标准Event
+# 2. 设置值并触发InputEvent
+# 两种方法都未能写入时清空内容，交给send_keys回退
+# 注意：contentEditable元素默认使用textContent（防止XSS）；如需保留HTML格式（如粗体、链接等），
+# 请把write函数中的textContent改为innerHTML
+_SET_VALUES_JS = """
+function isEditable(el) {
+    return el.tagName === 'DIV' || el.getAttribute('contenteditable') === 'true';
+}
+function read(el) {
+    return isEditable(el) ? (el.textContent || el.innerHTML) : el.value;
+}
+function write(el, value) {
+    if (isEditable(el)) {
+        el.textContent = value;
+    } else {
+        el.value = value;
+    }
+}
+var strategies = [
+    ['event', function (el) {
+        el.dispatchEvent(new Event('input', {bubbles: true}));
+        el.dispatchEvent(new Event('change', {bubbles: true}));
+    }],
+    ['input_event', function (el) {
+        el.dispatchEvent(new InputEvent('input', {bubbles: true, cancelable: true, composed: true}));
+        el.dispatchEvent(new Event('change', {bubbles: true}));
+    }]
+];
+return arguments[0].map(function (field) {
+    var el = field[0], value = field[1];
+    if (typeof el === 'string') {
+        el = document.evaluate(el, document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+        if (!el) {
+            return {ok: false, strategy: null, editable: null, error: 'element not found: ' + field[0]};
+        }
+    }
+    var result = {ok: false, strategy: null, editable: isEditable(el), error: null};
+    for (var i = 0; i < strategies.length; i++) {
+        try {
+            write(el, value);
+            strategies[i][1](el);
+            if (read(el)) {
+                result.ok = true;
+                result.strategy = strategies[i][0];
+                return result;
+            }
+            write(el, '');
+        } catch (e) {
+            result.error = String(e);
+        }
+    }
+    write(el, '');
+    return result;
+});
+"""
+
+def set_input_values(driver, fields: List[tuple]) -> List[Dict[str, Any]]:
+    """在一次浏览器往返中设置多个输入框的值
+    
+    JavaScript方法都失败的字段会回退到模拟键盘输入（自动移除emoji），
+    该回退只对失败的字段额外发出命令。
+    
+    Args:
+        driver: Selenium WebDriver实例或浏览器后端（见browser_backend）
+        fields: (element, value, field_name) 元组列表，element为XPath或元素句柄
+        
+    Returns:
+        List[Dict]: 每个字段的结果，包含ok（是否成功）、strategy（生效的方法：
+            event、input_event、send_keys或None）、editable（是否为contentEditable元素）和error
+    """
+    backend = as_backend(driver)
+    try:
+        results = backend.run_script(_SET_VALUES_JS, [[element, value] for element, value, _ in fields])
+    except Exception as e:
+        logger.error("使用JavaScript输入内容时发生错误: %s", e)
+        results = [{'ok': False, 'strategy': None, 'editable': None, 'error': str(e)} for _ in fields]
+    
+    for (element, value, field_name), result in zip(fields, results):
+        if result['ok']:
+            logger.debug("已成功输入%s（%s）: %d 字", field_name, result['strategy'], len(value))
+            continue
+        logger.warning("JavaScript方法未能输入%s，回退到send_keys方法", field_name)
+        # 备用方法：send_keys不能处理emoji等非BMP字符，需要先移除
+        try:
+            safe_value = process_emoji_text(value, mode='remove')
+            backend.type_text(element, safe_value)
+            result.update(ok=True, strategy='send_keys')
+            logger.debug("已使用send_keys方法输入%s（已移除emoji）: %d 字", field_name, len(safe_value))
+        except Exception as inner_e:
+            result['error'] = str(inner_e)
+            logger.error("所有输入%s的方法都失败: %s", field_name, inner_e)
+    return results
+
 def safe_set_input_value(driver, element, value, field_name="输入框"):
     """安全地设置输入框的值，包含多层错误处理和备用方案
     
@@ -68,15 +321,15 @@ def safe_set_input_value(driver, element, value, field_name="输入框"):
     2. 如果第一种方法失败，尝试使用InputEvent替代Event对象
     3. 如果JavaScript方法都失败，回退到send_keys方法（自动移除emoji）
     
-    每一步都有验证和详细的日志记录，以便于调试问题。
+    前两层及其验证在同一次脚本执行中完成（见set_input_values），正常情况下只需一次浏览器往返。
     
     此函数支持两种类型的输入元素：
     - 标准表单元素（如input、textarea）：使用value属性设置值
     - contentEditable元素（如div）：使用textContent属性设置值
     
     Args:
-        driver: Selenium WebDriver实例
-        element: 输入元素（WebElement对象）
+        driver: Selenium WebDriver实例或浏览器后端
+        element: 输入元素（WebElement对象或XPath）
         value: 要设置的值（可以包含emoji等特殊字符）
         field_name: 字段名称，用于日志记录，默认为"输入框"
         
@@ -90,313 +343,561 @@ def safe_set_input_value(driver, element, value, field_name="输入框"):
         safe_set_input_value(driver, title_input, "✨ 测试标题 🚀", "标题")
         ```
     """
-    # 主要方法：使用JavaScript执行器处理包含emoji的文本并触发必要的事件
-    # 注意：如果需要保留HTML格式（如粗体、链接等），请取消注释innerHTML行并注释textContent行
-    # 例如：当处理富文本编辑器且需要保留格式化内容时，应使用innerHTML
-    js_set_value_with_events = """
-    // 检测元素类型并使用适当的属性设置值
-    if (arguments[0].tagName === 'DIV' || arguments[0].getAttribute('contenteditable') === 'true') {
-        // 对于contentEditable元素，使用textContent或innerHTML
-        // 注意：
-        // - textContent适用于纯文本内容，会移除所有HTML标签
-        // - innerHTML适用于需要保留HTML格式的情况（如粗体、链接等）
-        // 默认使用textContent，因为它更安全（防止XSS）且适合大多数情况
-        // 如果输入内容包含HTML标记且需要保留格式，请修改此处使用innerHTML
-        arguments[0].textContent = arguments[1];
-        // arguments[0].innerHTML = arguments[1];
-    } else {
-        // 对于标准表单元素，使用value属性
-        arguments[0].value = arguments[1];
-    }
-    arguments[0].dispatchEvent(new Event('input', { bubbles: true }));
-    arguments[0].dispatchEvent(new Event('change', { bubbles: true }));
-    return true; // 返回值以确认执行成功
-    """
+    return set_input_values(driver, [(element, value, field_name)])[0]['ok']
+
+# === 启动已登录的浏览器 ===
+def start_authenticated_browser(config: Dict[str, Any], metrics: Optional[PublishMetrics] = None,
+                                profile=None):
+    """初始化浏览器并加载Cookie，未找到Cookie文件时等待手动登录
     
-    try:
-        result = driver.execute_script(js_set_value_with_events, element, value)
-        if result:
-            logger.debug(f"已成功输入{field_name}: {value}")
-            # 验证文本是否已输入 - 根据元素类型检查不同属性
-            js_verify = """
-            if (arguments[0].tagName === 'DIV' || arguments[0].getAttribute('contenteditable') === 'true') {
-                return arguments[0].textContent || arguments[0].innerHTML;
-            } else {
-                return arguments[0].value;
-            }
-            """
-            actual_value = driver.execute_script(js_verify, element)
-            if actual_value:
-                return True
-            else:
-                logger.warning(f"{field_name}可能未成功输入，尝试备用方法")
-        else:
-            logger.warning(f"JavaScript执行器未返回成功状态（{field_name}）")
+    Cookie的过期检查在启动浏览器之前完成，登录已失效时不会启动浏览器。
+    
+    Args:
+        config: 配置字典，需包含cookie_path
+        metrics: 耗时统计，记录load_cookies、init_browser、inject_cookies、warm_up阶段
+        profile: 已锁定的持久化配置目录（profiles.ManagedProfile），尚未预热时加载Cookie后预热
         
-        # 备用方法1：尝试使用InputEvent
-        logger.debug(f"尝试使用备用方法输入{field_name}")
-        # 先清空输入框 - 根据元素类型使用不同的清空方法
-        js_clear = """
-        if (arguments[0].tagName === 'DIV' || arguments[0].getAttribute('contenteditable') === 'true') {
-            arguments[0].textContent = '';
-        } else {
-            arguments[0].value = '';
-        }
-        return true;
-        """
-        driver.execute_script(js_clear, element)
-        # 使用更直接的DOM操作方法
-        # 对于contentEditable元素使用textContent，对于标准表单元素使用value
-        js_alternative = """
-        if (arguments[0].tagName === 'DIV' || arguments[0].getAttribute('contenteditable') === 'true') {
-            arguments[0].textContent = arguments[1];
-        } else {
-            arguments[0].value = arguments[1];
-        }
-        arguments[0].dispatchEvent(new InputEvent('input', {bubbles: true, cancelable: true, composed: true}));
-        arguments[0].dispatchEvent(new Event('change', {bubbles: true}));
-        return true;
-        """
-        driver.execute_script(js_alternative, element, value)
+    Returns:
+        已登录的浏览器（WebDriver实例或浏览器后端，见init_browser）
         
-        # 再次验证 - 使用相同的验证逻辑
-        actual_value = driver.execute_script(js_verify, element)
-        if actual_value:
-            logger.debug(f"已使用备用方法成功输入{field_name}")
-            return True
-        else:
-            logger.warning(f"备用方法1也未能成功输入{field_name}")
-    except Exception as e:
-        logger.error(f"输入{field_name}时发生错误: {str(e)}")
+    Raises:
+        SessionExpiredError: 保存的Cookie已过期
+    """
+    metrics = metrics or PublishMetrics()
+    cookie_path = config['cookie_path']
+    cookies = None
+    if os.path.exists(cookie_path):
+        with metrics.span('load_cookies'):
+            logger.info("使用已保存的 Cookie: %s", cookie_path)
+            cookies = load_cookie_store(cookie_path)
+            check_cookies(cookies)
     
-    # 备用方法2：使用send_keys方法作为最后的备用
-    # 注意：send_keys方法会自动移除emoji等非BMP字符
-    # 这是最后的备用方法，只有在JavaScript方法都失败时才会使用
+    with metrics.span('init_browser'):
+        if cookies is None and config.get('headless'):
+            # 手动登录需要可见的浏览器窗口
+            logger.warning("未找到 Cookie 文件，本次使用有界面模式以便手动登录")
+            driver = init_browser(dict(config, headless=False))
+        else:
+            driver = init_browser(config)
     try:
-        # 检查元素类型，对contentEditable元素使用JavaScript清空内容
-        # 这是必要的，因为element.clear()方法对contentEditable元素无效
-        if driver.execute_script("return arguments[0].tagName === 'DIV' || arguments[0].getAttribute('contenteditable') === 'true'", element):
-            # 对于contentEditable元素，使用JavaScript清空内容
-            driver.execute_script("arguments[0].textContent = '';", element)
+        if cookies is None:
+            logger.info("未找到 Cookie 文件，需要手动登录")
+            backend = as_backend(driver)
+            backend.navigate(CREATOR_HOME_URL)
+            input("登录后按 Enter 保存 Cookie...")
+            while is_login_page(backend):
+                # 未完成登录时保存的Cookie无法使用
+                input("仍在登录页，请完成登录后按 Enter...")
+            save_cookie_store(cookie_path, backend.get_cookies())
+            logger.info("已保存 Cookie 到 %s", cookie_path)
         else:
-            # 对于标准表单元素，使用clear方法
-            element.clear()
-            
-        # 移除非BMP字符以避免ChromeDriver错误
-        # send_keys方法不能处理emoji等非BMP字符，所以需要移除它们
-        safe_value = process_emoji_text(value, mode='remove')
-        element.send_keys(safe_value)
-        logger.debug(f"已使用send_keys方法输入{field_name}（已移除emoji）: {safe_value}")
-        return True
-    except Exception as inner_e:
-        logger.error(f"所有输入{field_name}的方法都失败: {str(inner_e)}")
-        return False
-
-# === 加载 cookies ===
-def load_cookies(driver, cookie_path: str) -> None:
-    """加载保存的cookies到浏览器"""
-    logger.info("加载 cookies")
-    driver.get("https://creator.xiaohongshu.com")
-    time.sleep(2)
-    with open(cookie_path, 'rb') as f:
-        cookies = pickle.load(f)
-    for cookie in cookies:
-        driver.add_cookie(cookie)
-    driver.refresh()
-    logger.debug("Cookies 加载完成")
+            with metrics.span('inject_cookies'):
+                inject_cookies(driver, cookies, CREATOR_HOME_URL)
+            logger.debug("Cookies 加载完成")
+            if profile is not None and profile.needs_warm_up():
+                with metrics.span('warm_up'):
+                    profile.warm_up(driver, profile.settings['warm_urls']
+                                    or [config.get('creation_url', CREATION_URL)])
+                # 预热时已打开页面，被重定向到登录页说明服务端的登录已失效
+                ensure_logged_in(as_backend(driver))
+    except Exception:
+        driver.quit()
+        raise
+    return driver
 
 # === 检查图片目录和获取图片路径 ===
-def check_image_directory_and_get_paths(image_dir: str) -> Optional[List[str]]:
-    """检查图片目录是否存在和是否有图片，返回图片路径列表或None"""
+def check_image_directory_and_get_paths(image_dir: str,
+                                        settings: Optional[Dict[str, Any]] = None) -> Optional[List[str]]:
+    """检查图片目录是否存在和是否有图片，返回图片路径列表或None
+    
+    图片按自然顺序排列（2.jpg 在 10.jpg 之前），并通过文件头检查格式、尺寸和数量限制，
+    无效的图片不会被上传。扫描结果按文件大小和修改时间缓存，见content_library。
+    
+    Args:
+        image_dir: 图片目录
+        settings: 内容库参数，见 content_library.LIBRARY_DEFAULTS
+    """
+    from content_library import folder_image_paths
+    
     # 检查图片目录是否存在，不存在则创建
     if not os.path.exists(image_dir):
         os.makedirs(image_dir)
-        logger.warning(f"创建了图片目录: {image_dir}")
-        logger.info("请在此目录中添加图片文件（.jpg, .png, .jpeg格式）后再运行脚本\n图片文件将按照字母顺序上传到小红书\n")
+        logger.warning("创建了图片目录: %s", image_dir)
+        logger.info("请在此目录中添加图片文件（.jpg, .png, .jpeg, .webp格式）后再运行脚本\n图片文件将按照文件名的自然顺序上传到小红书\n")
         return None
         
-    # 检查图片目录中是否有图片文件
-    image_files = [f for f in os.listdir(image_dir) if f.lower().endswith(('.png', '.jpg', '.jpeg'))]
-    if not image_files:
-        logger.warning(f"图片目录 {image_dir} 中没有图片文件")
+    # 检查图片目录中是否有可以上传的图片
+    image_paths = folder_image_paths(image_dir, settings)
+    if not image_paths:
+        logger.warning("图片目录 %s 中没有有效的图片文件", image_dir)
         return None
     
     # 返回绝对路径列表
-    logger.info(f"找到 {len(image_files)} 张图片")
-    return [os.path.abspath(os.path.join(image_dir, fname)) for fname in image_files]
+    logger.info("找到 %s 张图片", len(image_paths))
+    return image_paths
 
 # 移除未使用的validate_image_paths函数，其功能已在check_image_directory_and_get_paths中实现
 
+# === 页面就绪条件 ===
+def get_wait_timing(config: Dict[str, Any]) -> Dict[str, float]:
+    """根据配置和等待策略计算各阶段的等待上限"""
+    profile_name = config.get('wait_profile', 'default')
+    if profile_name not in WAIT_PROFILES:
+        raise ValueError(f"不支持的等待策略: {profile_name}")
+    timing = {key: config.get(key, DEFAULT_CONFIG[key])
+              for key in ('timeout', 'upload_timeout', 'wait_after_upload', 'wait_after_publish')}
+    timing.update(WAIT_PROFILES[profile_name])
+    return timing
+
+# 以下条件脚本都在一次脚本调用中完成判断，由浏览器后端的wait_for等待其返回真值
+# 创建页面就绪：被重定向到登录页时返回'login'，上传控件出现（页面已可交互）时返回'ready'
+_PAGE_READY_JS = """
+var url = location.href.toLowerCase();
+if (arguments[1].some(function (marker) { return url.indexOf(marker) !== -1; })) { return 'login'; }
+var found = document.evaluate(arguments[0], document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+return found ? 'ready' : null;
+"""
+
+# 上传完成：缩略图数量达到上传数量，且没有正在上传的进度元素
+_UPLOAD_DONE_JS = """
+function count(xpath) {
+    return document.evaluate('count(' + xpath + ')', document, null, XPathResult.NUMBER_TYPE, null).numberValue;
+}
+return count(arguments[0]) >= arguments[2] && count(arguments[1]) === 0;
+"""
+
+# 发布完成：出现发布成功提示，或页面已离开创建页
+_PUBLISH_CONFIRMED_JS = """
+if (location.href !== arguments[0]) { return true; }
+return !!document.evaluate(arguments[1], document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+"""
+
+def _wait_limit(seconds: float, deadline=None) -> float:
+    """单次等待的上限：有发布期限（retry_policy.Deadline）时不超过剩余的期限"""
+    return seconds if deadline is None else deadline.cap(seconds)
+
+def _wait_page_ready(backend, timing: Dict[str, float], deadline=None) -> None:
+    """等待创建页面可以上传
+    
+    Raises:
+        SessionExpiredError: 被重定向到登录页
+    """
+    state = backend.wait_for(_PAGE_READY_JS, SELECTORS['file_input'], list(LOGIN_URL_MARKERS),
+                             timeout=_wait_limit(timing['timeout'], deadline), poll=timing['poll_frequency'])
+    if state == 'login':
+        raise SessionExpiredError(f"已被重定向到登录页: {backend.current_url}")
+
+def _wait_element(backend, condition: str, name: str, timeout: float, poll: float, deadline=None) -> None:
+    """等待页面元素满足条件（创建页面已就绪之后调用）
+    
+    Raises:
+        PermanentPublishError: 等满了完整的等待时间，元素仍不存在（页面结构已变化，重试无效）
+        WaitTimeout: 元素存在但未满足条件，或等待时间被发布期限缩短
+    """
+    xpath = SELECTORS[name]
+    limit = _wait_limit(timeout, deadline)
+    try:
+        backend.wait_for(condition, xpath, timeout=limit, poll=poll)
+    except WaitTimeout:
+        if limit >= timeout and not backend.run_script(PRESENT_JS, xpath):
+            raise PermanentPublishError(f"创建页面已就绪，但未找到元素 {name}（页面结构可能已变化）: {xpath}")
+        raise
+
+def _upload_done(backend, image_count: int) -> bool:
+    return bool(backend.run_script(_UPLOAD_DONE_JS, SELECTORS['upload_preview'],
+                                   SELECTORS['upload_progress'], image_count))
+
 # === 自动化发布流程 ===
+class PublishProgress:
+    """发布状态机：按顺序执行各阶段并记录已完成的阶段
+    
+    阶段：navigate（进入创建页面）→ upload（上传图片）→ fill_title（输入标题）→ fill_body（输入正文）→ publish（点击发布）
+    同一个浏览器上重试时从第一个未完成的阶段继续；浏览器被替换或页面状态丢失时从头开始。
+    files_selected表示upload阶段的文件已经选择（流水线在后台标签页中提前选择，见pipeline），只需等待上传完成。
+    """
+    
+    PHASES = ('navigate', 'upload', 'fill_title', 'fill_body', 'publish')
+    
+    def __init__(self):
+        self.completed = 0
+        self.files_selected = False
+    
+    @property
+    def phase(self) -> Optional[str]:
+        """下一个要执行的阶段，全部完成时为None"""
+        return self.PHASES[self.completed] if self.completed < len(self.PHASES) else None
+    
+    def is_done(self, phase: str) -> bool:
+        return self.PHASES.index(phase) < self.completed
+    
+    def complete(self, phase: str) -> None:
+        if phase == self.phase:
+            self.completed += 1
+    
+    def reset(self) -> None:
+        self.completed = 0
+        self.files_selected = False
+
+def _resume_point_valid(backend, progress: PublishProgress, image_count: int, creation_url: str) -> bool:
+    """检查浏览器是否仍停在上次中断时的创建页面（图片已上传）"""
+    if not progress.completed:
+        return True
+    try:
+        if backend.current_url != creation_url:
+            return False
+        if progress.is_done('upload'):
+            return _upload_done(backend, image_count)
+        return True
+    except Exception:
+        return False
+
+def _run_publish(driver, progress: PublishProgress, image_paths: List[str], title: str,
+                 description: str, hashtags: Optional[List[str]] = None,
+                 config: Optional[Dict[str, Any]] = None,
+                 metrics: Optional[PublishMetrics] = None,
+                 navigate: bool = True,
+                 on_state: Optional[Callable[[str], None]] = None,
+                 deadline=None) -> None:
+    """从progress中第一个未完成的阶段开始执行发布流程，失败时抛出异常（由调用方分类和重试）
+    
+    参数同_publish_post；deadline为本篇笔记的发布期限（retry_policy.Deadline），每次等待不超过剩余的期限。
+    
+    Raises:
+        PermanentPublishError: 内容无效（标题或正文为空、图片文件不存在），或页面已就绪但找不到必需的元素
+    """
+    config = config or {}
+    metrics = metrics or PublishMetrics()
+    timing = get_wait_timing(config)
+    backend = as_backend(driver)
+    hashtags = hashtags or []
+    on_state = on_state or (lambda state: None)
+    creation_url = config.get('creation_url', CREATION_URL)
+    if not title or not description or not image_paths:
+        raise PermanentPublishError("标题、正文和图片不能为空")
+    
+    if progress.completed:
+        if _resume_point_valid(backend, progress, len(image_paths), creation_url):
+            logger.info("从阶段 %s 继续发布", progress.phase)
+        else:
+            logger.info("页面状态已丢失，从头开始发布")
+            progress.reset()
+            navigate = True
+    
+    # 进入创建页面
+    if progress.phase == 'navigate':
+        with metrics.span('navigate'):
+            if navigate:
+                logger.info("尝试访问创建页面: %s", creation_url)
+                backend.navigate(creation_url)
+            # 等待上传控件出现（页面已可交互），或被重定向到登录页
+            _wait_page_ready(backend, timing, deadline)
+        progress.complete('navigate')
+    
+    # 上传图片
+    if progress.phase == 'upload':
+        # 提前选择的文件只使用一次，重试时重新选择
+        files_selected, progress.files_selected = progress.files_selected, False
+        with metrics.span('upload'):
+            if not files_selected:
+                missing = [path for path in image_paths if not os.path.isfile(path)]
+                if missing:
+                    raise PermanentPublishError(f"图片文件不存在: {', '.join(missing)}")
+                on_state('uploading')
+                # 上传所有图片
+                backend.set_files(SELECTORS['file_input'], image_paths)
+                logger.info("正在上传 %s 张图片", len(image_paths))
+            
+            # 等待所有缩略图渲染且上传进度结束
+            backend.wait_for(_UPLOAD_DONE_JS, SELECTORS['upload_preview'], SELECTORS['upload_progress'],
+                             len(image_paths), timeout=_wait_limit(timing['upload_timeout'], deadline),
+                             poll=timing['poll_frequency'])
+            logger.debug("图片上传完成")
+        progress.complete('upload')
+    
+    # 输入标题和正文：仍未完成的字段在一次脚本调用中一起输入（含验证）
+    if progress.phase in ('fill_title', 'fill_body'):
+        fields = []
+        if progress.phase == 'fill_title':
+            # 等待编辑器可输入
+            with metrics.span('title'):
+                _wait_element(backend, CLICKABLE_JS, 'title_input', timing['wait_after_upload'] or timing['timeout'],
+                              timing['poll_frequency'], deadline)
+            fields.append(('fill_title', SELECTORS['title_input'], title, "标题"))
+        with metrics.span('body'):
+            _wait_element(backend, PRESENT_JS, 'body_input', timing['timeout'], timing['poll_frequency'], deadline)
+        # 将标签添加到描述中
+        fields.append(('fill_body', SELECTORS['body_input'], f"{description}\n{' '.join(hashtags)}", "正文"))
+        
+        with metrics.span('fill'):
+            fill_results = set_input_values(backend, [(xpath, value, name) for _, xpath, value, name in fields])
+        for (phase, _, _, name), fill_result in zip(fields, fill_results):
+            if not fill_result['ok']:
+                raise RuntimeError(f"{name}输入失败")
+            progress.complete(phase)
+    
+    # 点击发布
+    if progress.phase == 'publish':
+        with metrics.span('publish') as span:
+            _wait_element(backend, CLICKABLE_JS, 'publish_button', timing['timeout'], timing['poll_frequency'],
+                          deadline)
+            if config.get('debug'):
+                backend.click(SELECTORS['publish_button'])
+                progress.complete('publish')
+                on_state('submitted')
+                logger.info("已点击发布按钮")
+                # 等待发布成功提示或页面跳转
+                try:
+                    backend.wait_for(_PUBLISH_CONFIRMED_JS, creation_url, SELECTORS['publish_success'],
+                                     timeout=_wait_limit(timing['wait_after_publish'], deadline),
+                                     poll=timing['poll_frequency'])
+                    on_state('confirmed')
+                    logger.info("已确认发布成功")
+                except WaitTimeout:
+                    span.set_outcome('unconfirmed')
+                    logger.warning("%s 秒内未检测到发布成功提示", timing['wait_after_publish'])
+            else:
+                progress.complete('publish')
+
 def _publish_post(driver, image_paths: List[str], title: str, 
                 description: str, hashtags: Optional[List[str]] = None, 
-                config: Optional[Dict[str, Any]] = None) -> bool:
-    """发布笔记的主要流程
+                config: Optional[Dict[str, Any]] = None,
+                metrics: Optional[PublishMetrics] = None,
+                navigate: bool = True,
+                on_state: Optional[Callable[[str], None]] = None) -> bool:
+    """发布笔记的主要流程（单次尝试）
     
     Args:
-        driver: Selenium WebDriver实例
+        driver: Selenium WebDriver实例或浏览器后端（见browser_backend）
         image_paths: 图片路径列表，必须提供有效的图片路径列表
         title: 笔记标题，必须提供
         description: 笔记描述，必须提供
         hashtags: 标签列表，如果为None则使用空列表
         config: 配置字典，包含cookie_path, image_dir等参数
+        metrics: 耗时统计，记录navigate、upload、title、body、fill、publish各阶段
+        navigate: 是否访问创建页面；False表示浏览器已停在干净的创建页面（见PublishSession.park）
+        on_state: 发布进度回调，依次收到'uploading'、'submitted'（已点击发布）、'confirmed'（已确认发布成功）
         
     Returns:
         bool: 发布是否成功
+        
+    Raises:
+        SessionExpiredError: 被重定向到登录页
     """    
     logger.info("开始发布笔记流程")
-    wait = WebDriverWait(driver, 15)
-    hashtags = hashtags or []
-
-    # 尝试直接访问创建页面
-    creation_url = "https://creator.xiaohongshu.com/publish/publish?from=menu&target=post"
+    counter = attach_command_counter(driver)
+    commands_before = counter.total
+    progress = PublishProgress()
     try:
-        logger.info(f"尝试访问创建页面: {creation_url}")
-        driver.get(creation_url)
-        time.sleep(5)
-        
-        # 上传图片
-        try:
-            upload_input = wait.until(EC.presence_of_element_located((By.XPATH, '//input[@type="file"]')))
-            
-            # 确保上传元素可见
-            driver.execute_script(
-                "arguments[0].style.display = 'block'; arguments[0].style.visibility = 'visible';", 
-                upload_input
-            )
-            
-            # 上传所有图片
-            upload_input.send_keys("\n".join(image_paths))
-            logger.info(f"正在上传 {len(image_paths)} 张图片")
-            
-            # 等待图片加载完成
-            time.sleep(3)
-            
-            # 输入标题
-            title_input = wait.until(EC.presence_of_element_located((By.XPATH, '//*[@placeholder="填写标题会有更多赞哦～"]')))
-            # 使用安全的输入方法设置标题
-            safe_set_input_value(driver, title_input, title, field_name="标题")
-            time.sleep(3)
-            
-            # 将标签添加到描述中
-            full_description = f"{description}\n{' '.join(hashtags)}"
-            
-            # 输入正文
-            desc_input = wait.until(EC.presence_of_element_located((By.XPATH, '//*[@data-placeholder="输入正文描述，真诚有价值的分享予人温暖"]')))
-            # 使用安全的输入方法设置正文
-            safe_set_input_value(driver, desc_input, full_description, field_name="正文")
-            time.sleep(15)
-            
-            # 点击发布
-            publish_btn = wait.until(EC.element_to_be_clickable((By.XPATH, '//*[text()="发布"]')))
-            if config['debug']:
-                publish_btn.click()
-            time.sleep(5)
-            logger.info("已点击发布按钮")
-            logger.info("流程执行完成")
-            
-            return True
-        except Exception as e:
-            logger.error(f"上传图片或发布失败: {str(e)}")
-            screenshot_path = "publish_failed.png"
-            driver.save_screenshot(screenshot_path)
-            logger.debug(f"已保存失败截图: {screenshot_path}")
-            return False
+        _run_publish(driver, progress, image_paths, title, description, hashtags, config, metrics,
+                     navigate=navigate, on_state=on_state)
+    except SessionExpiredError:
+        raise
     except Exception as e:
-        logger.error(f"访问创建页面出错: {str(e)}")
-        screenshot_path = "debug_screenshot.png"
-        driver.save_screenshot(screenshot_path)
-        logger.error("无法进入创建页面，请检查网站结构是否变化")
+        from artifacts import ArtifactStore
+        if progress.phase == 'navigate':
+            logger.error("访问创建页面出错: %s", e)
+            logger.error("无法进入创建页面，请检查网站结构是否变化")
+        else:
+            logger.error("上传图片或发布失败（阶段 %s）: %s", progress.phase, e)
+        ArtifactStore.from_config(config).capture(driver, progress.phase)
         return False
+    logger.info("流程执行完成，共发出 %s 个浏览器命令", counter.total - commands_before)
+    return True
 
 # === 处理Emoji和验证Python字典对象 ===
 
+# 常见emoji的文字描述，可根据需要扩展（键不含变体选择符U+FE0F）
+EMOJI_REPLACEMENTS = {
+    '😊': '[笑脸]',
+    '😂': '[笑哭]',
+    '❤': '[爱心]',
+    '👍': '[赞]',
+    '🎉': '[庆祝]',
+    '🔥': '[火]',
+    '✨': '[闪光]',
+    '🚀': '[火箭]',
+}
+
+# 默认以emoji样式显示的字符（单独出现即视为emoji）
+_EMOJI_BASE = (
+    "["
+    "\U0001F004\U0001F0CF\U0001F18E\U0001F191-\U0001F19A"  # 麻将、扑克和方框字母
+    "\U0001F201-\U0001F251"  # 带圈表意文字
+    "\U0001F300-\U0001F5FF"  # 符号和象形文字
+    "\U0001F600-\U0001F64F"  # 表情符号
+    "\U0001F680-\U0001F6FF"  # 交通和地图
+    "\U0001F7E0-\U0001F7EB"  # 几何图形
+    "\U0001F90C-\U0001F9FF"  # 补充符号和象形文字
+    "\U0001FA70-\U0001FAFF"  # 符号和象形文字扩展
+    "\u2600-\u27BF"  # 杂项符号和装饰符号
+    "\u231A\u231B\u23E9-\u23F3\u23F8-\u23FA"  # 时钟和媒体控制
+    "\u25FD\u25FE\u2B1B\u2B1C\u2B50\u2B55"  # 方块、星形和圆形
+    "]"
+)
+# 默认以文字样式显示的字符，只有带变体选择符U+FE0F时才视为emoji
+_EMOJI_TEXT_BASE = (
+    "[\u00A9\u00AE\u203C\u2049\u2122\u2139\u2194-\u2199\u21A9\u21AA\u2328\u23CF"
+    "\u24C2\u25AA\u25AB\u25B6\u25C0\u25FB\u25FC\u2934\u2935\u2B05-\u2B07\u3030\u303D\u3297\u3299]"
+)
+# 最常见的情况排在前面，减少回溯
+_EMOJI_ELEMENT = (
+    f"(?:{_EMOJI_BASE}[\uFE0E\uFE0F]?[\U0001F3FB-\U0001F3FF]?"  # 可带变体选择符和肤色修饰符
+    "|[\U0001F1E6-\U0001F1FF]{2}"  # 国旗（两个区域指示符）
+    "|\U0001F3F4[\U000E0020-\U000E007E]+\U000E007F"  # 标签序列（地区旗帜）
+    "|[#*0-9]\uFE0F?\u20E3"  # 键帽
+    f"|{_EMOJI_TEXT_BASE}\uFE0F)"
+)
+# emoji序列首字符的粗略范围（区间越少匹配越快）；作为前置断言时正则引擎可以快速跳过普通文字
+_EMOJI_FIRST_CHAR = "[#*0-9\u00A9\u00AE\u2000-\u2BFF\u3030\u303D\u3297\u3299\U0001F000-\U0001FAFF]"
+# 完整的emoji序列：多个emoji通过零宽连接符（ZWJ，U+200D）组合为一个，例如 U+1F468 U+200D U+1F4BB（程序员）
+_EMOJI_SEQUENCE_RE = re.compile(f"(?={_EMOJI_FIRST_CHAR}){_EMOJI_ELEMENT}(?:\u200D{_EMOJI_ELEMENT})*")
+# 非BMP字符及其附带的变体选择符和零宽连接符（ChromeDriver的send_keys无法输入非BMP字符）
+_NON_BMP_RE = re.compile("\u200D?[\U00010000-\U0010FFFF][\uFE0E\uFE0F]?(?:\u200D(?=[\U00010000-\U0010FFFF]))?")
+
+# 查找替换表前去掉变体选择符和肤色修饰符
+_EMOJI_MODIFIER_RE = re.compile("[\uFE0E\uFE0F\U0001F3FB-\U0001F3FF]")
+
+def _replace_emoji(match) -> str:
+    sequence = match.group(0)
+    return (EMOJI_REPLACEMENTS.get(sequence)
+            or EMOJI_REPLACEMENTS.get(_EMOJI_MODIFIER_RE.sub('', sequence))
+            or '[emoji]')
+
+_EMOJI_MODES = {
+    'keep': lambda text: text,
+    'remove': lambda text: _NON_BMP_RE.sub('', text),
+    'replace': lambda text: _EMOJI_SEQUENCE_RE.sub(_replace_emoji, text),
+}
+
 def process_emoji_text(text: str, mode: str = 'keep') -> str:
     """处理包含emoji的文本
     
+    正则表达式和替换表在模块加载时预编译，每次调用只需一次扫描。
+    
     Args:
         text: 包含emoji的文本
         mode: 处理模式，可选值：
             - 'keep': 保留emoji（默认，用于JavaScript执行器）
-            - 'remove': 移除所有非BMP字符（用于ChromeDriver直接输入）
-            - 'replace': 将emoji替换为其描述（例如：😊 -> [笑脸]）
+            - 'remove': 移除所有非BMP字符及其附带的变体选择符（用于ChromeDriver直接输入）
+            - 'replace': 将emoji替换为其描述（例如：😊 -> [笑脸]），组合emoji（ZWJ序列、
+              带变体选择符或肤色修饰符的emoji、国旗）作为一个整体替换，未定义的emoji替换为[emoji]
     
     Returns:
         str: 处理后的文本
     """
+    if mode not in _EMOJI_MODES:
+        raise ValueError(f"不支持的处理模式: {mode}")
     if not text:
         return ""
+    return _EMOJI_MODES[mode](text)
+
+def process_emoji_texts(texts, mode: str = 'keep') -> List[str]:
+    """批量处理包含emoji的文本
+    
+    Args:
+        texts: 文本的可迭代对象
+        mode: 处理模式，同process_emoji_text
         
-    if mode == 'keep':
-        return text
-    elif mode == 'remove':
-        return ''.join(c for c in text if ord(c) < 0x10000)
-    elif mode == 'replace':
-        # 简单替换常见emoji，可根据需要扩展
-        emoji_map = {
-            '😊': '[笑脸]',
-            '😂': '[笑哭]',
-            '❤️': '[爱心]',
-            '👍': '[赞]',
-            '🎉': '[庆祝]',
-            '🔥': '[火]',
-            '✨': '[闪光]',
-            '🚀': '[火箭]',
-            # 可以根据需要添加更多映射
-        }
-        
-        for emoji, replacement in emoji_map.items():
-            text = text.replace(emoji, replacement)
-            
-        # 对于未定义的emoji，使用通用替换
-        # 匹配大多数emoji的正则表达式
-        emoji_pattern = re.compile(
-            "["  
-            "\U0001F600-\U0001F64F"  # 表情符号
-            "\U0001F300-\U0001F5FF"  # 符号和象形文字
-            "\U0001F680-\U0001F6FF"  # 交通和地图
-            "\U0001F700-\U0001F77F"  # 警告符号
-            "\U0001F780-\U0001F7FF"  # 几何图形
-            "\U0001F800-\U0001F8FF"  # 补充箭头
-            "\U0001F900-\U0001F9FF"  # 补充符号和象形文字
-            "\U0001FA00-\U0001FA6F"  # 棋子符号
-            "\U0001FA70-\U0001FAFF"  # 符号和象形文字扩展
-            "\U00002702-\U000027B0"  # 装饰符号
-            "\U000024C2-\U0000257F"  # 封闭字母数字
-            "\U00002600-\U000026FF"  # 杂项符号
-            "\U00002700-\U000027BF"  # 装饰符号
-            "\U0000FE00-\U0000FE0F"  # 变体选择器
-            "\U0001F900-\U0001F9FF"  # 补充符号和象形文字
-            "\U00002B50"             # 星形
-            "\U00002B55"             # 圆形
-            "\U00002B1B-\U00002B1C"  # 黑白方块
-            "\U0000200D"             # 零宽连接符
-            "\U00002640-\U00002642"  # 性别符号
-            "\U00002600-\U00002B55"  # 杂项符号和箭头
-            "]", 
-            flags=re.UNICODE
-        )
-        
-        return emoji_pattern.sub(r'[emoji]', text)
-    else:
+    Returns:
+        List[str]: 处理后的文本，顺序与输入一致
+    """
+    if mode not in _EMOJI_MODES:
         raise ValueError(f"不支持的处理模式: {mode}")
+    handler = _EMOJI_MODES[mode]
+    return [handler(text) if text else "" for text in texts]
 
-def validate_post_data(data: Dict[str, Any]) -> bool:
+def validate_post_data(data: Dict[str, Any], strict: bool = False) -> bool:
     """验证发布内容数据是否有效
     
     Args:
         data: 包含发布内容的字典
+        strict: 为True时标题、正文长度或标签数量超出POST_LIMITS也视为无效，否则只记录警告
         
     Returns:
         bool: 数据是否有效
     """
-    # 验证必要字段
-    required_fields = ['title', 'description']
-    for field in required_fields:
-        if field not in data:
-            logger.error(f"发布数据缺少必要字段: {field}")
-            return False
-    return True
+    errors, problems = check_fields(data)
+    for error in errors:
+        logger.error(error)
+    if errors:
+        return False
+    
+    # 长度按平台的计字规则计算，见preflight.platform_length
+    for problem in problems:
+        if strict:
+            logger.error("发布数据无效: %s", problem)
+        else:
+            logger.warning("发布数据: %s", problem)
+    return not (strict and problems)
+
+# === 解析发布内容 ===
+def _example_content() -> Dict[str, Any]:
+    """按需加载example_post.py中的示例发布内容"""
+    from example_post import post_data
+    return post_data
+
+
+def _resolve_post_content(title: Optional[str], description: Optional[str],
+                          image_dir: Optional[str], hashtags: Optional[List[str]],
+                          post_data: Optional[Dict[str, Any]],
+                          config: Dict[str, Any]) -> Optional[tuple]:
+    """合并直接参数、post_data和配置，得到最终的发布内容
+    
+    参数优先级: 直接传入的参数 > Python字典对象中的值 > 默认生成的值
+    
+    Returns:
+        (title, description, image_paths, hashtags) 元组，内容无效时返回None
+    """
+    if post_data and post_data.get('invalid'):
+        # ingest.iter_valid_posts为无效内容产出的占位
+        logger.error("发布内容无效（%s）: %s", post_data.get('source'), post_data['invalid'])
+        return None
+    # 从Python字典对象加载数据
+    if post_data and validate_post_data(post_data):
+        logger.info("使用Python字典对象作为发布内容")
+        title = title or post_data.get('title')    
+        description = description or post_data.get('description')
+        image_dir = image_dir or post_data.get('image_dir')
+        hashtags = hashtags or post_data.get('hashtags',[])
+    elif not title or not description:
+        logger.error("发布内容无效：未提供有效的post_data或直接参数")
+        return None
+    image_dir = image_dir or config.get('image_dir')
+        
+    # 获取图片路径
+    if not image_dir:
+        logger.error("未指定图片目录")
+        return None
+        
+    from content_library import get_library_settings
+    image_paths = check_image_directory_and_get_paths(image_dir, get_library_settings(config))
+    if not image_paths:
+        logger.error("图片路径%s下无图片，无法发布笔记", image_dir)
+        return None
+    
+    # 设置默认值
+    if title is None:
+        title = "测试笔记" + datetime.datetime.now().strftime("%Y%m%d%H%M%S")
+        logger.info("未提供标题，使用自动生成的标题: %s", title)
+    
+    if description is None:
+        description = "这是一个自动发布的测试笔记，发布时间：" + datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        logger.info("未提供描述，使用自动生成的描述")
+    
+    return title, description, image_paths, hashtags or []
+
+
+def _upload_paths(image_paths: List[str], config: Dict[str, Any]) -> List[str]:
+    """实际上传的图片路径
+    
+    启用image_preprocess时为预处理（缩放、压缩、移除元数据）后的缓存文件，结果带缓存，重复调用开销很小。
+    账本指纹始终按原图计算，预处理参数变化不会导致重复发布。
+    """
+    preprocess_settings = config.get('image_preprocess') or {}
+    if not preprocess_settings.get('enabled'):
+        return image_paths
+    from image_preprocess import preprocess_images
+    return preprocess_images(image_paths, preprocess_settings)
 
 # === 主函数 ===
 def publish_post(title: Optional[str] = None, description: Optional[str] = None,  
@@ -420,86 +921,394 @@ def publish_post(title: Optional[str] = None, description: Optional[str] = None,
     tmp_conf = DEFAULT_CONFIG.copy()
     tmp_conf.update(config or {})
     config = tmp_conf
-    post_data = post_data or config.get('default_content')
-    image_dir = image_dir or config.get('image_dir')
-    max_retries = config.get('max_retries', 1)
+    post_data = post_data or config.get('default_content') or _example_content()
     
-    # 从Python字典对象加载数据
-    if post_data and validate_post_data(post_data):
-        logger.info("使用Python字典对象作为发布内容")
-        title = title or post_data.get('title')    
-        description = description or post_data.get('description')
-        image_dir = image_dir or post_data.get('image_dir')
-        hashtags = hashtags or post_data.get('hashtags',[])
-    elif not title or not description:
-        logger.error("发布内容无效：未提供有效的post_data或直接参数")
+    resolved = _resolve_post_content(title, description, image_dir, hashtags, post_data, config)
+    if resolved is None:
         return False
-        
-    # 获取图片路径
-    if not image_dir:
-        logger.error("未指定图片目录")
+    preflight = get_preflight_settings(config)
+    if preflight['enabled'] and preflight['strict_limits']:
+        # 超出平台限制的内容不启动浏览器
+        _, problems = check_fields({'title': resolved[0], 'description': resolved[1], 'hashtags': resolved[3]})
+        for problem in problems:
+            logger.error("预检未通过: %s", problem)
+        if problems:
+            return False
+    
+    # 失败时按失败类型重试：页面异常在同一个浏览器上从中断的阶段继续，浏览器崩溃时重新启动
+    with PublishSession(config) as session:
+        result = session.publish_content(*resolved)
+    if result['success']:
+        logger.info("任务完成")
+    return result['success']
+
+# === 批量发布（复用同一个浏览器会话） ===
+def _is_driver_alive(driver) -> bool:
+    """检查浏览器会话是否仍然可用"""
+    if driver is None:
         return False
-        
-    image_paths = check_image_directory_and_get_paths(image_dir)
-    if not image_paths:
-        logger.error(f"图片路径{image_dir}下无图片，无法发布笔记")
+    try:
+        driver.current_url
+        return True
+    except Exception:
         return False
+
+def _new_result(title: Optional[str]) -> Dict[str, Any]:
+    """单篇笔记的发布结果"""
+    return {
+        'title': title,
+        'success': False,
+        'attempts': 0,
+        'error': None,
+        'failure': None,
+        'session_expired': False,
+        'webdriver_commands': 0,
+        'elapsed': 0.0,
+        'skipped': False,
+        'post_id': None,
+    }
+
+def _invalid_content_result(post_data: Any) -> Dict[str, Any]:
+    """发布内容无效的笔记的结果（ingest.invalid_post占位的错误中包含原因和位置）"""
+    result = _new_result(post_data.get('title') if isinstance(post_data, dict) else None)
+    result['error'] = "发布内容无效"
+    if isinstance(post_data, dict) and post_data.get('invalid'):
+        result['error'] = f"发布内容无效（{post_data.get('source')}）: {post_data['invalid']}"
+    result['failure'] = PERMANENT
+    return result
+
+def _preflight_result(report: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """未通过预检的笔记的结果，未预检或通过预检时返回None"""
+    if report is None or report['ok']:
+        return None
+    result = _new_result(report['title'])
+    result['error'] = f"预检未通过: {'; '.join(report['errors'])}"
+    result['failure'] = PERMANENT
+    return result
+
+class PublishSession:
+    """保持一个已登录的浏览器，依次发布多篇笔记
     
-    # 设置默认值
-    if title is None:
-        title = "测试笔记" + datetime.datetime.now().strftime("%Y%m%d%H%M%S")
-        logger.info(f"未提供标题，使用自动生成的标题: {title}")
+    浏览器只在首次发布时启动；仅当浏览器崩溃时才会被替换，登录失效时立即结束并返回session_expired，
+    每篇笔记直接访问创建页面，省去重复的浏览器冷启动和Cookie加载。
     
-    if description is None:
-        description = "这是一个自动发布的测试笔记，发布时间：" + datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        logger.info(f"未提供描述，使用自动生成的描述")
+    Example:
+        ```python
+        with PublishSession(config) as session:
+            for data in posts:
+                session.publish(data)
+        ```
+    """
+    
+    def __init__(self, config: Optional[Dict[str, Any]] = None):
+        tmp_conf = DEFAULT_CONFIG.copy()
+        tmp_conf.update(config or {})
+        self.config = tmp_conf
+        self.driver = None
+        self.parked = False
+        self.metrics = PublishMetrics.from_config(self.config)
+        from ledger import open_ledger
+        self.ledger = open_ledger(self.config)
+        from artifacts import ArtifactStore
+        self.artifacts = ArtifactStore.from_config(self.config)
+        from profiles import ManagedProfile
+        self.profile = ManagedProfile.from_config(self.config)
+        from governor import DriverGovernor
+        self.governor = DriverGovernor.from_config(self.config)
+        self._prelaunch = None
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, tb):
+        self.close()
+        self.metrics.export()
+        self.artifacts.wait(timeout=30)
+        if self.ledger is not None:
+            self.ledger.close()
+            self.ledger = None
     
-    # 执行发布流程，支持重试
-    for retry_count in range(max_retries):
-        driver = None
+    def ensure_driver(self):
+        """返回可用的浏览器，必要时重新启动"""
+        self._join_prelaunch()
+        if not _is_driver_alive(self.driver):
+            if self.driver is not None:
+                logger.warning("浏览器会话已失效，重新启动浏览器")
+            self.replace_driver()
+        return self.driver
+    
+    def replace_driver(self) -> None:
+        """关闭当前浏览器并启动一个新的已登录浏览器（启用profile时先锁定配置目录）"""
+        self.close()
+        config = self.config
+        if self.profile is not None:
+            self.profile.acquire()
+            config = dict(self.config, user_data_dir=self.profile.path)
         try:
-            # 初始化浏览器
-            driver = init_browser()
-            
-            # 处理Cookie
-            cookie_path = config['cookie_path']
-            if not os.path.exists(cookie_path):
-                logger.info("未找到 Cookie 文件，需要手动登录")
-                driver.get("https://creator.xiaohongshu.com")
-                input("登录后按 Enter 保存 Cookie...")
-                pickle.dump(driver.get_cookies(), open(cookie_path, "wb"))
-                logger.info(f"已保存 Cookie 到 {cookie_path}")
-            else:
-                logger.info(f"使用已保存的 Cookie: {cookie_path}")
-                load_cookies(driver, cookie_path)
-            
-            # 发布笔记
-            if _publish_post(driver, image_paths, title, description, hashtags, config):
-                logger.info("任务完成")
-                driver.quit()
-                return True
-                
-            logger.warning(f"发布失败 (尝试 {retry_count + 1}/{max_retries})")
-            
+            self.driver = start_authenticated_browser(config, self.metrics, profile=self.profile)
+        except Exception:
+            if self.profile is not None:
+                self.profile.release()
+            raise
+        self.governor.attach(self.driver)
+    
+    def prelaunch(self) -> None:
+        """在后台线程中启动浏览器并停在创建页面（见park），下一次使用浏览器时等待其完成"""
+        if self._prelaunch is not None or self.driver is not None:
+            return
+        import threading
+        self._prelaunch = threading.Thread(target=self.park, name='prelaunch', daemon=True)
+        self._prelaunch.start()
+    
+    def _join_prelaunch(self) -> None:
+        import threading
+        thread = self._prelaunch
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+            self._prelaunch = None
+    
+    def park(self) -> bool:
+        """启动浏览器（如有必要）并停在创建页面，下一次发布可以跳过页面加载
+        
+        Returns:
+            bool: 是否已停在可上传的创建页面
+        """
+        self.parked = False
+        timing = get_wait_timing(self.config)
+        try:
+            backend = as_backend(self.ensure_driver())
+            backend.navigate(self.config.get('creation_url', CREATION_URL))
+            _wait_page_ready(backend, timing)
+            self.parked = True
+        except SessionExpiredError as e:
+            logger.error("登录状态已失效: %s", e)
+            self.close()
         except Exception as e:
-            logger.error(f"发生错误 (尝试 {retry_count + 1}/{max_retries}): {str(e)}")
-            logger.debug(traceback.format_exc())
+            logger.warning("浏览器预热失败: %s", e)
+        return self.parked
+    
+    def close(self, reason: Optional[str] = None) -> None:
+        """关闭浏览器（超时或残留进程由governor强制结束）并释放配置目录"""
+        self._join_prelaunch()
+        self.parked = False
+        if self.driver is not None:
+            self.governor.quit(self.driver, reason)
+            self.driver = None
+        if self.profile is not None:
+            self.profile.release()
+    
+    def publish(self, post_data: Dict[str, Any]) -> Dict[str, Any]:
+        """发布一篇笔记，失败时按失败类型重试
+        
+        Args:
+            post_data: 包含发布内容的字典
             
-            # 保存错误截图
-            if driver:
+        Returns:
+            Dict: 发布结果，见publish_content
+        """
+        resolved = _resolve_post_content(None, None, None, None, post_data, self.config)
+        if resolved is None:
+            return _invalid_content_result(post_data)
+        return self.publish_content(*resolved)
+    
+    def publish_content(self, title: str, description: str, image_paths: List[str],
+                        hashtags: Optional[List[str]] = None) -> Dict[str, Any]:
+        """发布已解析的内容
+        
+        每次失败后按失败类型处理：页面暂时异常时在同一个浏览器上从最后完成的阶段继续；
+        浏览器崩溃时重新启动浏览器并从头开始；登录失效或内容无效时立即结束。
+        重试间隔为带抖动的指数退避，总耗时不超过retry.deadline。
+        
+        Returns:
+            Dict: 发布结果，包含title, success, attempts, error, failure（最后一次失败的类型）,
+                session_expired, webdriver_commands（本篇笔记发出的浏览器命令数）, elapsed,
+                skipped（发布账本显示已发布而跳过）, post_id（本篇笔记日志中的post_id）
+        """
+        import uuid
+        return self.publish_prepared(uuid.uuid4().hex[:8], (title, description, image_paths, hashtags))
+    
+    def publish_prepared(self, post_id: str, content: tuple, record=None,
+                         progress: Optional[PublishProgress] = None) -> Dict[str, Any]:
+        """发布已解析的内容，可以沿用已登记的账本记录和已完成的阶段（见pipeline）
+        
+        Args:
+            post_id: 本篇笔记日志中的post_id
+            content: (title, description, image_paths, hashtags)
+            record: 已登记的账本记录，为None时在此登记
+            progress: 已完成部分阶段的发布进度，浏览器必须停在该笔记的创建页面
+        """
+        with log_context(post_id):
+            result = self._publish_content(*content, record=record, progress=progress)
+            if self.driver is not None and not result['skipped']:
+                # 在两篇笔记之间按内存、发布篇数和运行时长替换浏览器
+                reason = self.governor.after_post()
+                if reason:
+                    logger.info("替换浏览器: %s", reason)
+                    self.close(reason)
+        result['post_id'] = post_id
+        return result
+    
+    def _publish_content(self, title: str, description: str, image_paths: List[str],
+                         hashtags: Optional[List[str]], record=None,
+                         progress: Optional[PublishProgress] = None) -> Dict[str, Any]:
+        from ledger import begin_record
+        from retry_policy import get_retry_settings, classify_failure, backoff_delay, Deadline
+        
+        started = time.time()
+        result = _new_result(title)
+        if record is None:
+            record = begin_record(self.ledger, title, description, hashtags, image_paths)
+            if record is None:
+                result['success'] = True
+                result['skipped'] = True
+                return result
+        
+        image_paths = _upload_paths(image_paths, self.config)
+        settings = get_retry_settings(self.config)
+        deadline = Deadline(settings['deadline'])
+        progress = progress or PublishProgress()
+        max_retries = max(1, self.config.get('max_retries', 1))
+        for attempt in range(1, max_retries + 1):
+            result['attempts'] = attempt
+            failure = None
+            with self.metrics.span('attempt') as attempt_span:
+                attempt_span.set_outcome('failed')
                 try:
-                    driver.save_screenshot(f"error_{retry_count + 1}.png")
-                    driver.quit()
-                except:
-                    pass
+                    previous_driver = self.driver
+                    driver = self.ensure_driver()
+                    if driver is not previous_driver:
+                        progress.reset()
+                    counter = attach_command_counter(driver)
+                    commands_before = counter.total
+                    # 已停在创建页面时跳过第一次页面加载
+                    navigate, self.parked = not self.parked, False
+                    try:
+                        _run_publish(driver, progress, image_paths, title, description, hashtags,
+                                     self.config, self.metrics, navigate=navigate, on_state=record.advance,
+                                     deadline=deadline)
+                    finally:
+                        result['webdriver_commands'] += counter.total - commands_before
+                    attempt_span.set_outcome('ok')
+                    result['success'] = True
+                    result['error'] = None
+                    result['failure'] = None
+                    logger.info("流程执行完成，共发出 %s 个浏览器命令", result['webdriver_commands'])
+                except Exception as e:
+                    failure = classify_failure(e)
+                    if failure == TRANSIENT and not _is_driver_alive(self.driver):
+                        failure = BROWSER
+                    result['error'] = str(e)
+                    result['failure'] = failure
+                    record.fail(str(e))
+                    logger.error("发布失败（尝试 %s/%s，阶段 %s，类型 %s）: %s", attempt, max_retries, progress.phase, failure, e)
+                    logger.debug(traceback.format_exc())
+                    if failure == TRANSIENT:
+                        # 只取回截图和页面源码，写盘在后台完成，不拖慢重试
+                        self.artifacts.capture(self.driver, progress.phase)
+                    elif failure in (SESSION, BROWSER):
+                        self.close()
+            
+            if result['success']:
+                break
+            if failure == SESSION:
+                # 登录失效时重试没有意义
+                result['session_expired'] = True
+                break
+            if failure == PERMANENT:
+                logger.error("内容或参数无效，不再重试")
+                break
+            if record.submitted:
+                # 已经点击过发布，重试可能产生重复笔记
+                result['error'] = "已点击发布按钮但流程未正常结束，请在创作平台确认笔记是否已发布"
+                logger.error(result['error'])
+                break
+            if attempt == max_retries:
+                logger.error("已达到最大重试次数 (%s)，放弃: %s", max_retries, title)
+                break
+            delay = backoff_delay(attempt, settings)
+            if not deadline.allows(delay):
+                break
+            logger.info("将在 %.1f 秒后重试...", delay)
+            with self.metrics.span('retry_wait'):
+                time.sleep(delay)
+        
+        result['elapsed'] = round(time.time() - started, 3)
+        return result
+
+def iter_publish(posts: Iterable[Dict[str, Any]],
+                 config: Optional[Dict[str, Any]] = None) -> Iterator[Dict[str, Any]]:
+    """使用同一个已登录的浏览器依次发布多篇笔记，每发布一篇产出一个结果
+    
+    启用preflight时先按批并行预检，未通过预检的笔记不占用浏览器，结果中的failure为permanent。
+    启用profile.prelaunch时浏览器在预检的同时启动。
+    启用pipeline时在多个标签页中重叠发布相邻的笔记（见pipeline），点击发布和产出结果的顺序不变。
+    posts可以是生成器（例如ingest.iter_valid_posts），只在发布前读取下一篇，
+    内存占用与笔记总数无关。
+    
+    Args:
+        posts: post_data字典的可迭代对象
+        config: 配置字典
+        
+    Yields:
+        Dict: 每篇笔记的发布结果，顺序与posts一致，额外包含index字段
+    """
+    from preflight import iter_preflight
+    from profiles import get_profile_settings
+    from pipeline import PublishPipeline
+    
+    succeeded = total = 0
+    with PublishSession(config) as session:
+        if session.profile is not None and get_profile_settings(session.config)['prelaunch']:
+            # 预检和读取内容的同时启动浏览器并打开创建页面
+            session.prelaunch()
+        if get_preflight_settings(session.config)['enabled']:
+            # 启动浏览器前按批并行预检，未通过的笔记直接记为失败
+            checked = iter_preflight(posts, session.config)
+        else:
+            checked = ((data, None) for data in posts)
+        pipeline = PublishPipeline.from_session(session)
+        if pipeline is not None:
+            results = pipeline.run(checked)
+        else:
+            results = (_publish_checked(session, index, data, report)
+                       for index, (data, report) in enumerate(checked))
+        for index, result in enumerate(results):
+            result['index'] = index
+            total += 1
+            succeeded += bool(result['success'])
+            yield result
+    
+    logger.info("批量发布完成: 成功 %s/%s", succeeded, total)
+
+def _publish_checked(session: PublishSession, index: int, data: Dict[str, Any],
+                     report: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """顺序发布一篇已预检的笔记"""
+    result = _preflight_result(report)
+    if result is None:
+        logger.info("批量发布进度: 第 %s 篇", index + 1)
+        result = session.publish(data)
+    return result
+
+def publish_many(posts: Iterable[Dict[str, Any]], 
+                 config: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+    """使用同一个已登录的浏览器依次发布多篇笔记
+    
+    Args:
+        posts: post_data字典的可迭代对象
+        config: 配置字典
         
-        # 如果不是最后一次尝试，等待后重试
-        if retry_count < max_retries - 1:
-            logger.info(f"将在 10 秒后重试...")
-            time.sleep(10)
+    Returns:
+        List[Dict]: 每篇笔记的发布结果，顺序与posts一致，额外包含index字段
+    """
+    return list(iter_publish(posts, config))
+
+def load_posts_file(posts_path: str) -> List[Dict[str, Any]]:
+    """从JSON列表、JSONL、Markdown文件或目录加载批量发布内容
     
-    logger.error(f"已达到最大重试次数 ({max_retries})，放弃任务")
-    return False
+    大量内容请使用ingest.iter_valid_posts逐篇读取，避免一次载入全部内容。
+    """
+    from ingest import iter_posts
+    return list(iter_posts(posts_path))
 
 # === 命令行入口和配置加载 ===
 def load_config(config_path='config.json'):
@@ -509,52 +1318,173 @@ def load_config(config_path='config.json'):
         try:
             with open(config_path, 'r', encoding='utf-8') as f:
                 config.update(json.load(f))
-            logger.info(f"已加载配置文件: {config_path}")
+            logger.info("已加载配置文件: %s", config_path)
         except Exception as e:
-            logger.error(f"加载配置文件失败: {str(e)}")
+            logger.error("加载配置文件失败: %s", e)
     return config
 
 # 导出的函数和变量
 __all__ = [
     'publish_post',
+    'publish_many',
+    'iter_publish',
+    'PublishSession',
+    'SessionExpiredError',
+    'load_posts_file',
     'validate_post_data',
+    'POST_LIMITS',
     'check_image_directory_and_get_paths',
     'process_emoji_text',
-    'safe_set_input_value'
+    'process_emoji_texts',
+    'safe_set_input_value',
+    'set_input_values',
+    'attach_command_counter'
 ]
 
+def _forward_to_service(args, config: Dict[str, Any]) -> Optional[bool]:
+    """把命令行的发布内容转发给常驻发布服务，服务未运行时返回None"""
+    from publish_service import ServiceClient
+    client = ServiceClient.from_config(config)
+    if not client.is_available():
+        return None
+    logger.info("检测到常驻发布服务，转发发布请求")
+    if args.posts_file:
+        from ingest import iter_valid_posts
+        posts = iter_valid_posts(args.posts_file)
+    else:
+        posts = [_cli_post_data(args.title, args.description, args.image_dir, args.hashtags, config)]
+    return _log_results(client.iter_publish(posts))
+
+def _cli_post_data(title: Optional[str], description: Optional[str], image_dir: Optional[str],
+                   hashtags: Optional[List[str]], config: Dict[str, Any]) -> Dict[str, Any]:
+    """命令行参数合并默认内容得到的post_data，回退规则与publish_post和_resolve_post_content一致
+    
+    未提供的字段依次取default_content（或example_post.py中的示例）和配置中的image_dir。
+    """
+    default_content = config.get('default_content') or _example_content()
+    post_data = dict(default_content) if validate_post_data(default_content) else {}
+    overrides = {'title': title, 'description': description, 'image_dir': image_dir, 'hashtags': hashtags}
+    post_data.update((key, value) for key, value in overrides.items() if value)
+    post_data['image_dir'] = post_data.get('image_dir') or config.get('image_dir')
+    return post_data
+
+def _log_results(results: Iterable[Dict[str, Any]]) -> bool:
+    """逐条记录批量发布结果（不保留结果列表），全部成功且至少发布一篇时返回True"""
+    total = failed = 0
+    for r in results:
+        total += 1
+        failed += not r['success']
+        logger.info("[%s] %s - %s (尝试 %s 次, 用时 %ss)", r['index'], '成功' if r['success'] else '失败',
+                    r['title'], r['attempts'], r['elapsed'])
+    return total > 0 and failed == 0
+
 # === 主流程 ===
 if __name__ == '__main__':
-    logger.info("=== 小红书自动发布工具启动 ===")
     try:
         # 解析命令行参数
         import argparse
         parser = argparse.ArgumentParser(description='小红书自动发布工具')
+        parser.add_argument('command', nargs='?', default='publish', choices=['publish', 'enqueue', 'serve', 'service'],
+                            help='publish: 立即发布（默认，发布服务运行时转发给服务）; enqueue: 加入定时发布队列; '
+                                 'serve: 启动定时发布服务; service: 启动常驻发布服务')
         parser.add_argument('--title', type=str, help='笔记标题')
         parser.add_argument('--description', type=str, help='笔记描述')
         parser.add_argument('--image-dir', type=str, help='图片目录')
         parser.add_argument('--hashtags', type=str, nargs='+', help='标签列表')
         parser.add_argument('--cookie-path', type=str, help='Cookie文件路径')
+        parser.add_argument('--posts-file', type=str, help='批量发布内容（JSONL、JSON列表、Markdown文件或包含这些文件的目录），逐篇读取')
+        parser.add_argument('--accounts', type=str, help='多账号清单文件（JSON），并行为多个账号发布')
+        parser.add_argument('--max-parallel', type=int, help='多账号并行发布的最大进程数')
+        parser.add_argument('--report', type=str, help='多账号发布报告的输出路径（JSON）')
+        parser.add_argument('--publish-at', type=str, help='定时发布时间（ISO格式，如 2025-01-01T09:00），默认立即')
+        parser.add_argument('--account', type=str, default='default', help='定时发布任务所属的账号')
+        parser.add_argument('--db', type=str, help='定时发布任务数据库路径')
+        parser.add_argument('--no-service', action='store_true', help='不转发给常驻发布服务，直接在本进程中发布')
         args = parser.parse_args()
         
+        # 仅在命令行运行时安装日志处理器
+        from logging_config import setup_logger
+        setup_logger()
+        logger.info("=== 小红书自动发布工具启动 ===")
+        
         # 加载配置并发布
         config = load_config()
+        if config.get('logging'):
+            # 应用配置中的日志格式和截断长度
+            setup_logger(settings=config['logging'])
+        # 启用现场记录时保留最近的日志，失败时写入现场文件
+        from artifacts import install_recent_logs
+        install_recent_logs(config)
         if args.cookie_path:
             config['cookie_path'] = args.cookie_path
-            
-        result = publish_post(
-            title=args.title,
-            description=args.description,
-            image_dir=args.image_dir,
-            hashtags=args.hashtags,
-            config=config
-        )
+        
+        scheduler_settings = dict(config.get('scheduler') or {})
+        if args.db:
+            scheduler_settings['db_path'] = args.db
+        
+        # 常驻发布服务正在运行时，publish只负责把内容转发给服务
+        forwarded = None
+        if args.command == 'publish' and not args.accounts and not args.no_service:
+            forwarded = _forward_to_service(args, config)
+        
+        if forwarded is not None:
+            result = forwarded
+        elif args.command == 'serve':
+            from scheduler import serve
+            accounts = None
+            if args.accounts:
+                from multi_account import load_accounts_manifest
+                accounts = load_accounts_manifest(args.accounts)['accounts']
+            serve(config=config, accounts=accounts, settings=scheduler_settings)
+            result = True
+        elif args.command == 'enqueue':
+            from scheduler import JobStore, SCHEDULER_DEFAULTS, parse_publish_at
+            if not args.posts_file:
+                parser.error("enqueue 需要 --posts-file")
+            store = JobStore(scheduler_settings.get('db_path', SCHEDULER_DEFAULTS['db_path']))
+            publish_at = parse_publish_at(args.publish_at)
+            from ingest import iter_valid_posts
+            added = skipped = 0
+            for data in iter_valid_posts(args.posts_file):
+                if data.get('invalid'):
+                    # 无效内容不加入队列
+                    skipped += 1
+                    continue
+                store.add_job(data, publish_at=publish_at, account=args.account,
+                              max_attempts=scheduler_settings.get('max_attempts', SCHEDULER_DEFAULTS['max_attempts']))
+                added += 1
+            store.close()
+            if skipped:
+                logger.info("已加入 %s 个定时发布任务，跳过 %s 篇无效内容", added, skipped)
+            else:
+                logger.info("已加入 %s 个定时发布任务", added)
+            result = not skipped
+        elif args.command == 'service':
+            from publish_service import run_service
+            run_service(config=config)
+            result = True
+        elif args.accounts:
+            from multi_account import load_accounts_manifest, run_accounts
+            report = run_accounts(load_accounts_manifest(args.accounts), config=config,
+                                  max_parallel=args.max_parallel, report_path=args.report)
+            result = report['failed'] == 0 and report['total'] > 0
+        elif args.posts_file:
+            from ingest import iter_valid_posts
+            result = _log_results(iter_publish(iter_valid_posts(args.posts_file), config=config))
+        else:
+            result = publish_post(
+                title=args.title,
+                description=args.description,
+                image_dir=args.image_dir,
+                hashtags=args.hashtags,
+                config=config
+            )
         
         exit_code = 0 if result else 1
-        logger.info(f"=== 小红书自动发布工具{'正常' if result else '异常'}退出 ===")
+        logger.info("=== 小红书自动发布工具%s退出 ===", '正常' if result else '异常')
         sys.exit(exit_code)
     except Exception as e:
-        logger.error(f"程序执行过程中发生错误: {str(e)}")
+        logger.error("程序执行过程中发生错误: %s", e)
         logger.debug(traceback.format_exc())
         logger.info("=== 小红书自动发布工具异常退出 ===")
         sys.exit(1)
@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+"""
+小红书自动发布工具的失败分类和重试策略
+
+发布失败按原因分为四类，每类的处理方式不同：
+- transient（页面暂时异常：元素未出现、元素过期、点击被遮挡等）：在同一个浏览器上从最后完成的阶段继续
+- session（登录失效）：立即结束，重试没有意义
+- browser（浏览器崩溃或连接断开）：重新启动浏览器后从头开始
+- permanent（内容或参数错误，例如图片文件不存在）：立即结束
+
+重试之间使用带随机抖动的指数退避，并且每篇笔记有总的发布期限；
+发布流程中的每次等待也不超过剩余的期限（见Deadline.cap）。
+"""
+
+import time
+import random
+from typing import Dict, Optional, Any
+
+from logging_config import logger
+from session import SessionExpiredError
+
+# === 默认重试参数 ===
+RETRY_DEFAULTS = {
+    'base_delay': 2,  # 第一次重试前的等待时间（秒），之后每次翻倍
+    'max_delay': 60,  # 单次等待时间上限（秒）
+    'jitter': 0.5,  # 随机抖动比例：实际等待时间在 [delay * (1 - jitter), delay] 之间
+    'deadline': 900,  # 每篇笔记从开始到放弃的总期限（秒）
+}
+
+TRANSIENT = 'transient'
+SESSION = 'session'
+BROWSER = 'browser'
+PERMANENT = 'permanent'
+
+# WebDriver和DevTools协议错误信息中表示浏览器已不可用的片段
+_BROWSER_DEAD_MARKERS = (
+    'invalid session id',
+    'chrome not reachable',
+    'disconnected',
+    'session deleted',
+    'no such window',
+    'target window already closed',
+    'tab crashed',
+    'connection refused',
+    'max retries exceeded',
+    'target closed',
+)
+
+
+class PermanentPublishError(Exception):
+    """重试无法解决的发布错误（内容或参数无效、页面已就绪但找不到必需的元素）"""
+
+
+def get_retry_settings(config: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """合并RETRY_DEFAULTS和配置中的retry参数"""
+    settings = RETRY_DEFAULTS.copy()
+    settings.update((config or {}).get('retry') or {})
+    return settings
+
+
+def classify_failure(error: BaseException) -> str:
+    """判断失败类型，返回 transient、session、browser 或 permanent"""
+    from selenium.common.exceptions import (InvalidArgumentException, InvalidSessionIdException,
+                                            NoSuchWindowException, WebDriverException)
+    from browser_backend import CdpError
+
+    if isinstance(error, SessionExpiredError):
+        return SESSION
+    if isinstance(error, (PermanentPublishError, FileNotFoundError, ValueError, InvalidArgumentException)):
+        return PERMANENT
+    if isinstance(error, (InvalidSessionIdException, NoSuchWindowException, ConnectionError)):
+        return BROWSER
+    message = str(error).lower()
+    if isinstance(error, (WebDriverException, CdpError, OSError)) and any(m in message for m in _BROWSER_DEAD_MARKERS):
+        return BROWSER
+    if type(error).__name__ in ('MaxRetryError', 'NewConnectionError', 'ProtocolError'):
+        # urllib3：与chromedriver的连接已断开
+        return BROWSER
+    return TRANSIENT
+
+
+def backoff_delay(attempt: int, settings: Dict[str, Any], rng: Optional[random.Random] = None) -> float:
+    """第attempt次失败后的等待时间（秒）：指数增长、有上限并带随机抖动"""
+    rng = rng or random
+    delay = min(settings['max_delay'], settings['base_delay'] * (2 ** max(0, attempt - 1)))
+    return rng.uniform(delay * (1 - settings['jitter']), delay)
+
+
+class Deadline:
+    """每篇笔记的发布期限"""
+
+    def __init__(self, seconds: float):
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def cap(self, seconds: float) -> float:
+        """单次等待的上限：不超过剩余的期限"""
+        return min(seconds, self.remaining())
+
+    def allows(self, delay: float) -> bool:
+        """等待delay秒后是否仍在期限内"""
+        if self.remaining() <= delay:
+            logger.error("已超过本篇笔记的发布期限，不再重试")
+            return False
+        return True
@@ -0,0 +1,347 @@
+# -*- coding: utf-8 -*-
+"""
+小红书自动发布工具的定时发布服务
+
+发布任务（post_data + 发布时间）保存在本地 SQLite 数据库中，常驻进程按时间取出到期任务，
+交给每个账号常驻的浏览器（PublishSession）发布，并按账号进行令牌桶限速。
+失败的任务按指数退避重新排期，重试状态写入数据库，进程重启后可以从中断处继续。
+
+使用方法：
+    python rednote_auto_post.py enqueue --posts-file posts.jsonl --publish-at 2025-01-01T09:00
+    python rednote_auto_post.py serve
+"""
+
+import time
+import json
+import sqlite3
+import asyncio
+import datetime
+import traceback
+from typing import List, Dict, Optional, Any
+
+from logging_config import logger
+
+# === 默认调度参数 ===
+SCHEDULER_DEFAULTS = {
+    'db_path': 'jobs.db',  # 任务数据库路径
+    'poll_interval': 5,  # 扫描到期任务的间隔（秒）
+    'rate_per_minute': 1,  # 每个账号每分钟最多发布的笔记数
+    'burst': 1,  # 令牌桶容量（允许的突发发布数）
+    'max_attempts': 3,  # 每个任务的最大尝试次数
+    'retry_base_delay': 60,  # 重试的基础等待时间（秒），按指数增长
+    'retry_max_delay': 3600,  # 重试等待时间上限（秒）
+    'queue_size': 10,  # 每个账号在内存中排队的任务上限
+    'shutdown_timeout': 300,  # 停止时等待发布中的笔记完成的最长时间（秒）
+}
+
+DEFAULT_ACCOUNT = 'default'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    account TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    publish_at REAL NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    last_error TEXT,
+    result TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_due ON jobs (status, publish_at);
+"""
+
+
+# === 任务存储 ===
+class JobStore:
+    """基于SQLite的发布任务存储
+
+    任务状态：pending（等待发布）、running（发布中）、done（已完成）、failed（已放弃）
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self.conn = sqlite3.connect(db_path)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(_SCHEMA)
+        self.conn.commit()
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def add_job(self, post_data: Dict[str, Any], publish_at: Optional[float] = None,
+                account: str = DEFAULT_ACCOUNT, max_attempts: int = SCHEDULER_DEFAULTS['max_attempts']) -> int:
+        """添加发布任务，publish_at为Unix时间戳，None表示立即发布"""
+        now = time.time()
+        cursor = self.conn.execute(
+            "INSERT INTO jobs (account, payload, publish_at, max_attempts, created_at, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (account, json.dumps(post_data, ensure_ascii=False), publish_at or now, max_attempts, now, now))
+        self.conn.commit()
+        return cursor.lastrowid
+
+    def recover(self) -> int:
+        """将上次异常退出时仍处于running状态的任务恢复为pending"""
+        cursor = self.conn.execute(
+            "UPDATE jobs SET status = 'pending', updated_at = ? WHERE status = 'running'", (time.time(),))
+        self.conn.commit()
+        return cursor.rowcount
+
+    def claim_due(self, account: str, limit: int, now: Optional[float] = None) -> List[Dict[str, Any]]:
+        """取出账号的到期任务并标记为running"""
+        now = now or time.time()
+        rows = self.conn.execute(
+            "SELECT id, account, payload, attempts, max_attempts FROM jobs "
+            "WHERE status = 'pending' AND account = ? AND publish_at <= ? "
+            "ORDER BY publish_at, id LIMIT ?", (account, now, limit)).fetchall()
+        if rows:
+            self.conn.executemany(
+                "UPDATE jobs SET status = 'running', updated_at = ? WHERE id = ?",
+                [(now, row['id']) for row in rows])
+            self.conn.commit()
+        return [dict(row, payload=json.loads(row['payload'])) for row in rows]
+
+    def accounts_with_due_jobs(self, now: Optional[float] = None) -> List[str]:
+        """返回有到期任务的账号列表"""
+        rows = self.conn.execute(
+            "SELECT DISTINCT account FROM jobs WHERE status = 'pending' AND publish_at <= ?",
+            (now or time.time(),)).fetchall()
+        return [row['account'] for row in rows]
+
+    def mark_done(self, job_id: int, result: Dict[str, Any]) -> None:
+        self.conn.execute(
+            "UPDATE jobs SET status = 'done', attempts = attempts + 1, result = ?, last_error = NULL, "
+            "updated_at = ? WHERE id = ?", (json.dumps(result, ensure_ascii=False), time.time(), job_id))
+        self.conn.commit()
+
+    def mark_retry(self, job_id: int, error: str, publish_at: float) -> None:
+        self.conn.execute(
+            "UPDATE jobs SET status = 'pending', attempts = attempts + 1, last_error = ?, publish_at = ?, "
+            "updated_at = ? WHERE id = ?", (error, publish_at, time.time(), job_id))
+        self.conn.commit()
+
+    def mark_failed(self, job_id: int, error: str) -> None:
+        self.conn.execute(
+            "UPDATE jobs SET status = 'failed', attempts = attempts + 1, last_error = ?, updated_at = ? "
+            "WHERE id = ?", (error, time.time(), job_id))
+        self.conn.commit()
+
+    def counts(self) -> Dict[str, int]:
+        """按状态统计任务数量"""
+        rows = self.conn.execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status").fetchall()
+        return {row['status']: row['n'] for row in rows}
+
+
+# === 限速 ===
+class TokenBucket:
+    """令牌桶限速器：以固定速率补充令牌，桶容量决定允许的突发数量"""
+
+    def __init__(self, rate_per_minute: float, burst: int = 1):
+        if not rate_per_minute or rate_per_minute <= 0:
+            raise ValueError(f"rate_per_minute 必须大于0: {rate_per_minute}")
+        self.rate = rate_per_minute / 60.0
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self) -> None:
+        """等待直到取得一个令牌"""
+        while True:
+            self._refill()
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+def validate_settings(settings: Dict[str, Any], account: Optional[str] = None) -> None:
+    """检查调度参数，无效时抛出ValueError（启动时检查，不等到账号的第一个任务）"""
+    where = f"账号 {account} 的" if account else ""
+    rate = settings.get('rate_per_minute')
+    if not isinstance(rate, (int, float)) or isinstance(rate, bool) or rate <= 0:
+        raise ValueError(f"{where}scheduler.rate_per_minute 必须是大于0的数字: {rate!r}")
+    if int(settings.get('queue_size') or 0) < 1:
+        raise ValueError(f"{where}scheduler.queue_size 必须大于0: {settings.get('queue_size')!r}")
+
+
+def retry_delay(attempts: int, settings: Dict[str, Any]) -> float:
+    """第attempts次失败后的重试等待时间（指数退避）"""
+    return min(settings['retry_max_delay'], settings['retry_base_delay'] * (2 ** max(0, attempts - 1)))
+
+
+# === 调度器 ===
+class Scheduler:
+    """常驻调度器：扫描到期任务，分发给各账号的常驻浏览器
+
+    Args:
+        store: 任务存储
+        config: 全局发布配置
+        accounts: 账号名到账号配置的映射（格式同多账号清单中的accounts），
+            未列出的账号使用全局配置
+        settings: 调度参数，未提供的项使用SCHEDULER_DEFAULTS
+    """
+
+    def __init__(self, store: JobStore, config: Optional[Dict[str, Any]] = None,
+                 accounts: Optional[Dict[str, Dict[str, Any]]] = None,
+                 settings: Optional[Dict[str, Any]] = None):
+        self.store = store
+        self.config = dict(config or {})
+        self.accounts = accounts or {}
+        self.settings = SCHEDULER_DEFAULTS.copy()
+        self.settings.update(settings or {})
+        validate_settings(self.settings)
+        for account in self.accounts:
+            validate_settings(self._account_settings(account), account)
+        self.queues = {}
+        self.workers = {}
+        self.sessions = {}
+        # 发布中的笔记：future -> (任务, 调度参数)；worker被取消后线程仍在运行，停止时等待其完成
+        self._inflight = {}
+        self._stopping = False
+
+    def _session_for(self, account: str):
+        """返回账号的常驻浏览器会话"""
+        if account not in self.sessions:
+            from rednote_auto_post import PublishSession
+            config = dict(self.config, profile=dict(self.config.get('profile') or {}, name=account))
+            account_conf = self.accounts.get(account)
+            if account_conf:
+                from multi_account import _account_config
+                config = _account_config(account, account_conf, self.config)
+            # 重试由调度器负责，单次调度只尝试一次
+            config['max_retries'] = 1
+            self.sessions[account] = PublishSession(config)
+        return self.sessions[account]
+
+    def _account_settings(self, account: str) -> Dict[str, Any]:
+        settings = dict(self.settings)
+        settings.update((self.accounts.get(account) or {}).get('scheduler') or {})
+        return settings
+
+    def _ensure_worker(self, account: str) -> asyncio.Queue:
+        if account not in self.queues:
+            settings = self._account_settings(account)
+            self.queues[account] = asyncio.Queue(maxsize=settings['queue_size'])
+            bucket = TokenBucket(settings['rate_per_minute'], settings['burst'])
+            self.workers[account] = asyncio.ensure_future(self._worker(account, bucket, settings))
+        return self.queues[account]
+
+    async def _worker(self, account: str, bucket: TokenBucket, settings: Dict[str, Any]) -> None:
+        """按顺序发布某个账号的任务"""
+        queue = self.queues[account]
+        session = self._session_for(account)
+        while True:
+            job = await queue.get()
+            try:
+                await bucket.acquire()
+                logger.info("开始发布任务 #%s（账号 %s）", job['id'], account)
+                publish = asyncio.ensure_future(asyncio.to_thread(session.publish, job['payload']))
+                self._inflight[publish] = (job, settings)
+                # 取消worker不会停止发布线程；asyncio.wait被取消时不取消publish，结果在_shutdown中记录
+                await asyncio.wait({publish})
+                del self._inflight[publish]
+                self._record(job, self._publish_result(publish), settings)
+            finally:
+                queue.task_done()
+
+    @staticmethod
+    def _publish_result(publish: asyncio.Future) -> Dict[str, Any]:
+        """已完成的发布future的结果，发布抛出异常时转换为失败结果"""
+        try:
+            return publish.result()
+        except Exception as e:
+            logger.debug("".join(traceback.format_exception(type(e), e, e.__traceback__)))
+            return {'success': False, 'error': str(e)}
+
+    def _record(self, job: Dict[str, Any], result: Dict[str, Any], settings: Dict[str, Any]) -> None:
+        """将发布结果写回任务存储"""
+        if result.get('success'):
+            self.store.mark_done(job['id'], result)
+            logger.info("任务 #%s 发布成功", job['id'])
+            return
+        error = result.get('error') or "发布失败"
+        attempts = job['attempts'] + 1
+        if result.get('failure') == 'permanent':
+            self.store.mark_failed(job['id'], error)
+            logger.error("任务 #%s 的内容或参数无效，放弃: %s", job['id'], error)
+        elif attempts >= job['max_attempts']:
+            self.store.mark_failed(job['id'], error)
+            logger.error("任务 #%s 已达到最大尝试次数 (%s)，放弃: %s", job['id'], attempts, error)
+        else:
+            delay = retry_delay(attempts, settings)
+            self.store.mark_retry(job['id'], error, time.time() + delay)
+            logger.warning("任务 #%s 发布失败，%.0f 秒后重试: %s", job['id'], delay, error)
+
+    def _dispatch_due(self) -> None:
+        """把到期任务放入各账号的队列，队列已满的账号等待下一轮（背压）"""
+        for account in self.store.accounts_with_due_jobs():
+            queue = self._ensure_worker(account)
+            free = queue.maxsize - queue.qsize()
+            if free <= 0:
+                continue
+            for job in self.store.claim_due(account, free):
+                queue.put_nowait(job)
+
+    async def run(self) -> None:
+        """运行调度循环，直到stop()被调用"""
+        recovered = self.store.recover()
+        if recovered:
+            logger.info("已恢复 %s 个中断的任务", recovered)
+        logger.info("调度器已启动，任务数据库: %s", self.store.db_path)
+        try:
+            while not self._stopping:
+                self._dispatch_due()
+                await asyncio.sleep(self.settings['poll_interval'])
+        finally:
+            await self._shutdown()
+
+    def stop(self) -> None:
+        self._stopping = True
+
+    async def _shutdown(self) -> None:
+        for worker in self.workers.values():
+            worker.cancel()
+        await asyncio.gather(*self.workers.values(), return_exceptions=True)
+        # 发布线程无法被取消，先等待其完成并记录结果，再关闭浏览器
+        if self._inflight:
+            logger.info("等待 %s 篇发布中的笔记完成", len(self._inflight))
+            done, pending = await asyncio.wait(set(self._inflight), timeout=self.settings['shutdown_timeout'])
+            for publish in done:
+                job, settings = self._inflight.pop(publish)
+                self._record(job, self._publish_result(publish), settings)
+            if pending:
+                logger.warning("%s 篇笔记在 %s 秒内未发布完成，强制关闭浏览器", len(pending), self.settings['shutdown_timeout'])
+        for session in self.sessions.values():
+            await asyncio.to_thread(session.__exit__, None, None, None)
+        # 被取消的任务在下次启动时由recover()恢复
+        logger.info("调度器已停止，任务统计: %s", self.store.counts())
+
+
+def parse_publish_at(value: Optional[str]) -> Optional[float]:
+    """解析发布时间（ISO格式，例如 2025-01-01T09:00），返回Unix时间戳"""
+    if not value:
+        return None
+    return datetime.datetime.fromisoformat(value).timestamp()
+
+
+def serve(config: Optional[Dict[str, Any]] = None, accounts: Optional[Dict[str, Dict[str, Any]]] = None,
+          settings: Optional[Dict[str, Any]] = None) -> None:
+    """启动常驻调度服务（阻塞运行，Ctrl+C退出）"""
+    merged = SCHEDULER_DEFAULTS.copy()
+    merged.update(settings or {})
+    store = JobStore(merged['db_path'])
+    scheduler = Scheduler(store, config=config, accounts=accounts, settings=merged)
+    try:
+        asyncio.run(scheduler.run())
+    except KeyboardInterrupt:
+        logger.info("收到退出信号，调度器停止")
+    finally:
+        store.close()
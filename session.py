@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+"""
+小红书自动发布工具的登录会话管理
+
+- Cookie以JSON格式保存，包含保存时间和每个Cookie的过期时间，兼容旧版pickle格式
+- 启动浏览器之前先在本地检查Cookie是否过期
+- 通过DevTools协议一次性注入全部Cookie，浏览器的第一次页面加载就是已登录的创建页面
+- 检测到被重定向到登录页时立即抛出SessionExpiredError，而不是等到后续元素超时
+"""
+
+import os
+import json
+import time
+import pickle
+from typing import List, Dict, Optional, Any
+
+from logging_config import logger
+
+# Cookie文件格式版本
+COOKIE_STORE_VERSION = 1
+
+# 表示登录状态的Cookie名称，其中任意一个过期即视为登录失效
+SESSION_COOKIE_NAMES = (
+    'web_session',
+    'galaxy_creator_session_id',
+    'customer-sso-sid',
+    'access-token-creator.xiaohongshu.com',
+)
+
+# 登录页地址特征
+LOGIN_URL_MARKERS = ('/login', 'login?', 'passport')
+
+
+class SessionExpiredError(Exception):
+    """登录状态已失效（Cookie过期或被重定向到登录页），需要重新登录"""
+
+
+# === Cookie存储 ===
+def save_cookie_store(cookie_path: str, cookies: List[Dict[str, Any]]) -> None:
+    """以JSON格式保存Cookie及其过期信息"""
+    store = {
+        'version': COOKIE_STORE_VERSION,
+        'saved_at': time.time(),
+        'cookies': cookies,
+    }
+    tmp_path = cookie_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(store, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, cookie_path)
+
+
+def load_cookie_store(cookie_path: str) -> List[Dict[str, Any]]:
+    """读取Cookie文件，支持JSON格式和旧版pickle格式"""
+    with open(cookie_path, 'rb') as f:
+        raw = f.read()
+    try:
+        store = json.loads(raw.decode('utf-8'))
+    except (UnicodeDecodeError, ValueError):
+        # 旧版使用pickle保存driver.get_cookies()的结果
+        logger.debug("Cookie文件为旧版pickle格式: %s", cookie_path)
+        return pickle.loads(raw)
+    if isinstance(store, list):
+        return store
+    return store.get('cookies', [])
+
+
+def cookie_expiry(cookies: List[Dict[str, Any]]) -> Optional[float]:
+    """返回登录Cookie中最早的过期时间（Unix时间戳），没有过期信息时返回None"""
+    session_cookies = [c for c in cookies if c.get('name') in SESSION_COOKIE_NAMES]
+    expiries = [c['expiry'] for c in session_cookies or cookies if c.get('expiry')]
+    return min(expiries) if expiries else None
+
+
+def check_cookies(cookies: List[Dict[str, Any]], now: Optional[float] = None) -> None:
+    """在本地检查Cookie是否可用，不可用时抛出SessionExpiredError"""
+    if not cookies:
+        raise SessionExpiredError("Cookie文件为空，请重新登录")
+    now = now or time.time()
+    expiry = cookie_expiry(cookies)
+    if expiry is not None and expiry <= now:
+        expired_at = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(expiry))
+        raise SessionExpiredError(f"登录Cookie已于 {expired_at} 过期，请删除Cookie文件后重新登录")
+
+
+# === 浏览器会话 ===
+def _to_cdp_cookie(cookie: Dict[str, Any]) -> Dict[str, Any]:
+    """将Selenium格式的Cookie转换为DevTools协议Network.setCookies的参数"""
+    params = {
+        'name': cookie['name'],
+        'value': cookie['value'],
+        'domain': cookie.get('domain', '.xiaohongshu.com'),
+        'path': cookie.get('path', '/'),
+        'secure': cookie.get('secure', False),
+        'httpOnly': cookie.get('httpOnly', False),
+    }
+    if cookie.get('expiry'):
+        params['expires'] = cookie['expiry']
+    if cookie.get('sameSite') in ('Strict', 'Lax', 'None'):
+        params['sameSite'] = cookie['sameSite']
+    return params
+
+
+def inject_cookies(driver, cookies: List[Dict[str, Any]], home_url: str) -> None:
+    """在第一次页面加载之前一次性注入全部Cookie
+
+    优先使用DevTools协议（一次调用，无需先打开页面）；浏览器不支持时回退到
+    先打开首页、再逐个add_cookie的方式。
+    """
+    if hasattr(driver, 'execute_cdp_cmd'):
+        driver.execute_cdp_cmd('Network.setCookies', {'cookies': [_to_cdp_cookie(c) for c in cookies]})
+        logger.debug("已通过DevTools协议注入 %d 个Cookie", len(cookies))
+        return
+    driver.get(home_url)
+    for cookie in cookies:
+        driver.add_cookie(cookie)
+    logger.debug("已逐个注入 %d 个Cookie", len(cookies))
+
+
+def is_login_page(driver) -> bool:
+    """当前页面是否为登录页"""
+    url = driver.current_url.lower()
+    return any(marker in url for marker in LOGIN_URL_MARKERS)
+
+
+def ensure_logged_in(driver) -> None:
+    """当前页面为登录页时抛出SessionExpiredError"""
+    if is_login_page(driver):
+        raise SessionExpiredError(f"已被重定向到登录页: {driver.current_url}")
@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+"""
+失败现场记录的测试：文件命名（包括多账号模式派生的工作进程）和按总大小淘汰整组文件
+
+运行: python -m unittest discover tests
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+import multiprocessing
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+from artifacts import ArtifactStore  # noqa: E402
+from fake_driver import FakeDriver  # noqa: E402
+
+
+def _capture_in_child(directory, queue):
+    store = ArtifactStore({'dir': directory})
+    path = store.capture(FakeDriver(), 'publish')
+    store.wait(timeout=10)
+    queue.put(path)
+
+
+class ArtifactTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp(prefix='rednote_artifacts_')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+
+class NamingTest(ArtifactTestCase):
+
+    def test_capture_writes_group(self):
+        store = ArtifactStore({'dir': self.dir})
+        first = store.capture(FakeDriver(), 'upload')
+        second = store.capture(FakeDriver(), 'upload')
+        store.wait(timeout=10)
+        self.assertNotEqual(first, second)
+        self.assertIn(f"_{os.getpid()}_", os.path.basename(first))
+        self.assertTrue(os.path.exists(first + '.html.gz'))
+
+    def test_disabled(self):
+        self.assertIsNone(ArtifactStore({'dir': self.dir, 'enabled': False}).capture(FakeDriver(), 'upload'))
+        self.assertEqual(os.listdir(self.dir), [])
+
+    @unittest.skipUnless('fork' in multiprocessing.get_all_start_methods(), "需要fork启动方式")
+    def test_forked_workers_do_not_collide(self):
+        # 父进程先记录一次，写入线程已启动、序号已递增，再派生子进程
+        store = ArtifactStore({'dir': self.dir})
+        parent = store.capture(FakeDriver(), 'publish')
+        store.wait(timeout=10)
+
+        context = multiprocessing.get_context('fork')
+        queue = context.Queue()
+        workers = [context.Process(target=_capture_in_child, args=(self.dir, queue)) for _ in range(2)]
+        for worker in workers:
+            worker.start()
+        children = [queue.get(timeout=30) for _ in workers]
+        for worker in workers:
+            worker.join(timeout=30)
+            self.assertEqual(worker.exitcode, 0)
+
+        paths = [parent] + children
+        self.assertEqual(len(set(paths)), 3)
+        # 子进程中的写入线程重新创建，现场文件确实写入
+        for path in paths:
+            self.assertTrue(os.path.exists(path + '.html.gz'), path)
+
+
+class EvictionTest(ArtifactTestCase):
+
+    def make_group(self, name, mtime, size=100):
+        """一组现场文件（截图和日志，各size字节），修改时间为mtime"""
+        paths = []
+        for suffix in ('.png', '.log'):
+            path = os.path.join(self.dir, name + suffix)
+            with open(path, 'wb') as f:
+                f.write(b'x' * size)
+            os.utime(path, (mtime, mtime))
+            paths.append(path)
+        return paths
+
+    def remaining(self):
+        return sorted({name.split('.', 1)[0] for name in os.listdir(self.dir)})
+
+    def test_evicts_oldest_groups(self):
+        for i, name in enumerate(['a', 'b', 'c', 'd']):
+            self.make_group(name, 1_000_000 + i)
+        store = ArtifactStore({'dir': self.dir, 'max_total_bytes': 450})
+        # 共800字节，按时间从旧到新整组删除，直到不超过450字节
+        self.assertEqual(store._evict(keep=[]), 2)
+        self.assertEqual(self.remaining(), ['c', 'd'])
+
+    def test_keeps_current_group(self):
+        current = self.make_group('a', 1_000_000)
+        self.make_group('b', 1_000_001)
+        self.make_group('c', 1_000_002)
+        store = ArtifactStore({'dir': self.dir, 'max_total_bytes': 250})
+        self.assertEqual(store._evict(keep=current), 2)
+        self.assertEqual(self.remaining(), ['a'])
+
+    def test_under_limit(self):
+        self.make_group('a', 1_000_000)
+        store = ArtifactStore({'dir': self.dir, 'max_total_bytes': 1000})
+        self.assertEqual(store._evict(keep=[]), 0)
+        self.assertEqual(self.remaining(), ['a'])
+
+    def test_capture_applies_limit(self):
+        for i in range(5):
+            self.make_group(f'old{i}', 1_000_000 + i, size=1000)
+        store = ArtifactStore({'dir': self.dir, 'max_total_bytes': 2500})
+        path = store.capture(FakeDriver(), 'publish')
+        store.wait(timeout=10)
+        self.assertIn(os.path.basename(path), self.remaining())
+        total = sum(os.path.getsize(os.path.join(self.dir, name)) for name in os.listdir(self.dir))
+        self.assertLessEqual(total, 2500)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+"""
+浏览器后端的发布流程测试
+
+同一组用例分别在 SeleniumBackend（假WebDriver，见benchmarks/fake_driver）和
+CdpBackend（假DevTools协议连接，见benchmarks/fake_cdp）上运行，不需要Chrome。
+
+运行: python -m unittest discover tests
+"""
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+import rednote_auto_post as rap  # noqa: E402
+from retry_policy import Deadline, PermanentPublishError, PERMANENT, classify_failure  # noqa: E402
+from browser_backend import SeleniumBackend, CdpBackend, WaitTimeout, as_backend  # noqa: E402
+from fake_driver import FakeDriver  # noqa: E402
+from fake_cdp import fake_cdp_backend  # noqa: E402
+
+FAKE_CREATION_URL = 'http://fake.invalid/publish/publish?from=menu&target=post'
+
+
+def _test_config(**overrides):
+    # 等待上限设得很短，超时用例不拖慢测试
+    config = {'debug': True, 'wait_profile': 'fast', 'creation_url': FAKE_CREATION_URL, 'max_retries': 1,
+              'timeout': 0.3, 'upload_timeout': 0.3, 'wait_after_upload': 0.3, 'wait_after_publish': 0.3}
+    config.update(overrides)
+    return config
+
+
+def _hide(page, xpath):
+    """让页面模型找不到指定元素（模拟页面结构变化）"""
+    locate = page._locate
+    page._locate = lambda target: None if target == xpath else locate(target)
+
+
+class _PublishFlowCases:
+    """两种后端共用的发布流程用例，子类实现make_driver和page"""
+
+    backend_class = None
+
+    def make_driver(self, upload_delay=0.0):
+        raise NotImplementedError
+
+    def page(self, driver):
+        raise NotImplementedError
+
+    def setUp(self):
+        self.image_dir = tempfile.mkdtemp(prefix='rednote_test_')
+        self.image_paths = []
+        for i in range(3):
+            path = os.path.join(self.image_dir, f'{i:02d}.png')
+            with open(path, 'wb') as f:
+                f.write(b'\x89PNG\r\n\x1a\n')
+            self.image_paths.append(path)
+        self.states = []
+
+    def tearDown(self):
+        shutil.rmtree(self.image_dir, ignore_errors=True)
+
+    def _run(self, driver, progress, navigate=True, deadline=None, **config):
+        rap._run_publish(driver, progress, self.image_paths, '测试标题', '测试正文', ['#测试'],
+                         _test_config(**config), navigate=navigate, on_state=self.states.append, deadline=deadline)
+
+    def test_backend_type(self):
+        self.assertIsInstance(as_backend(self.make_driver()), self.backend_class)
+
+    def test_publish_success(self):
+        driver = self.make_driver()
+        progress = rap.PublishProgress()
+        self._run(driver, progress)
+        page = self.page(driver)
+        self.assertTrue(page.published)
+        self.assertEqual(page.title_input.value, '测试标题')
+        self.assertEqual(page.body_input.value, '测试正文\n#测试')
+        self.assertEqual(page.expected_uploads, len(self.image_paths))
+        self.assertEqual(self.states, ['uploading', 'submitted', 'confirmed'])
+        self.assertIsNone(progress.phase)
+
+    def test_publish_post_returns_true(self):
+        self.assertTrue(rap._publish_post(self.make_driver(), self.image_paths, '测试标题', '测试正文',
+                                          ['#测试'], _test_config()))
+
+    def test_missing_element(self):
+        driver = self.make_driver()
+        progress = rap.PublishProgress()
+        _hide(self.page(driver), rap.SELECTORS['publish_button'])
+        # 页面已就绪但元素不存在：页面结构变化，重试无效
+        with self.assertRaises(PermanentPublishError) as raised:
+            self._run(driver, progress)
+        self.assertEqual(classify_failure(raised.exception), PERMANENT)
+        # 停在点击发布之前，没有产生提交
+        self.assertEqual(progress.phase, 'publish')
+        self.assertFalse(self.page(driver).published)
+        self.assertNotIn('submitted', self.states)
+
+    def test_missing_file_input(self):
+        driver = self.make_driver()
+        progress = rap.PublishProgress()
+        as_backend(driver).navigate(FAKE_CREATION_URL)
+        _hide(self.page(driver), rap.SELECTORS['file_input'])
+        with self.assertRaises(WaitTimeout):
+            self._run(driver, progress, navigate=False)
+        self.assertEqual(progress.phase, 'navigate')
+        self.assertEqual(self.states, [])
+
+    def test_upload_wait_timeout(self):
+        driver = self.make_driver(upload_delay=5.0)
+        progress = rap.PublishProgress()
+        with self.assertRaises(WaitTimeout):
+            self._run(driver, progress, upload_timeout=0.2)
+        self.assertEqual(progress.phase, 'upload')
+        self.assertEqual(self.states, ['uploading'])
+        self.assertFalse(self.page(driver).published)
+
+    def test_missing_image_file(self):
+        os.remove(self.image_paths[-1])
+        with self.assertRaises(PermanentPublishError):
+            self._run(self.make_driver(), rap.PublishProgress())
+        self.assertEqual(self.states, [])
+
+    def test_deadline_bounds_wait(self):
+        driver = self.make_driver(upload_delay=5.0)
+        started = time.monotonic()
+        with self.assertRaises(WaitTimeout):
+            self._run(driver, rap.PublishProgress(), upload_timeout=5, deadline=Deadline(0.3))
+        # 单次等待不超过剩余的发布期限
+        self.assertLess(time.monotonic() - started, 2)
+
+    def test_resume_after_upload_timeout(self):
+        driver = self.make_driver(upload_delay=0.3)
+        progress = rap.PublishProgress()
+        with self.assertRaises(WaitTimeout):
+            self._run(driver, progress, upload_timeout=0.05)
+        # 同一个浏览器上重试时从上传阶段继续，不重新进入页面
+        self._run(driver, progress, upload_timeout=2)
+        self.assertTrue(self.page(driver).published)
+        self.assertIsNone(progress.phase)
+
+
+class SeleniumBackendTest(_PublishFlowCases, unittest.TestCase):
+    backend_class = SeleniumBackend
+
+    def make_driver(self, upload_delay=0.0):
+        return FakeDriver(upload_delay=upload_delay)
+
+    def page(self, driver):
+        return driver.page
+
+
+class CdpBackendTest(_PublishFlowCases, unittest.TestCase):
+    backend_class = CdpBackend
+
+    def make_driver(self, upload_delay=0.0):
+        return fake_cdp_backend(upload_delay=upload_delay)
+
+    def page(self, driver):
+        return driver.conn.page
+
+
+if __name__ == '__main__':
+    unittest.main()
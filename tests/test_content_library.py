@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+"""
+内容库的测试：只读文件头获得图片格式和尺寸（PNG、JPEG、WEBP，包括不完整或损坏的文件）和图片的自然排序
+
+运行: python -m unittest discover tests
+"""
+
+import os
+import sys
+import shutil
+import struct
+import tempfile
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from content_library import natural_key, read_image_info, scan_folder  # noqa: E402
+
+
+# === 文件头样本 ===
+def png_header(width, height):
+    ihdr = struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)
+    return b'\x89PNG\r\n\x1a\n' + struct.pack('>I', len(ihdr)) + b'IHDR' + ihdr + b'\x00' * 4
+
+
+def jpeg_header(width, height, sof=0xC0):
+    app0 = b'\xff\xe0' + struct.pack('>H', 16) + b'JFIF\x00\x01\x01\x00\x00\x01\x00\x01\x00\x00'
+    # DHT（0xC4）不是帧头，其中的数据不能被当作尺寸
+    dht = b'\xff\xc4' + struct.pack('>H', 6) + b'\x00\x01\x02\x03'
+    frame = b'\xff' + bytes([sof]) + struct.pack('>HBHHB', 11, 8, height, width, 1) + b'\x01\x11\x00'
+    return b'\xff\xd8' + app0 + dht + frame + b'\xff\xd9'
+
+
+def webp_header(chunk, width, height):
+    if chunk == b'VP8 ':
+        payload = b'\x00\x00\x00' + b'\x9d\x01\x2a' + struct.pack('<HH', width, height)
+    elif chunk == b'VP8L':
+        payload = b'\x2f' + struct.pack('<I', (width - 1) | ((height - 1) << 14))
+    else:
+        payload = b'\x00' * 4 + (width - 1).to_bytes(3, 'little') + (height - 1).to_bytes(3, 'little')
+    data = b'WEBP' + chunk + struct.pack('<I', len(payload)) + payload
+    return b'RIFF' + struct.pack('<I', len(data)) + data
+
+
+VALID_CASES = [
+    ('png', png_header(1080, 1440), ('PNG', 1080, 1440)),
+    ('jpeg_baseline', jpeg_header(800, 600), ('JPEG', 800, 600)),
+    ('jpeg_progressive', jpeg_header(1920, 1080, sof=0xC2), ('JPEG', 1920, 1080)),
+    ('webp_lossy', webp_header(b'VP8 ', 640, 480), ('WEBP', 640, 480)),
+    ('webp_lossless', webp_header(b'VP8L', 300, 200), ('WEBP', 300, 200)),
+    ('webp_extended', webp_header(b'VP8X', 4000, 3000), ('WEBP', 4000, 3000)),
+]
+
+INVALID_CASES = [
+    ('empty', b''),
+    ('text', b'not an image at all'),
+    ('png_truncated', png_header(10, 10)[:20]),
+    ('png_no_ihdr', png_header(10, 10).replace(b'IHDR', b'IDAT')),
+    ('png_zero_size', png_header(0, 10)),
+    ('jpeg_truncated', jpeg_header(10, 10)[:24]),
+    ('jpeg_no_frame', b'\xff\xd8\xff\xd9'),
+    ('jpeg_bad_length', b'\xff\xd8\xff\xe0\x00\x01'),
+    ('jpeg_frame_cut', jpeg_header(10, 10)[:-8]),
+    ('webp_truncated', webp_header(b'VP8 ', 10, 10)[:24]),
+    ('webp_unknown_chunk', webp_header(b'VP8 ', 10, 10).replace(b'VP8 ', b'ALPH')),
+]
+
+
+class ImageHeaderTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp(prefix='rednote_library_')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def write(self, name, data):
+        path = os.path.join(self.tmp, name)
+        with open(path, 'wb') as f:
+            f.write(data)
+        return path
+
+    def test_valid_headers(self):
+        for name, data, (image_format, width, height) in VALID_CASES:
+            with self.subTest(name=name):
+                info = read_image_info(self.write(name, data))
+                self.assertEqual(info, {'format': image_format, 'width': width, 'height': height})
+
+    def test_invalid_headers(self):
+        for name, data in INVALID_CASES:
+            with self.subTest(name=name):
+                with self.assertRaises(ValueError):
+                    read_image_info(self.write(name, data))
+
+    def test_scan_folder(self):
+        self.write('10.jpg', jpeg_header(800, 600))
+        self.write('2.png', png_header(800, 600))
+        self.write('1.webp', webp_header(b'VP8L', 800, 600))
+        self.write('3.jpg', b'\xff\xd8\xff\xd9')
+        self.write('small.png', png_header(100, 100))
+        self.write('notes.txt', b'ignored')
+        manifest = scan_folder(self.tmp, {'min_dimension': 200})
+        self.assertEqual(manifest['valid'], ['1.webp', '2.png', '10.jpg'])
+        self.assertEqual([e.split(':')[0] for e in manifest['errors']], ['3.jpg', 'small.png'])
+
+    def test_scan_folder_max_images(self):
+        for i in range(1, 5):
+            self.write(f'{i}.png', png_header(10, 10))
+        manifest = scan_folder(self.tmp, {'max_images': 3})
+        self.assertEqual(manifest['valid'], ['1.png', '2.png', '3.png'])
+        self.assertEqual(len(manifest['errors']), 1)
+
+
+class NaturalKeyTest(unittest.TestCase):
+
+    def test_natural_order(self):
+        names = ['10.jpg', '2.jpg', '1.jpg', 'IMG_10.png', 'img_9.png', 'b.jpg', 'A.jpg']
+        self.assertEqual(sorted(names, key=natural_key),
+                         ['1.jpg', '2.jpg', '10.jpg', 'A.jpg', 'b.jpg', 'img_9.png', 'IMG_10.png'])
+
+    def test_leading_zeros(self):
+        self.assertEqual(sorted(['010.jpg', '9.jpg', '001.jpg'], key=natural_key), ['001.jpg', '9.jpg', '010.jpg'])
+
+
+if __name__ == '__main__':
+    unittest.main()
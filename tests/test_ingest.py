@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+"""
+内容导入的测试：Markdown解析（front-matter和省略时的标题、标签、图片目录规则）、
+JSONL中相对image_dir的解析，以及无效内容的占位结果
+
+运行: python -m unittest discover tests
+"""
+
+import os
+import sys
+import json
+import shutil
+import tempfile
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from ingest import parse_markdown, iter_posts, iter_valid_posts, split_front_matter  # noqa: E402
+
+
+class IngestTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp(prefix='rednote_ingest_')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def write(self, name, text):
+        path = os.path.join(self.tmp, name)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        return path
+
+
+class MarkdownTest(IngestTestCase):
+
+    def test_front_matter(self):
+        text = "---\ntitle: 标题\nimage_dir: images/post1\nhashtags: [#标签1, '#标签2']\n---\n正文第一行\n正文第二行\n"
+        fields, body = split_front_matter(text)
+        self.assertEqual(fields, {'title': '标题', 'image_dir': 'images/post1', 'hashtags': ['#标签1', '#标签2']})
+        self.assertEqual(body.strip(), "正文第一行\n正文第二行")
+
+    def test_title_sources(self):
+        # (Markdown, 标题, 正文)
+        cases = [
+            ("---\ntitle: 来自front-matter\n---\n📌 标题：不使用\n正文", '来自front-matter', "📌 标题：不使用\n正文"),
+            ("📌 标题：标题行\n正文", '标题行', "正文"),
+            ("标题: 半角冒号\n正文", '半角冒号', "正文"),
+            ("# 一级标题\n\n正文", '一级标题', "正文"),
+            ("## 二级标题不是标题\n# 一级标题 #\n正文", '一级标题', "## 二级标题不是标题\n正文"),
+            ("\ufeff# 带BOM\r\n正文\r\n", '带BOM', "正文"),
+        ]
+        for text, title, description in cases:
+            with self.subTest(text=text):
+                post = parse_markdown(text)
+                self.assertEqual(post['title'], title)
+                self.assertEqual(post['description'], description)
+
+    def test_trailing_hashtags(self):
+        post = parse_markdown("---\nhashtags: [#已有]\n---\n# 标题\n正文里的 #不是标签 行\n\n#Python #自动化\n#已有\n\n")
+        self.assertEqual(post['hashtags'], ['#已有', '#Python', '#自动化'])
+        self.assertEqual(post['description'], "正文里的 #不是标签 行")
+
+    def test_no_hashtags(self):
+        post = parse_markdown("# 标题\n正文")
+        self.assertNotIn('hashtags', post)
+
+    def test_sibling_image_dir(self):
+        path = self.write('笔记一.md', "# 标题\n正文")
+        sibling = os.path.join(self.tmp, '笔记一')
+        os.makedirs(sibling)
+        post = next(iter_posts(path))
+        self.assertEqual(post['image_dir'], sibling)
+        self.assertEqual(post['source'], path)
+        # 没有同名文件夹时不设置image_dir
+        other = self.write('笔记二.md', "# 标题\n正文")
+        self.assertNotIn('image_dir', next(iter_posts(other)))
+
+    def test_relative_image_dir(self):
+        path = self.write('post.md', "---\nimage_dir: images/post1\n---\n# 标题\n正文")
+        post = next(iter_posts(path))
+        self.assertEqual(post['image_dir'], os.path.join(self.tmp, 'images', 'post1'))
+
+
+class JsonlTest(IngestTestCase):
+
+    def write_jsonl(self, name, posts):
+        return self.write(name, ''.join((json.dumps(p, ensure_ascii=False) if p is not None else '') + '\n'
+                                        for p in posts))
+
+    def test_relative_image_dir(self):
+        absolute = os.path.join(self.tmp, 'absolute')
+        path = self.write_jsonl('posts.jsonl', [
+            {'title': '相对', 'description': '正文', 'image_dir': 'images/1'},
+            {'title': '绝对', 'description': '正文', 'image_dir': absolute},
+            {'title': '未指定', 'description': '正文'},
+        ])
+        cwd = os.getcwd()
+        # 相对路径以内容文件所在目录为基准，与当前目录无关
+        os.chdir(ROOT)
+        try:
+            posts = list(iter_posts(os.path.relpath(path)))
+        finally:
+            os.chdir(cwd)
+        self.assertEqual(posts[0]['image_dir'], os.path.join(self.tmp, 'images', '1'))
+        self.assertEqual(posts[1]['image_dir'], absolute)
+        self.assertNotIn('image_dir', posts[2])
+
+    def test_invalid_location(self):
+        path = self.write_jsonl('posts.jsonl', [
+            {'title': '有效', 'description': '正文'},
+            None,  # 空行不计入内容，但行号照常增加
+            {'title': '', 'description': '正文'},
+            {'title': '字' * 30, 'description': '正文'},
+        ])
+        posts = list(iter_valid_posts(path))
+        self.assertEqual(len(posts), 3)
+        self.assertNotIn('invalid', posts[0])
+        self.assertEqual(posts[0]['source'], f"{path}:1")
+        self.assertEqual(posts[1]['source'], f"{path}:3")
+        self.assertIn('title', posts[1]['invalid'])
+        self.assertEqual(posts[1]['title'], '')
+        self.assertEqual(set(posts[1]), {'title', 'source', 'invalid'})
+        # 超出长度限制默认只是警告，strict时记为无效
+        self.assertNotIn('invalid', posts[2])
+        strict = list(iter_valid_posts(path, strict=True))
+        self.assertEqual(strict[2]['source'], f"{path}:4")
+        self.assertIn('标题超过', strict[2]['invalid'])
+
+    def test_json_list_location(self):
+        path = self.write('posts.json', json.dumps([{'title': '有效', 'description': '正文'}, {'title': '缺正文'}],
+                                                   ensure_ascii=False))
+        posts = list(iter_valid_posts(path))
+        self.assertEqual(posts[1]['source'], f"{path}[1]")
+        self.assertEqual(posts[1]['title'], '缺正文')
+        self.assertIn('description', posts[1]['invalid'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+"""
+发布账本的测试：状态机（已提交或已确认的笔记跳过，未完成的重新发布）和内容指纹
+
+运行: python -m unittest discover tests
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+import rednote_auto_post as rap  # noqa: E402
+from ledger import PublishLedger, begin_record  # noqa: E402
+from fake_driver import FakeDriver  # noqa: E402
+
+FAKE_CREATION_URL = 'http://fake.invalid/publish/publish?from=menu&target=post'
+
+
+def _write(path, data):
+    with open(path, 'wb') as f:
+        f.write(data)
+
+
+class LedgerTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp(prefix='rednote_ledger_')
+        self.db_path = os.path.join(self.tmp, 'ledger.db')
+        self.image_paths = []
+        for i in range(2):
+            path = os.path.join(self.tmp, f'{i:02d}.png')
+            _write(path, b'\x89PNG\r\n\x1a\n' + bytes([i]) * 16)
+            self.image_paths.append(path)
+        self.ledgers = []
+
+    def tearDown(self):
+        for ledger in self.ledgers:
+            ledger.close()
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def open_ledger(self, account=None):
+        ledger = PublishLedger(self.db_path, account=account)
+        self.ledgers.append(ledger)
+        return ledger
+
+    def begin(self, ledger):
+        return begin_record(ledger, '标题', '正文', ['#标签'], self.image_paths)
+
+
+class StateMachineTest(LedgerTestCase):
+
+    def test_done_states_are_skipped(self):
+        for state in ('submitted', 'confirmed'):
+            with self.subTest(state=state):
+                ledger = self.open_ledger(account=state)
+                record = self.begin(ledger)
+                record.advance('uploading')
+                record.advance(state)
+                self.assertTrue(record.submitted)
+                self.assertTrue(ledger.is_done(record.fingerprint))
+                # 重跑（包括新打开的账本）时直接跳过
+                self.assertIsNone(self.begin(ledger))
+                self.assertIsNone(self.begin(self.open_ledger(account=state)))
+
+    def test_unfinished_states_are_republished(self):
+        for state in ('queued', 'uploading'):
+            with self.subTest(state=state):
+                ledger = self.open_ledger(account=state)
+                record = self.begin(ledger)
+                if state != 'queued':
+                    record.advance(state)
+                record.fail('页面异常')
+                retry = self.begin(ledger)
+                self.assertIsNotNone(retry)
+                self.assertEqual(retry.fingerprint, record.fingerprint)
+                entry = ledger.get(record.fingerprint)
+                self.assertEqual(entry['state'], 'queued')
+                self.assertEqual(entry['runs'], 2)
+                self.assertEqual(entry['last_error'], '页面异常')
+
+    def test_unknown_state(self):
+        ledger = self.open_ledger()
+        record = self.begin(ledger)
+        with self.assertRaises(ValueError):
+            record.advance('published')
+
+    def test_without_ledger(self):
+        record = begin_record(None, '标题', '正文', None, self.image_paths)
+        record.advance('submitted')
+        self.assertTrue(record.submitted)
+        self.assertIsNone(record.fingerprint)
+
+
+class FingerprintTest(LedgerTestCase):
+
+    def fingerprint(self, ledger, **overrides):
+        content = {'title': '标题', 'description': '正文', 'hashtags': ['#标签'], 'image_paths': self.image_paths}
+        content.update(overrides)
+        return ledger.fingerprint(**content)
+
+    def test_stable(self):
+        self.assertEqual(self.fingerprint(self.open_ledger()), self.fingerprint(self.open_ledger()))
+
+    def test_account(self):
+        prints = {self.fingerprint(self.open_ledger(account=name)) for name in (None, 'a', 'b')}
+        self.assertEqual(len(prints), 3)
+
+    def test_content_fields(self):
+        ledger = self.open_ledger()
+        base = self.fingerprint(ledger)
+        self.assertNotEqual(base, self.fingerprint(ledger, title='另一个标题'))
+        self.assertNotEqual(base, self.fingerprint(ledger, description='另一段正文'))
+        self.assertNotEqual(base, self.fingerprint(ledger, hashtags=['#其他']))
+        self.assertNotEqual(base, self.fingerprint(ledger, image_paths=self.image_paths[::-1]))
+
+    def test_image_content(self):
+        ledger = self.open_ledger()
+        base = self.fingerprint(ledger)
+        # 文件名不参与计算：同样内容换个路径，指纹不变
+        copy = os.path.join(self.tmp, 'renamed.png')
+        shutil.copyfile(self.image_paths[0], copy)
+        self.assertEqual(base, self.fingerprint(ledger, image_paths=[copy, self.image_paths[1]]))
+        # 原地覆盖图片（大小变化）后重新计算哈希
+        _write(self.image_paths[0], b'\x89PNG\r\n\x1a\n' + b'\xff' * 32)
+        self.assertNotEqual(base, self.fingerprint(ledger))
+
+
+class PreprocessFingerprintTest(LedgerTestCase):
+    """指纹按原图计算：开启或调整图片预处理后，已发布的笔记仍被跳过"""
+
+    def publish(self, preprocess, processed):
+        config = {'debug': True, 'wait_profile': 'fast', 'creation_url': FAKE_CREATION_URL, 'max_retries': 1,
+                  'ledger': {'enabled': True, 'db_path': self.db_path}, 'artifacts': {'enabled': False},
+                  'governor': {'enabled': False}, 'image_preprocess': preprocess}
+        with mock.patch('image_preprocess.preprocess_images', return_value=processed) as preprocess_images, \
+                rap.PublishSession(config) as session:
+            session.driver = FakeDriver()
+            result = session.publish_content('标题', '正文', self.image_paths, ['#标签'])
+        return result, preprocess_images
+
+    def processed_copies(self, name):
+        """模拟预处理的输出：内容与原图不同的缓存文件"""
+        paths = []
+        for i in range(len(self.image_paths)):
+            path = os.path.join(self.tmp, f'{name}_{i}.jpg')
+            _write(path, name.encode('ascii') + bytes([i]) * 8)
+            paths.append(path)
+        return paths
+
+    def test_preprocess_settings_do_not_change_fingerprint(self):
+        first, preprocess_images = self.publish({'enabled': True, 'max_dimension': 1440},
+                                                self.processed_copies('large'))
+        self.assertTrue(first['success'])
+        self.assertFalse(first['skipped'])
+        preprocess_images.assert_called_once()
+
+        for preprocess in ({'enabled': True, 'max_dimension': 1080, 'quality': 70}, {'enabled': False}):
+            with self.subTest(preprocess=preprocess):
+                rerun, preprocess_images = self.publish(preprocess, self.processed_copies('small'))
+                self.assertTrue(rerun['skipped'])
+                preprocess_images.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
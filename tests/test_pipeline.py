@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+"""
+流水线发布的测试（假WebDriver）：点击发布的顺序与输入一致、与已排队笔记内容相同的笔记不提前准备、
+临时多开的标签页在发布后关闭
+
+运行: python -m unittest discover tests
+"""
+
+import os
+import sys
+import shutil
+import struct
+import tempfile
+import unittest
+from unittest import mock
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+import rednote_auto_post as rap  # noqa: E402
+from pipeline import PublishPipeline  # noqa: E402
+from fake_driver import FakeDriver, FakePage  # noqa: E402
+
+FAKE_CREATION_URL = 'http://fake.invalid/publish/publish?from=menu&target=post'
+WINDOW = 2
+
+
+class PipelineTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp(prefix='rednote_pipeline_')
+        self.image_dir = os.path.join(self.tmp, 'images')
+        os.makedirs(self.image_dir)
+        for i in range(2):
+            with open(os.path.join(self.image_dir, f'{i}.png'), 'wb') as f:
+                f.write(b'\x89PNG\r\n\x1a\n' + struct.pack('>I', 13) + b'IHDR'
+                        + struct.pack('>IIBBBBB', 8 + i, 8, 8, 0, 0, 0, 0) + b'\x00' * 4)
+        # 记录每次点击发布时的标题，以及每次选择文件时浏览器中的标签页数
+        self.clicks = []
+        self.uploads = []
+        self.fail_titles = set()
+        test = self
+
+        def publish(page):
+            title = page.title_input.value
+            test.clicks.append(title)
+            if title in test.fail_titles:
+                test.fail_titles.discard(title)
+                raise RuntimeError("发布按钮被遮挡")
+            page.published = True
+
+        start_upload = FakePage._start_upload
+
+        def upload(page, paths):
+            test.uploads.append(len(page.driver.pages))
+            start_upload(page, paths)
+
+        for patch in (mock.patch.object(FakePage, '_publish', publish),
+                      mock.patch.object(FakePage, '_start_upload', upload)):
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def run_pipeline(self, titles, ledger=False, upload_delay=0.0):
+        config = {'debug': True, 'wait_profile': 'fast', 'creation_url': FAKE_CREATION_URL, 'max_retries': 1,
+                  'artifacts': {'enabled': False}, 'governor': {'enabled': False},
+                  'ledger': {'enabled': ledger, 'db_path': os.path.join(self.tmp, 'ledger.db')},
+                  'pipeline': {'enabled': True, 'window': WINDOW}}
+        posts = [{'title': title, 'description': f'{title}的正文', 'image_dir': self.image_dir} for title in titles]
+        # 正文只取决于标题：标题相同的笔记内容相同（账本指纹相同）
+        with rap.PublishSession(config) as session:
+            self.driver = session.driver = FakeDriver(upload_delay=upload_delay)
+            results = list(PublishPipeline(session, WINDOW).run((post, None) for post in posts))
+            self.tabs = len(self.driver.pages)
+        return results
+
+    def test_publish_order(self):
+        titles = [f'笔记{i}' for i in range(6)]
+        results = self.run_pipeline(titles, upload_delay=0.05)
+        self.assertEqual([r['title'] for r in results], titles)
+        self.assertTrue(all(r['success'] for r in results))
+        self.assertEqual(self.clicks, titles)
+        self.assertEqual(max(self.uploads), WINDOW)
+        self.assertEqual(self.tabs, WINDOW)
+
+    def test_duplicate_is_not_staged_early(self):
+        results = self.run_pipeline(['A', 'A', 'B'], ledger=True)
+        self.assertEqual([r['title'] for r in results], ['A', 'A', 'B'])
+        self.assertEqual([r.get('skipped', False) for r in results], [False, True, False])
+        # 相同内容的第二篇轮到时账本已显示A已发布，从未打开页面或上传图片
+        self.assertEqual(self.clicks, ['A', 'B'])
+        self.assertEqual(len(self.uploads), 2)
+
+    def test_duplicate_after_failure_and_tab_count(self):
+        # A第一次发布失败，相同内容的第二篇轮到时需要重新发布；
+        # 此时两个标签页都被后面已准备的B和C占用，临时多开一个，发布后关闭
+        self.fail_titles = {'A'}
+        results = self.run_pipeline(['A', 'A', 'B', 'C'], ledger=True)
+        self.assertEqual([r['title'] for r in results], ['A', 'A', 'B', 'C'])
+        self.assertEqual([r['success'] for r in results], [False, True, True, True])
+        self.assertFalse(results[1]['skipped'])
+        self.assertEqual(self.clicks, ['A', 'A', 'B', 'C'])
+        self.assertEqual(max(self.uploads), WINDOW + 1)
+        self.assertEqual(self.tabs, WINDOW)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+"""
+发布前预检的测试：平台计字规则（platform_length）、长度上限的边界和strict_limits开关
+
+运行: python -m unittest discover tests
+"""
+
+import os
+import sys
+import zlib
+import shutil
+import struct
+import tempfile
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from preflight import POST_LIMITS, platform_length, check_fields, preflight_posts  # noqa: E402
+
+
+def _png_bytes(width=8, height=8):
+    """生成一张最小的有效PNG（灰度）"""
+    def chunk(kind, data):
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+    raw = b''.join(b'\x00' + b'\x80' * width for _ in range(height))
+    return (b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 0, 0, 0, 0))
+            + chunk(b'IDAT', zlib.compress(raw)) + chunk(b'IEND', b''))
+
+
+# (文本, 平台字数)
+LENGTH_CASES = [
+    ('', 0),
+    ('中文标题', 4),
+    ('ＡＢＣ', 3),  # 全角字母
+    ('，。！', 3),  # 全角标点
+    ('abcd', 2),  # 两个半角字符算1字
+    ('abc', 2),  # 不足两个按1字计
+    ('a b', 2),  # 半角空格同样按半个字计
+    ('中文ab', 3),
+    ('中文 ab', 4),
+    ('😀', 1),
+    ('❤️', 1),  # 变体选择符不计字
+    ('👍🏽', 1),  # 肤色修饰符不计字
+    ('👨‍👩‍👧‍👦', 1),  # 零宽连接符组成的组合emoji
+    ('家庭👨‍👩‍👧', 3),
+]
+
+TITLE_LIMIT = POST_LIMITS['title_max_chars']
+
+
+class PlatformLengthTest(unittest.TestCase):
+
+    def test_length_rules(self):
+        for text, expected in LENGTH_CASES:
+            with self.subTest(text=text):
+                self.assertEqual(platform_length(text), expected)
+
+    def test_title_boundary(self):
+        # (标题, 是否超出20字)
+        cases = [
+            ('字' * TITLE_LIMIT, False),
+            ('字' * (TITLE_LIMIT + 1), True),
+            ('a' * (TITLE_LIMIT * 2), False),
+            ('a' * (TITLE_LIMIT * 2 + 1), True),
+            ('字' * (TITLE_LIMIT - 1) + '👨‍👩‍👧', False),
+            ('字' * (TITLE_LIMIT - 1) + 'ab', False),
+            ('字' * (TITLE_LIMIT - 1) + 'abc', True),
+        ]
+        for title, over in cases:
+            with self.subTest(title=title):
+                errors, problems = check_fields({'title': title, 'description': '正文'})
+                self.assertEqual(errors, [])
+                self.assertEqual(bool(problems), over)
+
+    def test_hashtags_count_towards_description(self):
+        limit = POST_LIMITS['description_max_chars']
+        post = {'title': '标题', 'description': '字' * (limit - 2), 'hashtags': ['#ab']}
+        # 标签追加在换行之后：换行和 #ab 共4个半角字符，按2字计
+        self.assertEqual(check_fields(post)[1], [])
+        post['hashtags'] = ['#abc']
+        self.assertEqual(len(check_fields(post)[1]), 1)
+
+    def test_field_errors(self):
+        self.assertEqual(check_fields('标题')[0], ["发布数据必须是字典"])
+        errors, _ = check_fields({'title': ' ', 'hashtags': '#标签'})
+        self.assertEqual(len(errors), 3)
+
+
+class StrictLimitsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.image_dir = tempfile.mkdtemp(prefix='rednote_preflight_')
+        with open(os.path.join(self.image_dir, '1.png'), 'wb') as f:
+            f.write(_png_bytes())
+
+    def tearDown(self):
+        shutil.rmtree(self.image_dir, ignore_errors=True)
+
+    def preflight(self, strict, title):
+        config = {'preflight': {'strict_limits': strict, 'workers': 2, 'batch_size': 2}}
+        posts = [{'title': title, 'description': '正文', 'image_dir': self.image_dir}]
+        return preflight_posts(posts, config)[0]
+
+    def test_within_limit(self):
+        for strict in (True, False):
+            with self.subTest(strict=strict):
+                report = self.preflight(strict, '字' * TITLE_LIMIT)
+                self.assertTrue(report['ok'])
+                self.assertEqual(report['warnings'], [])
+                self.assertEqual(report['images'], 1)
+
+    def test_over_limit(self):
+        title = '字' * (TITLE_LIMIT + 1)
+        strict = self.preflight(True, title)
+        self.assertFalse(strict['ok'])
+        self.assertEqual(len(strict['errors']), 1)
+        # 关闭strict_limits时超出限制只记录警告
+        lenient = self.preflight(False, title)
+        self.assertTrue(lenient['ok'])
+        self.assertEqual(lenient['errors'], [])
+        self.assertEqual(len(lenient['warnings']), 1)
+
+    def test_report_order(self):
+        config = {'preflight': {'workers': 3, 'batch_size': 2}}
+        posts = [{'title': f'标题{i}', 'description': '正文', 'image_dir': self.image_dir if i % 2 else None}
+                 for i in range(5)]
+        reports = preflight_posts(posts, config)
+        self.assertEqual([r['index'] for r in reports], list(range(5)))
+        self.assertEqual([r['ok'] for r in reports], [False, True, False, True, False])
+
+
+if __name__ == '__main__':
+    unittest.main()
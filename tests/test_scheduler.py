@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+"""
+定时发布调度器的测试：令牌桶限速、参数校验、失败重试的指数退避和重启后的任务恢复
+
+使用假时钟（替换scheduler模块中的time和asyncio.sleep）和假发布会话，不启动浏览器，也不真正等待。
+
+运行: python -m unittest discover tests
+"""
+
+import os
+import sys
+import asyncio
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import scheduler  # noqa: E402
+from scheduler import JobStore, Scheduler, TokenBucket, retry_delay, SCHEDULER_DEFAULTS  # noqa: E402
+
+_real_sleep = asyncio.sleep
+
+
+class FakeClock:
+    """假时钟：sleep只推进时间，不真正等待"""
+
+    def __init__(self, now=1_700_000_000.0):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+    def monotonic(self):
+        return self.now
+
+    async def sleep(self, seconds):
+        self.now += max(0.0, seconds)
+        await _real_sleep(0)
+
+
+class FakeSession:
+    """假发布会话：按顺序返回预设的结果，并记录每次发布的时间"""
+
+    def __init__(self, clock, results):
+        self.clock = clock
+        self.results = list(results)
+        self.calls = []
+        self.closed = False
+
+    def publish(self, payload):
+        self.calls.append((self.clock.now, payload))
+        result = self.results.pop(0) if len(self.results) > 1 else self.results[0]
+        return dict(result, title=payload.get('title'))
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.closed = True
+
+
+class SchedulerTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp(prefix='rednote_scheduler_')
+        self.db_path = os.path.join(self.tmp, 'jobs.db')
+        self.clock = FakeClock()
+        patches = [mock.patch.object(scheduler, 'time', self.clock),
+                   mock.patch.object(scheduler.asyncio, 'sleep', self.clock.sleep)]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+        self.stores = []
+
+    def tearDown(self):
+        for store in self.stores:
+            store.close()
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def open_store(self):
+        store = JobStore(self.db_path)
+        self.stores.append(store)
+        return store
+
+    def run_until(self, sched, done):
+        """运行调度器直到done()为真（按真实时间最多等待5秒）"""
+        async def main():
+            runner = asyncio.ensure_future(sched.run())
+            for _ in range(500):
+                if done():
+                    break
+                await _real_sleep(0.01)
+            sched.stop()
+            await runner
+        asyncio.run(main())
+        self.assertTrue(done(), "调度器未在限定时间内完成")
+
+
+class TokenBucketTest(SchedulerTestCase):
+
+    def test_burst_then_refill(self):
+        bucket = TokenBucket(rate_per_minute=60, burst=3)
+
+        async def acquire(count):
+            for _ in range(count):
+                await bucket.acquire()
+
+        started = self.clock.now
+        # 桶满时可以连续发布burst篇
+        asyncio.run(acquire(3))
+        self.assertEqual(self.clock.now, started)
+        # 之后按速率补充：每分钟60个，即每秒1个
+        asyncio.run(acquire(1))
+        self.assertAlmostEqual(self.clock.now - started, 1.0)
+        asyncio.run(acquire(2))
+        self.assertAlmostEqual(self.clock.now - started, 3.0)
+
+    def test_refill_is_capped_by_burst(self):
+        bucket = TokenBucket(rate_per_minute=6, burst=2)
+        asyncio.run(bucket.acquire())
+        self.clock.now += 3600
+        bucket._refill()
+        self.assertEqual(bucket.tokens, 2)
+
+    def test_rejects_non_positive_rate(self):
+        for rate in (0, -1, None):
+            with self.subTest(rate=rate):
+                with self.assertRaises(ValueError):
+                    TokenBucket(rate)
+
+    def test_scheduler_validates_settings(self):
+        store = self.open_store()
+        for settings in ({'rate_per_minute': 0}, {'rate_per_minute': -2}, {'rate_per_minute': '1'},
+                         {'queue_size': 0}):
+            with self.subTest(settings=settings):
+                with self.assertRaises(ValueError):
+                    Scheduler(store, settings=settings)
+        # 账号自己的调度参数同样在启动时检查
+        with self.assertRaises(ValueError):
+            Scheduler(store, accounts={'a': {'scheduler': {'rate_per_minute': 0}}})
+
+
+class RetryTest(SchedulerTestCase):
+
+    def test_retry_delay(self):
+        settings = dict(SCHEDULER_DEFAULTS, retry_base_delay=60, retry_max_delay=200)
+        self.assertEqual([retry_delay(n, settings) for n in (1, 2, 3, 4)], [60, 120, 200, 200])
+
+    def test_backoff_then_failed(self):
+        store = self.open_store()
+        job_id = store.add_job({'title': '标题'}, max_attempts=3)
+        sched = Scheduler(store, settings={'poll_interval': 1, 'rate_per_minute': 60, 'burst': 1,
+                                           'retry_base_delay': 60, 'retry_max_delay': 3600})
+        session = FakeSession(self.clock, [{'success': False, 'error': '页面异常', 'failure': 'transient'}])
+        sched.sessions[scheduler.DEFAULT_ACCOUNT] = session
+        retries = []
+        mark_retry = store.mark_retry
+        store.mark_retry = lambda *args: (retries.append((self.clock.now, args[2])), mark_retry(*args))
+
+        self.run_until(sched, lambda: store.counts().get('failed') == 1)
+
+        # 第1次失败后等待60秒，第2次失败后等待120秒，第3次失败后放弃
+        self.assertEqual([publish_at - now for now, publish_at in retries], [60, 120])
+        times = [when for when, _ in session.calls]
+        self.assertEqual(len(times), 3)
+        for (_, publish_at), when in zip(retries, times[1:]):
+            self.assertGreaterEqual(when, publish_at)
+        row = store.conn.execute("SELECT status, attempts, last_error FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        self.assertEqual(tuple(row), ('failed', 3, '页面异常'))
+        self.assertTrue(session.closed)
+
+    def test_permanent_failure_is_not_retried(self):
+        store = self.open_store()
+        store.add_job({'title': '标题'}, max_attempts=3)
+        sched = Scheduler(store, settings={'poll_interval': 1, 'rate_per_minute': 60})
+        session = FakeSession(self.clock, [{'success': False, 'error': '图片不存在', 'failure': 'permanent'}])
+        sched.sessions[scheduler.DEFAULT_ACCOUNT] = session
+        self.run_until(sched, lambda: store.counts().get('failed') == 1)
+        self.assertEqual(len(session.calls), 1)
+
+
+class RecoveryTest(SchedulerTestCase):
+
+    def test_running_jobs_resume_after_restart(self):
+        store = self.open_store()
+        first = store.add_job({'title': '第一篇'})
+        second = store.add_job({'title': '第二篇'})
+        # 模拟进程在发布中退出：任务已被取出并标记为running
+        claimed = store.claim_due(scheduler.DEFAULT_ACCOUNT, 10)
+        self.assertEqual([job['id'] for job in claimed], [first, second])
+        store.close()
+        self.stores.remove(store)
+
+        store = self.open_store()
+        self.assertEqual(store.counts(), {'running': 2})
+        sched = Scheduler(store, settings={'poll_interval': 1, 'rate_per_minute': 60, 'burst': 2})
+        session = FakeSession(self.clock, [{'success': True}])
+        sched.sessions[scheduler.DEFAULT_ACCOUNT] = session
+
+        self.run_until(sched, lambda: store.counts().get('done') == 2)
+        self.assertEqual([payload['title'] for _, payload in session.calls], ['第一篇', '第二篇'])
+        self.assertEqual(store.counts(), {'done': 2})
+
+
+if __name__ == '__main__':
+    unittest.main()